@@ -0,0 +1,444 @@
+import os
+import sys
+import time
+import heapq
+import random
+import tempfile
+import threading
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import settings
+import Include.subsystem.usagedata_db as usagedata_db_module
+from Include.service.usagedata_service import UsagedataService
+from Include.subsystem.usagedata_db import UsagedataDB
+
+class SyntheticClock:
+    # Drives UsagedataDB with simulated wall and monotonic time, so days of ticks can be replayed in seconds
+
+    def __init__(self, start: datetime):
+        self.now: datetime = start
+        self.monotonic: float = 0
+
+    def advance(self, delta: timedelta) -> None:
+        self.now += delta
+        self.monotonic += delta.total_seconds()
+
+    @contextmanager
+    def patch(self):
+        clock = self
+
+        class _SyntheticDatetime(datetime):
+            @classmethod
+            def today(cls) -> datetime:
+                return clock.now
+
+        synthetic_time = SimpleNamespace(monotonic = lambda: clock.monotonic)
+
+        with patch.object(usagedata_db_module, "time", synthetic_time), patch.object(usagedata_db_module, "datetime", _SyntheticDatetime):
+            yield
+
+class SyntheticWorkload:
+    # Generates open apps/titles and the active app/title for each tick
+
+    def __init__(self, apps: int = 20, titles_per_app: int = 10, open_apps: int = 5, seed: int = 0):
+        self._random = random.Random(seed)
+
+        self.app_titles: dict[str, list[str]] = {
+            f"app_{i}.exe": [f"Title {j} - app_{i}" for j in range(titles_per_app)]
+            for i in range(apps)
+        }
+        self.app_executablepaths: dict[str, str] = {app: f"C:\\Programs\\{app}" for app in self.app_titles}
+        self._open_apps = min(open_apps, apps)
+
+    def tick(self) -> tuple[dict[str, set[str]], dict[str, str], str, str]:
+        apps = self._random.sample(list(self.app_titles), self._open_apps)
+        app_title_map = {app: {self._random.choice(self.app_titles[app])} for app in apps}
+
+        active_app = apps[0]
+        active_title = next(iter(app_title_map[active_app]))
+
+        return app_title_map, self.app_executablepaths, active_app, active_title
+
+def replay_ticks(usagedata_db: UsagedataDB, clock: SyntheticClock, workload: SyntheticWorkload, ticks: int) -> float:
+    # Replays ticks against the database and returns the elapsed wall time in seconds
+
+    start = time.perf_counter()
+    with clock.patch():
+        for _ in range(ticks):
+            clock.advance(settings.tick)
+            usagedata_db.update_apps(*workload.tick())
+
+    return time.perf_counter() - start
+
+def replay_week(usagedata_db: UsagedataDB, clock: SyntheticClock, workload: SyntheticWorkload, active_hours: int = 8) -> tuple[int, float]:
+    # Replays a week of active hours, with the nights logged as downtime. Returns ticks replayed and elapsed wall time.
+
+    ticks_per_day = int(timedelta(hours=active_hours) / settings.tick)
+
+    elapsed = 0
+    for _ in range(7):
+        elapsed += replay_ticks(usagedata_db, clock, workload, ticks_per_day)
+        clock.advance(timedelta(hours=24 - active_hours))
+
+    return 7 * ticks_per_day, elapsed
+
+def replay_reflect(usagedata_db: UsagedataDB) -> float:
+    # Replays the reads of SuggestionEngine.preprocess_logs without loading the model.
+    # The latest day is loaded on its own thread with titles, historical days are loaded together without titles.
+
+    day_log_ids = usagedata_db.get_daylog_ids()
+
+    def top_apps(day: dict) -> list:
+        apps = heapq.nlargest(settings.data_limit, day["apps"].items(), key=lambda x: x[1]["total_duration"])
+        for _, app_data in apps:
+            heapq.nlargest(settings.data_limit, app_data["titles"].items(), key=lambda x: x[1]["total_duration"])
+        return apps
+
+    start = time.perf_counter()
+
+    threads = [threading.Thread(target=lambda: top_apps(usagedata_db.get_day(day_log_ids[-1])))]
+    if len(day_log_ids) > 1:
+        threads.append(threading.Thread(target=lambda: [top_apps(day) for day in usagedata_db.get_days(tuple(day_log_ids[:-1]), titles=False).values()]))
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - start
+
+def database_size(usagedata_db: UsagedataDB) -> int:
+    # Size of the database file, its WAL and shared memory index in bytes
+    return sum(os.path.getsize(f"{usagedata_db.db_path}{suffix}") for suffix in ("", "-wal", "-shm") if os.path.exists(f"{usagedata_db.db_path}{suffix}"))
+
+def benchmark_connection_modes(ticks: int = 2000) -> dict[str, float]:
+    # Compares observe ticks per second between connect-per-call, pooled and pooled write-behind connections
+
+    results = dict()
+    sqlite_pooled = settings.sqlite_pooled
+
+    try:
+        for mode, pooled, write_behind in (("connect-per-call", False, False), ("pooled", True, False), ("pooled write-behind", True, True)):
+            settings.sqlite_pooled = pooled
+
+            with tempfile.TemporaryDirectory() as usagedata_dir:
+                clock = SyntheticClock(datetime(2025, 1, 6, 9))
+                with clock.patch():
+                    usagedata_db = UsagedataDB(usagedata_dir, write_behind)
+
+                try:
+                    elapsed = replay_ticks(usagedata_db, clock, SyntheticWorkload(), ticks)
+                finally:
+                    usagedata_db.close()
+
+            results[mode] = ticks / elapsed
+            print(f"{mode}: {results[mode]:.1f} ticks/s ({ticks} ticks in {elapsed:.2f}s)")
+    finally:
+        settings.sqlite_pooled = sqlite_pooled
+
+    return results
+
+def benchmark_profiles() -> dict[str, dict[str, float]]:
+    # Replays a synthetic week of observe ticks and a reflect preprocessing pass for every SQLite performance profile
+
+    results = dict()
+    sqlite_profile = settings.sqlite_profile
+
+    try:
+        for profile in settings.SQLiteProfile:
+            settings.sqlite_profile = profile
+
+            with tempfile.TemporaryDirectory() as usagedata_dir:
+                clock = SyntheticClock(datetime(2025, 1, 6, 9))
+                with clock.patch():
+                    usagedata_db = UsagedataDB(usagedata_dir, write_behind = settings.observe_write_behind)
+
+                try:
+                    ticks, observe_elapsed = replay_week(usagedata_db, clock, SyntheticWorkload(apps=30, titles_per_app=20))
+                    usagedata_db.flush()
+
+                    with clock.patch():
+                        reflect_elapsed = replay_reflect(usagedata_db)
+
+                    size = database_size(usagedata_db)
+                finally:
+                    usagedata_db.close()
+
+            results[profile.value] = {
+                "ticks_per_second": ticks / observe_elapsed,
+                "reflect_seconds": reflect_elapsed,
+                "size_bytes": size
+            }
+            print(f"{profile.value}: {ticks / observe_elapsed:.1f} ticks/s, reflect pass {reflect_elapsed * 1000:.1f}ms, database {size / 1024:.0f} KiB")
+    finally:
+        settings.sqlite_profile = sqlite_profile
+
+    return results
+
+class FullRewriteUsagedataDB(UsagedataDB):
+    # Writes every app and title of the day on every tick, as UsagedataDB did before dirty tracking
+    def _changed_apps_titles(self) -> dict[str, dict]:
+        return self._today_apps
+
+def rows_written(usagedata_db: UsagedataDB) -> int:
+    # Rows inserted or updated so far, from the query profiler
+    return sum(stats["rows"] for statement, stats in usagedata_db.get_query_stats().items() if statement.startswith(("INSERT", "UPDATE")))
+
+def benchmark_write_volume(apps: int = 40, titles_per_app: int = 60, ticks: int = 500) -> dict[str, dict[str, float]]:
+    # Compares rows written per tick with and without dirty tracking, for a day with apps * titles_per_app titles
+
+    results = dict()
+    sqlite_profiling = settings.sqlite_profiling
+
+    try:
+        settings.sqlite_profiling = True
+
+        for mode, usagedata_db_class in (("full rewrite", FullRewriteUsagedataDB), ("delta", UsagedataDB)):
+            workload = SyntheticWorkload(apps=apps, titles_per_app=titles_per_app)
+
+            with tempfile.TemporaryDirectory() as usagedata_dir:
+                clock = SyntheticClock(datetime(2025, 1, 6, 9))
+                with clock.patch():
+                    usagedata_db = usagedata_db_class(usagedata_dir)
+
+                try:
+                    # Every title is opened once, so the day holds all of them before measuring
+                    with clock.patch():
+                        for app, titles in workload.app_titles.items():
+                            clock.advance(settings.tick)
+                            usagedata_db.update_apps({app: set(titles)}, workload.app_executablepaths, app, titles[0])
+
+                    warmup_rows = rows_written(usagedata_db)
+                    elapsed = replay_ticks(usagedata_db, clock, workload, ticks)
+                    rows = rows_written(usagedata_db) - warmup_rows
+                finally:
+                    usagedata_db.close()
+
+            results[mode] = {
+                "rows_per_tick": rows / ticks,
+                "ticks_per_second": ticks / elapsed
+            }
+            print(f"{mode}: {rows / ticks:.1f} rows written per tick, {ticks / elapsed:.1f} ticks/s ({apps * titles_per_app} titles)")
+    finally:
+        settings.sqlite_profiling = sqlite_profiling
+
+    return results
+
+def benchmark_tick_storage(apps: int = 40, titles_per_app: int = 60, ticks: int = 1000) -> dict[str, dict[str, float]]:
+    # Compares observe ticks per second and rows written per tick between aggregate and journal tick storage.
+    # Journal time includes deriving the aggregates, in batches and for the ticks left on close.
+    results = dict()
+    tick_storage = settings.tick_storage
+    sqlite_profiling = settings.sqlite_profiling
+
+    try:
+        settings.sqlite_profiling = True
+
+        for storage in settings.TickStorage:
+            settings.tick_storage = storage
+            workload = SyntheticWorkload(apps=apps, titles_per_app=titles_per_app)
+
+            with tempfile.TemporaryDirectory() as usagedata_dir:
+                clock = SyntheticClock(datetime(2025, 1, 6, 9))
+                with clock.patch():
+                    usagedata_db = UsagedataDB(usagedata_dir)
+
+                try:
+                    elapsed = replay_ticks(usagedata_db, clock, workload, ticks)
+
+                    start = time.perf_counter()
+                    with clock.patch():
+                        usagedata_db.materialize()
+                    elapsed += time.perf_counter() - start
+
+                    rows = rows_written(usagedata_db)
+                finally:
+                    usagedata_db.close()
+
+            results[storage.value] = {
+                "ticks_per_second": ticks / elapsed,
+                "rows_per_tick": rows / ticks
+            }
+            print(f"{storage.value}: {ticks / elapsed:.1f} ticks/s, {rows / ticks:.1f} rows written per tick ({ticks} ticks)")
+    finally:
+        settings.tick_storage = tick_storage
+        settings.sqlite_profiling = sqlite_profiling
+
+    return results
+
+def benchmark_focus_buckets(resolutions: tuple[int | None, ...] = (None, 15, 10, 5)) -> dict[str, dict[str, float]]:
+    # Writes a full day of ticks at each focus bucket resolution, then reads every app and title's buckets back.
+    # Buckets are downsampled to hours with numpy when it is installed.
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    results = dict()
+    focus_bucket_minutes = settings.focus_bucket_minutes
+    ticks = int(timedelta(days=1) / settings.tick)
+
+    try:
+        for bucket_minutes in resolutions:
+            settings.focus_bucket_minutes = bucket_minutes
+            workload = SyntheticWorkload(apps=30, titles_per_app=20)
+
+            with tempfile.TemporaryDirectory() as usagedata_dir:
+                clock = SyntheticClock(datetime(2025, 1, 6, 0, 0, 1))
+                with clock.patch():
+                    usagedata_db = UsagedataDB(usagedata_dir)
+
+                try:
+                    elapsed = replay_ticks(usagedata_db, clock, workload, ticks - 1)
+                    usagedata_db.flush()
+                    size = database_size(usagedata_db)
+
+                    with clock.patch():
+                        day_log_id = usagedata_db.get_daylog_ids()[-1]
+                        day = usagedata_db.get_day(day_log_id)
+
+                        start = time.perf_counter()
+                        if bucket_minutes:
+                            for app_name, app_data in day["apps"].items():
+                                for buckets in [usagedata_db.get_appfocusbuckets(day_log_id, app_name)] + [usagedata_db.get_titlefocusbuckets(day_log_id, app_name, title_name) for title_name in app_data["titles"]]:
+                                    if buckets and numpy is not None:
+                                        UsagedataService.downsample_to_hours(*buckets)
+                        read_elapsed = time.perf_counter() - start
+                finally:
+                    usagedata_db.close()
+
+            mode = f"{bucket_minutes} minute buckets" if bucket_minutes else "hours only"
+            results[mode] = {
+                "ticks_per_second": ticks / elapsed,
+                "read_seconds": read_elapsed,
+                "size_bytes": size
+            }
+            print(f"{mode}: {ticks / elapsed:.1f} ticks/s, bucket read pass {read_elapsed * 1000:.1f}ms, database {size / 1024:.0f} KiB")
+    finally:
+        settings.focus_bucket_minutes = focus_bucket_minutes
+
+    return results
+
+def benchmark_snapshot_reads(rounds: int = 50) -> dict[str, dict[str, float]]:
+    # Compares a batch of per app reads, the day log and every app's log and focus periods, with and without a snapshot
+    results: dict[str, dict[str, float]] = dict()
+    sqlite_pooled = settings.sqlite_pooled
+
+    try:
+        for pooled in (False, True):
+            settings.sqlite_pooled = pooled
+            results[f"pooled={pooled}"] = dict()
+
+            with tempfile.TemporaryDirectory() as usagedata_dir:
+                clock = SyntheticClock(datetime(2025, 1, 6, 9))
+                with clock.patch():
+                    usagedata_db = UsagedataDB(usagedata_dir)
+
+                try:
+                    replay_ticks(usagedata_db, clock, SyntheticWorkload(), 500)
+
+                    with clock.patch():
+                        day_log_id = usagedata_db.get_daylog_ids()[-1]
+                        app_names = list(usagedata_db.get_applog_titlelog(day_log_id))
+
+                        def read_batch() -> None:
+                            usagedata_db.get_daylog(day_log_id)
+                            for app_name in app_names:
+                                usagedata_db.get_appfocusperiod(day_log_id, app_name)
+
+                        for mode in ("separate reads", "snapshot"):
+                            start = time.perf_counter()
+                            for _ in range(rounds):
+                                if mode == "snapshot":
+                                    with usagedata_db.snapshot():
+                                        read_batch()
+                                else:
+                                    read_batch()
+                            elapsed = time.perf_counter() - start
+
+                            results[f"pooled={pooled}"][mode] = rounds / elapsed
+                            print(f"pooled={pooled}, {mode}: {rounds / elapsed:.1f} batches/s ({len(app_names) + 1} reads each)")
+                finally:
+                    usagedata_db.close()
+    finally:
+        settings.sqlite_pooled = sqlite_pooled
+
+    return results
+
+def per_app_mostused_app(usagedata_db: UsagedataDB, app_names: tuple[str]) -> str | None:
+    # get_mostused_app as it was before rollups, two SUM queries per candidate app
+    day_log_ids = tuple(usagedata_db.get_daylog_ids())
+
+    total_durations_today = tuple(usagedata_db._service.get_totalduration(app_name, day_log_ids[-1:]) for app_name in app_names)
+    total_durations_historical = tuple(usagedata_db._service.get_totalduration(app_name, day_log_ids[:-1]) for app_name in app_names)
+
+    weight = settings.class_day_historical_weight
+    return max(zip(app_names, (weight * historical + (1 - weight) * today for today, historical in zip(total_durations_today, total_durations_historical))), key=lambda item: item[1])[0]
+
+def benchmark_mostused_app(class_sizes: tuple[int, ...] = (12, 48, 96), calls: int = 200) -> dict[str, dict[int, float]]:
+    # Compares class resolutions per second between per app queries and the single weighted query,
+    # over a full retention window of day logs with every app of the class used
+    results: dict[str, dict[int, float]] = {"per app": dict(), "weighted query": dict()}
+    workload = SyntheticWorkload(apps=max(class_sizes), titles_per_app=5, open_apps=10)
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        clock = SyntheticClock(datetime(2025, 1, 6, 9))
+        with clock.patch():
+            usagedata_db = UsagedataDB(usagedata_dir)
+
+        try:
+            for _ in range(settings.max_logs):
+                replay_ticks(usagedata_db, clock, workload, int(timedelta(hours=8) / settings.tick))
+                clock.advance(timedelta(hours=16))
+
+            with clock.patch():
+                for class_size in class_sizes:
+                    app_names = tuple(workload.app_titles)[:class_size]
+                    assert per_app_mostused_app(usagedata_db, app_names) == usagedata_db.get_mostused_app(app_names)
+
+                    for mode, resolve in (("per app", per_app_mostused_app), ("weighted query", UsagedataDB.get_mostused_app)):
+                        start = time.perf_counter()
+                        for _ in range(calls):
+                            resolve(usagedata_db, app_names)
+                        elapsed = time.perf_counter() - start
+
+                        results[mode][class_size] = calls / elapsed
+                        print(f"{mode}, {class_size} apps: {calls / elapsed:.1f} resolutions/s ({elapsed / calls * 1000:.2f}ms each)")
+        finally:
+            usagedata_db.close()
+
+    return results
+
+if __name__ == "__main__":
+    # Run from the project root with src on the path, e.g. PYTHONPATH=src python dev/usagedata_benchmark.py pool
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "help"
+
+    if mode == "pool":
+        benchmark_connection_modes()
+    elif mode == "profiles":
+        benchmark_profiles()
+    elif mode == "writes":
+        benchmark_write_volume()
+    elif mode == "mostused":
+        benchmark_mostused_app()
+    elif mode == "journal":
+        benchmark_tick_storage()
+    elif mode == "buckets":
+        benchmark_focus_buckets()
+    elif mode == "snapshot":
+        benchmark_snapshot_reads()
+    else:
+        print("Usage: python dev/usagedata_benchmark.py [mode]")
+        print("Modes:")
+        print("  pool: Compare observe ticks per second with and without connection pooling and write-behind")
+        print("  profiles: Replay a synthetic week and a reflect pass for every SQLite performance profile")
+        print("  writes: Compare rows written per tick with and without dirty tracking, for a day with 2400 titles")
+        print("  mostused: Compare class resolutions per second between per app queries and the single weighted query")
+        print("  journal: Compare observe ticks per second and rows written per tick between aggregate and journal tick storage")
+        print("  buckets: Write and read a full day of ticks at each focus bucket resolution")
+        print("  snapshot: Compare a batch of per app reads with and without a read snapshot")
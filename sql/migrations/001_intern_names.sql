@@ -0,0 +1,143 @@
+-- Schema version 1: app and title names are stored once in the app and title tables, logs reference them by id.
+-- Runs on databases at version 0, before schema.sql.
+
+BEGIN;
+
+-- Databases created before the vector layout
+CREATE TABLE IF NOT EXISTS app_focus_vector (
+    day_log_id INTEGER NOT NULL,
+    app_name TEXT NOT NULL,
+    focus_durations BLOB NOT NULL,
+    focus_counts BLOB NOT NULL,
+    PRIMARY KEY(day_log_id, app_name)
+);
+CREATE TABLE IF NOT EXISTS title_focus_vector (
+    day_log_id INTEGER NOT NULL,
+    app_name TEXT NOT NULL,
+    title_name TEXT NOT NULL,
+    focus_durations BLOB NOT NULL,
+    focus_counts BLOB NOT NULL,
+    PRIMARY KEY(day_log_id, app_name, title_name)
+);
+
+DROP INDEX IF EXISTS idx_applog_daylog;
+DROP INDEX IF EXISTS idx_titlelog_applog;
+DROP INDEX IF EXISTS idx_appfocusperiod_applog;
+DROP INDEX IF EXISTS idx_titlefocusperiod_titlelog;
+
+ALTER TABLE app_log RENAME TO app_log_v0;
+ALTER TABLE title_log RENAME TO title_log_v0;
+ALTER TABLE app_focus_period RENAME TO app_focus_period_v0;
+ALTER TABLE title_focus_period RENAME TO title_focus_period_v0;
+ALTER TABLE app_focus_vector RENAME TO app_focus_vector_v0;
+ALTER TABLE title_focus_vector RENAME TO title_focus_vector_v0;
+
+CREATE TABLE app (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE title (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE app_log (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    executable_path TEXT NOT NULL,
+    total_duration REAL DEFAULT 0 CHECK(total_duration >= 0),
+    total_focus_duration REAL DEFAULT 0 CHECK(total_focus_duration >= 0),
+    total_focus_count INTEGER DEFAULT 0 CHECK(total_focus_count >= 0),
+    PRIMARY KEY(day_log_id, app_id),
+    FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
+);
+
+CREATE TABLE title_log (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    total_duration REAL DEFAULT 0 CHECK(total_duration >= 0),
+    total_focus_duration REAL DEFAULT 0 CHECK(total_focus_duration >= 0),
+    total_focus_count INTEGER DEFAULT 0 CHECK(total_focus_count >= 0),
+    PRIMARY KEY(day_log_id, app_id, title_id),
+    FOREIGN KEY(day_log_id, app_id) REFERENCES app_log(day_log_id, app_id) ON DELETE CASCADE
+);
+
+CREATE TABLE app_focus_period (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    day_hour INTEGER NOT NULL CHECK(day_hour BETWEEN 0 AND 23),
+    focus_duration REAL DEFAULT 0 CHECK(focus_duration BETWEEN 0 AND 3600),
+    focus_count INTEGER DEFAULT 0 CHECK(focus_count >= 0),
+    PRIMARY KEY(day_log_id, app_id, day_hour),
+    FOREIGN KEY(day_log_id, app_id) REFERENCES app_log(day_log_id, app_id) ON DELETE CASCADE
+);
+
+CREATE TABLE title_focus_period (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    day_hour INTEGER NOT NULL CHECK(day_hour BETWEEN 0 AND 23),
+    focus_duration REAL DEFAULT 0 CHECK(focus_duration BETWEEN 0 AND 3600),
+    focus_count INTEGER DEFAULT 0 CHECK(focus_count >= 0),
+    PRIMARY KEY(day_log_id, app_id, title_id, day_hour),
+    FOREIGN KEY(day_log_id, app_id, title_id) REFERENCES title_log(day_log_id, app_id, title_id) ON DELETE CASCADE
+);
+
+CREATE TABLE app_focus_vector (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    focus_durations BLOB NOT NULL CHECK(length(focus_durations) = 96),
+    focus_counts BLOB NOT NULL CHECK(length(focus_counts) = 96),
+    PRIMARY KEY(day_log_id, app_id),
+    FOREIGN KEY(day_log_id, app_id) REFERENCES app_log(day_log_id, app_id) ON DELETE CASCADE
+);
+
+CREATE TABLE title_focus_vector (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    focus_durations BLOB NOT NULL CHECK(length(focus_durations) = 96),
+    focus_counts BLOB NOT NULL CHECK(length(focus_counts) = 96),
+    PRIMARY KEY(day_log_id, app_id, title_id),
+    FOREIGN KEY(day_log_id, app_id, title_id) REFERENCES title_log(day_log_id, app_id, title_id) ON DELETE CASCADE
+);
+
+INSERT OR IGNORE INTO app (name) SELECT app_name FROM app_log_v0;
+INSERT OR IGNORE INTO title (name) SELECT title_name FROM title_log_v0;
+
+INSERT INTO app_log (day_log_id, app_id, executable_path, total_duration, total_focus_duration, total_focus_count)
+    SELECT l.day_log_id, app.id, l.executable_path, l.total_duration, l.total_focus_duration, l.total_focus_count
+    FROM app_log_v0 l JOIN app ON app.name = l.app_name;
+
+INSERT INTO title_log (day_log_id, app_id, title_id, total_duration, total_focus_duration, total_focus_count)
+    SELECT l.day_log_id, app.id, title.id, l.total_duration, l.total_focus_duration, l.total_focus_count
+    FROM title_log_v0 l JOIN app ON app.name = l.app_name JOIN title ON title.name = l.title_name;
+
+INSERT INTO app_focus_period (day_log_id, app_id, day_hour, focus_duration, focus_count)
+    SELECT p.day_log_id, app.id, p.day_hour, p.focus_duration, p.focus_count
+    FROM app_focus_period_v0 p JOIN app ON app.name = p.app_name;
+
+INSERT INTO title_focus_period (day_log_id, app_id, title_id, day_hour, focus_duration, focus_count)
+    SELECT p.day_log_id, app.id, title.id, p.day_hour, p.focus_duration, p.focus_count
+    FROM title_focus_period_v0 p JOIN app ON app.name = p.app_name JOIN title ON title.name = p.title_name;
+
+INSERT INTO app_focus_vector (day_log_id, app_id, focus_durations, focus_counts)
+    SELECT v.day_log_id, app.id, v.focus_durations, v.focus_counts
+    FROM app_focus_vector_v0 v JOIN app ON app.name = v.app_name;
+
+INSERT INTO title_focus_vector (day_log_id, app_id, title_id, focus_durations, focus_counts)
+    SELECT v.day_log_id, app.id, title.id, v.focus_durations, v.focus_counts
+    FROM title_focus_vector_v0 v JOIN app ON app.name = v.app_name JOIN title ON title.name = v.title_name;
+
+DROP TABLE title_focus_vector_v0;
+DROP TABLE app_focus_vector_v0;
+DROP TABLE title_focus_period_v0;
+DROP TABLE app_focus_period_v0;
+DROP TABLE title_log_v0;
+DROP TABLE app_log_v0;
+
+PRAGMA user_version = 1;
+
+COMMIT;
@@ -7,26 +7,36 @@ CREATE TABLE IF NOT EXISTS day_log (
     total_anomalies INTEGER DEFAULT 0 CHECK(total_anomalies >= 0)
 );
 
+CREATE TABLE IF NOT EXISTS app (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS title (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
 CREATE TABLE IF NOT EXISTS app_log (
     day_log_id INTEGER NOT NULL,
-    app_name TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
     executable_path TEXT NOT NULL,
     total_duration REAL DEFAULT 0 CHECK(total_duration >= 0),
     total_focus_duration REAL DEFAULT 0 CHECK(total_focus_duration >= 0),
     total_focus_count INTEGER DEFAULT 0 CHECK(total_focus_count >= 0),
-    PRIMARY KEY(day_log_id, app_name),
+    PRIMARY KEY(day_log_id, app_id),
     FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS title_log (
     day_log_id INTEGER NOT NULL,
-    app_name TEXT NOT NULL,
-    title_name TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
     total_duration REAL DEFAULT 0 CHECK(total_duration >= 0),
     total_focus_duration REAL DEFAULT 0 CHECK(total_focus_duration >= 0),
     total_focus_count INTEGER DEFAULT 0 CHECK(total_focus_count >= 0),
-    PRIMARY KEY(day_log_id, app_name, title_name),
-    FOREIGN KEY(day_log_id, app_name) REFERENCES app_log(day_log_id, app_name) ON DELETE CASCADE
+    PRIMARY KEY(day_log_id, app_id, title_id),
+    FOREIGN KEY(day_log_id, app_id) REFERENCES app_log(day_log_id, app_id) ON DELETE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS downtime_period (
@@ -39,27 +49,194 @@ CREATE TABLE IF NOT EXISTS downtime_period (
 
 CREATE TABLE IF NOT EXISTS app_focus_period (
     day_log_id INTEGER NOT NULL,
-    app_name TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
     day_hour INTEGER NOT NULL CHECK(day_hour BETWEEN 0 AND 23),
     focus_duration REAL DEFAULT 0 CHECK(focus_duration BETWEEN 0 AND 3600),
     focus_count INTEGER DEFAULT 0 CHECK(focus_count >= 0),
-    PRIMARY KEY(day_log_id, app_name, day_hour),
-    FOREIGN KEY(day_log_id, app_name) REFERENCES app_log(day_log_id, app_name) ON DELETE CASCADE
+    PRIMARY KEY(day_log_id, app_id, day_hour),
+    FOREIGN KEY(day_log_id, app_id) REFERENCES app_log(day_log_id, app_id) ON DELETE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS title_focus_period (
     day_log_id INTEGER NOT NULL,
-    app_name TEXT NOT NULL,
-    title_name TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
     day_hour INTEGER NOT NULL CHECK(day_hour BETWEEN 0 AND 23),
     focus_duration REAL DEFAULT 0 CHECK(focus_duration BETWEEN 0 AND 3600),
     focus_count INTEGER DEFAULT 0 CHECK(focus_count >= 0),
-    PRIMARY KEY(day_log_id, app_name, title_name, day_hour),
-    FOREIGN KEY(day_log_id, app_name, title_name) REFERENCES title_log(day_log_id, app_name, title_name) ON DELETE CASCADE
+    PRIMARY KEY(day_log_id, app_id, title_id, day_hour),
+    FOREIGN KEY(day_log_id, app_id, title_id) REFERENCES title_log(day_log_id, app_id, title_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS downtime_vector (
+    day_log_id INTEGER PRIMARY KEY,
+    downtime_durations BLOB NOT NULL CHECK(length(downtime_durations) = 96),
+    FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS app_focus_vector (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    focus_durations BLOB NOT NULL CHECK(length(focus_durations) = 96),
+    focus_counts BLOB NOT NULL CHECK(length(focus_counts) = 96),
+    PRIMARY KEY(day_log_id, app_id),
+    FOREIGN KEY(day_log_id, app_id) REFERENCES app_log(day_log_id, app_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS title_focus_vector (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    focus_durations BLOB NOT NULL CHECK(length(focus_durations) = 96),
+    focus_counts BLOB NOT NULL CHECK(length(focus_counts) = 96),
+    PRIMARY KEY(day_log_id, app_id, title_id),
+    FOREIGN KEY(day_log_id, app_id, title_id) REFERENCES title_log(day_log_id, app_id, title_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS app_focus_bucket (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    bucket_minutes INTEGER NOT NULL CHECK(bucket_minutes > 0 AND 60 % bucket_minutes = 0),
+    focus_durations BLOB NOT NULL CHECK(length(focus_durations) = 1440 / bucket_minutes * 4),
+    focus_counts BLOB NOT NULL CHECK(length(focus_counts) = 1440 / bucket_minutes * 4),
+    PRIMARY KEY(day_log_id, app_id),
+    FOREIGN KEY(day_log_id, app_id) REFERENCES app_log(day_log_id, app_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS title_focus_bucket (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    bucket_minutes INTEGER NOT NULL CHECK(bucket_minutes > 0 AND 60 % bucket_minutes = 0),
+    focus_durations BLOB NOT NULL CHECK(length(focus_durations) = 1440 / bucket_minutes * 4),
+    focus_counts BLOB NOT NULL CHECK(length(focus_counts) = 1440 / bucket_minutes * 4),
+    PRIMARY KEY(day_log_id, app_id, title_id),
+    FOREIGN KEY(day_log_id, app_id, title_id) REFERENCES title_log(day_log_id, app_id, title_id) ON DELETE CASCADE
 );
 
 CREATE INDEX IF NOT EXISTS idx_applog_daylog ON app_log(day_log_id);
-CREATE INDEX IF NOT EXISTS idx_titlelog_applog ON title_log(day_log_id, app_name);
+CREATE INDEX IF NOT EXISTS idx_titlelog_applog ON title_log(day_log_id, app_id);
 CREATE INDEX IF NOT EXISTS idx_downtimeperiod_daylog ON downtime_period(day_log_id);
-CREATE INDEX IF NOT EXISTS idx_appfocusperiod_applog ON app_focus_period(day_log_id, app_name);
-CREATE INDEX IF NOT EXISTS idx_titlefocusperiod_titlelog ON title_focus_period(day_log_id, app_name, title_name);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_appfocusperiod_applog ON app_focus_period(day_log_id, app_id);
+CREATE INDEX IF NOT EXISTS idx_titlefocusperiod_titlelog ON title_focus_period(day_log_id, app_id, title_id);
+
+-- Rollups, totals over every finished day log. A day is folded in once at rollover and taken out when it is removed.
+CREATE TABLE IF NOT EXISTS rollup_day (
+    day_log_id INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS app_rollup (
+    app_id INTEGER PRIMARY KEY,
+    total_duration REAL DEFAULT 0,
+    total_focus_duration REAL DEFAULT 0,
+    total_focus_count INTEGER DEFAULT 0,
+    day_count INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS title_rollup (
+    app_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    total_duration REAL DEFAULT 0,
+    total_focus_duration REAL DEFAULT 0,
+    total_focus_count INTEGER DEFAULT 0,
+    day_count INTEGER DEFAULT 0,
+    PRIMARY KEY(app_id, title_id)
+);
+
+-- Hourly heatmaps, focus count doubles as the number of switches into an app
+CREATE TABLE IF NOT EXISTS app_hour_rollup (
+    app_id INTEGER NOT NULL,
+    day_hour INTEGER NOT NULL CHECK(day_hour BETWEEN 0 AND 23),
+    focus_duration REAL DEFAULT 0,
+    focus_count INTEGER DEFAULT 0,
+    PRIMARY KEY(app_id, day_hour)
+);
+
+CREATE TABLE IF NOT EXISTS hour_rollup (
+    day_hour INTEGER PRIMARY KEY CHECK(day_hour BETWEEN 0 AND 23),
+    focus_duration REAL DEFAULT 0,
+    switch_count INTEGER DEFAULT 0,
+    downtime_duration REAL DEFAULT 0
+);
+
+-- History tiers, day logs removed past max_logs are summarized per day, then merged per month. Days and months are ISO date prefixes.
+CREATE TABLE IF NOT EXISTS daily_summary (
+    day TEXT PRIMARY KEY,
+    total_downtime_duration REAL DEFAULT 0,
+    total_anomalies INTEGER DEFAULT 0,
+    total_switch_count INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS daily_app_summary (
+    day TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    total_duration REAL DEFAULT 0,
+    total_focus_duration REAL DEFAULT 0,
+    total_focus_count INTEGER DEFAULT 0,
+    PRIMARY KEY(day, app_id)
+);
+
+CREATE TABLE IF NOT EXISTS monthly_summary (
+    month TEXT PRIMARY KEY,
+    day_count INTEGER DEFAULT 0,
+    total_downtime_duration REAL DEFAULT 0,
+    total_anomalies INTEGER DEFAULT 0,
+    total_switch_count INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS monthly_app_summary (
+    month TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    total_duration REAL DEFAULT 0,
+    total_focus_duration REAL DEFAULT 0,
+    total_focus_count INTEGER DEFAULT 0,
+    day_count INTEGER DEFAULT 0,
+    PRIMARY KEY(month, app_id)
+);
+
+-- Tick journal, one record per observe tick when settings.tick_storage is journal. Open windows are packed int32 (app_id, title_id) pairs.
+CREATE TABLE IF NOT EXISTS tick_journal (
+    id INTEGER PRIMARY KEY,
+    day_log_id INTEGER NOT NULL,
+    monotonic REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    active_app_id INTEGER,
+    active_title_id INTEGER,
+    open_windows BLOB NOT NULL,
+    FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_tickjournal_daylog ON tick_journal(day_log_id, id);
+
+CREATE TABLE IF NOT EXISTS journal_executable_path (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    executable_path TEXT NOT NULL,
+    PRIMARY KEY(day_log_id, app_id),
+    FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
+);
+
+-- Names referenced by each day's journaled ticks, which only hold them packed in open windows. Pruning keeps these.
+CREATE TABLE IF NOT EXISTS journal_app (
+    day_log_id INTEGER NOT NULL,
+    app_id INTEGER NOT NULL,
+    PRIMARY KEY(day_log_id, app_id),
+    FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS journal_title (
+    day_log_id INTEGER NOT NULL,
+    title_id INTEGER NOT NULL,
+    PRIMARY KEY(day_log_id, title_id),
+    FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Last tick of each day derived into the aggregate tables
+CREATE TABLE IF NOT EXISTS journal_watermark (
+    day_log_id INTEGER PRIMARY KEY,
+    tick_id INTEGER NOT NULL,
+    FOREIGN KEY(day_log_id) REFERENCES day_log(id) ON DELETE CASCADE
+);
+
+-- Version of this schema, databases at older versions are upgraded by the scripts in sql/migrations first
+PRAGMA user_version = 6;
@@ -0,0 +1,51 @@
+import math
+
+from array import array
+from collections.abc import Iterator
+from datetime import date, datetime, time, timedelta
+
+from typing import NamedTuple
+
+class DaySpan(NamedTuple):
+    # Part of an interval within one day, seconds covered by each bucket from first_bucket on
+    day: date
+    first_bucket: int
+    durations: array
+
+    def items(self) -> Iterator[tuple[int, float]]:
+        return zip(range(self.first_bucket, self.first_bucket + len(self.durations)), self.durations)
+
+def split_interval(start: datetime, end: datetime, bucket_minutes: int = 60) -> list[DaySpan]:
+    # Splits [start, end) into buckets of bucket_minutes, one DaySpan per day it touches.
+    # Only the first and last bucket of a day can be partial, the ones between are filled as a block,
+    # so a gap of days costs a few operations per day rather than one per bucket.
+    if bucket_minutes <= 0 or 1440 % bucket_minutes:
+        raise ValueError(f"Invalid bucket minutes: {bucket_minutes}")
+
+    if end <= start:
+        return []
+
+    bucket: timedelta = timedelta(minutes=bucket_minutes)
+    spans: list[DaySpan] = []
+
+    day: date = start.date()
+    while True:
+        day_start: datetime = datetime.combine(day, time.min, start.tzinfo)
+        day_end: datetime = day_start + timedelta(days=1)
+
+        span_start: datetime = max(start, day_start)
+        span_end: datetime = min(end, day_end)
+
+        # Partial buckets are measured with datetime arithmetic, so they keep microsecond precision
+        first_bucket: int = (span_start - day_start) // bucket
+        last_bucket: int = math.ceil((span_end - day_start) / bucket) - 1
+
+        durations = array("d", (bucket.total_seconds(),)) * (last_bucket - first_bucket + 1)
+        durations[0] = (min(span_end, day_start + (first_bucket + 1) * bucket) - span_start).total_seconds()
+        durations[-1] = (span_end - max(span_start, day_start + last_bucket * bucket)).total_seconds()
+
+        spans.append(DaySpan(day, first_bucket, durations))
+
+        if end <= day_end:
+            return spans
+        day += timedelta(days=1)
@@ -0,0 +1,131 @@
+import re
+import json
+import sqlite3
+import threading
+
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from typing import Any
+
+class QueryProfiler:
+    # Collects per statement timings for SQLiteWrapper. Statements are grouped by their normalized SQL.
+
+    class _StatementStats:
+        def __init__(self, max_samples: int):
+            self.calls: int = 0
+            self.rows: int = 0
+            self.total_time: float = 0
+            self.max_time: float = 0
+            self.lock_wait: float = 0
+            self.samples: deque[float] = deque(maxlen=max_samples)
+            self.plan: list[str] | None = None
+
+    def __init__(self, slow_query_threshold: float | None = None, explain_query_plan: bool = False, max_samples: int = 1000, max_slow_queries: int = 100):
+        self.slow_query_threshold = slow_query_threshold
+        self.explain_query_plan = explain_query_plan
+
+        self._max_samples = max_samples
+        self._statements: dict[str, QueryProfiler._StatementStats] = dict()
+        self._slow_queries: deque[dict[str, Any]] = deque(maxlen=max_slow_queries)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        # Collapses whitespace and placeholder lists, so IN (?, ?, ?) and IN (?, ?) count as one statement
+        query = " ".join(query.split())
+        return re.sub(r"\?(\s*,\s*\?)+", "?, ...", query)
+
+    @staticmethod
+    def _percentile(sorted_samples: list[float], percentile: float) -> float:
+        if not sorted_samples:
+            return 0
+        index = min(len(sorted_samples) - 1, int(percentile * len(sorted_samples)))
+        return sorted_samples[index]
+
+    def needs_plan(self, statement: str) -> bool:
+        if not self.explain_query_plan:
+            return False
+
+        with self._lock:
+            stats = self._statements.get(statement)
+            return stats is None or stats.plan is None
+
+    def explain(self, conn: sqlite3.Connection, query: str, params: tuple) -> list[str]:
+        try:
+            return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()]
+        except sqlite3.Error as e:
+            return [f"Unavailable: {e}"]
+
+    def record(self, statement: str, execution_time: float, lock_wait: float, rows: int, plan: list[str] | None = None) -> None:
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                stats = QueryProfiler._StatementStats(self._max_samples)
+                self._statements[statement] = stats
+
+            stats.calls += 1
+            stats.rows += rows
+            stats.total_time += execution_time
+            stats.max_time = max(stats.max_time, execution_time)
+            stats.lock_wait += lock_wait
+            stats.samples.append(execution_time)
+            if plan is not None:
+                stats.plan = plan
+
+            if self.slow_query_threshold is not None and execution_time + lock_wait >= self.slow_query_threshold:
+                self._slow_queries.append({
+                    "timestamp": datetime.now().isoformat(),
+                    "statement": statement,
+                    "execution_time": execution_time,
+                    "lock_wait": lock_wait,
+                    "rows": rows
+                })
+
+    def slow_queries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return list(self._slow_queries)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        # Statement stats sorted by total execution time, slowest first
+
+        with self._lock:
+            statements = list(self._statements.items())
+
+        result = dict()
+        for statement, stats in sorted(statements, key=lambda item: item[1].total_time, reverse=True):
+            samples = sorted(stats.samples)
+            result[statement] = {
+                "calls": stats.calls,
+                "rows": stats.rows,
+                "total_time": stats.total_time,
+                "p50": self._percentile(samples, 0.5),
+                "p99": self._percentile(samples, 0.99),
+                "max_time": stats.max_time,
+                "lock_wait": stats.lock_wait
+            }
+            if stats.plan is not None:
+                result[statement]["plan"] = stats.plan
+
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._slow_queries.clear()
+
+    def export(self, path: str, metadata: dict[str, Any] | None = None) -> None:
+        # Writes stats as JSON, so runs can be compared across releases
+
+        report = {
+            "created": datetime.now().isoformat(),
+            "sqlite_version": sqlite3.sqlite_version,
+            **(metadata or {}),
+            "statements": self.stats(),
+            "slow_queries": self.slow_queries()
+        }
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(report, file, indent=4)
\ No newline at end of file
@@ -1,7 +1,16 @@
+import os
+import sqlite3
+
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
 from typing import Any
 
 import settings
-from Include.wrapper.sqlite_wrapper import SQLiteWrapper
+from settings import FocusLayout, HistoryResolution
+from Include.wrapper.sqlite_wrapper import SQLiteWrapper, RowFactory
+from Include.query_profiler import QueryProfiler
 
 class UsagedataService:
     _day_log_columns: tuple = (
@@ -28,38 +37,438 @@ class UsagedataService:
         "focus_count"
     )
 
-    def __init__(self, usagedata_dir: str):
-        self._db = SQLiteWrapper(usagedata_dir)
+    # Sets for validating keys without Python loops, app data also carries its titles
+    _app_log_keys: frozenset = frozenset(_app_log_columns + ("titles",))
+    _title_log_keys: frozenset = frozenset(_title_log_columns)
+    _focus_period_keys: frozenset = frozenset(_focus_period_columns)
+
+    # Vector layout stores one slot per hour of the day, 4 bytes each
+    _empty_vector: bytes = bytes(24 * 4)
+
+    # Day logs with journal ticks not yet derived into the aggregate tables
+    _pending_ticks_condition: str = """
+        EXISTS (
+            SELECT 1 FROM tick_journal
+            WHERE tick_journal.day_log_id = day_log.id
+            AND tick_journal.id > COALESCE((SELECT tick_id FROM journal_watermark WHERE journal_watermark.day_log_id = day_log.id), 0)
+        )
+    """
+
+    # Schema version kept in PRAGMA user_version, each migration upgrades from the version before it.
+    # Versions that only add tables have no migration, schema.sql creates them.
+    _schema_version: int = 6
+    _migrations: dict[int, str] = {
+        1: "001_intern_names.sql"
+    }
+
+    def __init__(self, usagedata_dir: str, write_behind: bool = False, read_only: bool = False):
+        profiler: QueryProfiler | None = None
+        if settings.sqlite_profiling:
+            profiler = QueryProfiler(
+                slow_query_threshold = settings.sqlite_slow_query_threshold.total_seconds(),
+                explain_query_plan = settings.sqlite_explain_query_plan
+            )
+
+        self._db = SQLiteWrapper(
+            usagedata_dir,
+            pooled = settings.sqlite_pooled,
+            health_check_interval = settings.sqlite_health_check_interval.total_seconds(),
+            write_behind = write_behind,
+            flush_interval = settings.sqlite_flush_interval.total_seconds(),
+            profiler = profiler,
+            # Incremental vacuum lets maintenance reclaim pages freed by deleted day logs
+            pragmas = {**settings.sqlite_profiles[settings.sqlite_profile], "auto_vacuum": "INCREMENTAL"},
+            statement_cache_size = settings.sqlite_statement_cache_size,
+            read_only = read_only
+        )
+
+        self.focus_layout: FocusLayout = settings.focus_layout
+
+        # Interning caches, app and title names to their ids in the app and title tables
+        self._app_ids: dict[str, int] = dict()
+        self._title_ids: dict[str, int] = dict()
+
+        # Apps whose executable path is already journaled, by day log
+        self._journal_apps: set[tuple[int, str]] = set()
+
+        # App and title ids already referenced by journaled ticks, by day log
+        self._journal_app_ids: set[tuple[int, int]] = set()
+        self._journal_title_ids: set[tuple[int, int]] = set()
+
+        # Queries are built once, keyed by column subset or placeholder count.
+        # Per tick calls skip string building and column validation, and hit the connection's prepared statement cache.
+        self._latest_daylog_queries: dict[tuple[str, ...], str] = dict()
+        self._daylog_queries: dict[tuple[str, ...], str] = dict()
+        self._update_latest_daylog_queries: dict[tuple[str, ...], str] = dict()
+        self._update_daylog_queries: dict[tuple[str, ...], str] = dict()
+        self._totalduration_queries: dict[int, str] = dict()
+        self._weighted_totaldurations_queries: dict[int, str] = dict()
+        self._days_queries: dict[tuple[int, bool], tuple[str, str]] = dict()
+
+        self._get_latest_daylog_query(UsagedataService._day_log_columns)
+        self._get_daylog_query(UsagedataService._day_log_columns)
+        self._get_update_latest_daylog_query(UsagedataService._day_log_columns)
+        self._get_update_daylog_query(UsagedataService._day_log_columns)
+        for day_count in range(1, settings.max_logs + 1):
+            self._get_totalduration_query(day_count)
+
+    @staticmethod
+    def _validate_day_log_columns(columns: tuple[str, ...]) -> None:
+        for column in columns:
+            if column not in UsagedataService._day_log_columns:
+                raise ValueError(f"Invalid column name: {column}")
+
+    @staticmethod
+    def _validate_focus_periods(focus_periods: dict[int, dict[str, int | float]]) -> None:
+        for hour, focus_data in focus_periods.items():
+            if hour < 0 or hour > 23:
+                raise ValueError(f"Invalid hour: {hour}")
+            
+            invalid_columns = focus_data.keys() - UsagedataService._focus_period_keys
+            if invalid_columns:
+                raise ValueError(f"Invalid column name: {next(iter(invalid_columns))}")
+
+            focus_duration = focus_data.get("focus_duration", 0)
+            if focus_duration < 0 or focus_duration > 3600:
+                raise ValueError(f"Invalid duration: {focus_duration}")
+
+            focus_count = focus_data.get("focus_count", 0)
+            if focus_count < 0:
+                raise ValueError(f"Invalid focus count: {focus_count}")
+
+    @staticmethod
+    def _validate_downtime_periods(hour_durations: dict[int, float]) -> None:
+        for hour, duration in hour_durations.items():
+            if hour < 0 or hour > 23:
+                raise ValueError(f"Invalid hour: {hour}")
+            if duration < 0 or duration > 3600:
+                raise ValueError(f"Invalid duration: {duration}")
+
+    @staticmethod
+    def _pack_focus_vector(focus_periods: dict[int, dict[str, int | float]]) -> tuple[bytes, bytes]:
+        focus_durations = array("f", UsagedataService._empty_vector)
+        focus_counts = array("i", UsagedataService._empty_vector)
+        for hour, focus_data in focus_periods.items():
+            focus_durations[hour] = focus_data.get("focus_duration", 0)
+            focus_counts[hour] = focus_data.get("focus_count", 0)
+
+        return focus_durations.tobytes(), focus_counts.tobytes()
+
+    @staticmethod
+    def _unpack_focus_vector(focus_durations: bytes, focus_counts: bytes) -> dict[int, dict[str, int | float]]:
+        # Hours without focus are left out, like hours without a row in the rows layout
+        return {
+            hour: {'focus_duration': focus_duration, 'focus_count': focus_count}
+            for hour, (focus_duration, focus_count) in enumerate(zip(memoryview(focus_durations).cast("f"), memoryview(focus_counts).cast("i")))
+            if focus_duration or focus_count
+        }
+
+    @staticmethod
+    def _pack_downtime_vector(hour_durations: dict[int, float]) -> bytes:
+        downtime_durations = array("f", UsagedataService._empty_vector)
+        for hour, duration in hour_durations.items():
+            downtime_durations[hour] = duration
+
+        return downtime_durations.tobytes()
+
+    @staticmethod
+    def _unpack_downtime_vector(downtime_durations: bytes) -> dict[int, float]:
+        return {hour: duration for hour, duration in enumerate(memoryview(downtime_durations).cast("f")) if duration}
+
+    def _intern(self, table: str, ids: dict[str, int], names: Iterable[str]) -> None:
+        # Adds names missing from the table and caches their ids, names already cached cost nothing
+        missing = [name for name in set(names) if name not in ids]
+        if not missing:
+            return
+
+        self._db.execute_many(f"INSERT INTO {table} (name) VALUES (?) ON CONFLICT(name) DO NOTHING", [(name,) for name in missing])
+        self._cache_ids(table, ids, missing)
+
+    def _cache_ids(self, table: str, ids: dict[str, int], names: list[str]) -> None:
+        # Batches stay under SQLite's bound parameter limit
+        for i in range(0, len(names), 500):
+            batch = names[i:i + 500]
+            query = f"SELECT name, id FROM {table} WHERE name IN ({','.join(['?'] * len(batch))})"
+            ids.update(self._db.fetchall(query, tuple(batch), RowFactory.TUPLE))
+
+    def _get_app_id(self, app_name: str) -> int | None:
+        if app_name not in self._app_ids:
+            self._cache_ids("app", self._app_ids, [app_name])
+        return self._app_ids.get(app_name)
+
+    def _get_title_id(self, title_name: str) -> int | None:
+        if title_name not in self._title_ids:
+            self._cache_ids("title", self._title_ids, [title_name])
+        return self._title_ids.get(title_name)
+
+    def _require_app_id(self, app_name: str) -> int:
+        app_id = self._get_app_id(app_name)
+        if app_id is None:
+            raise ValueError(f"App name '{app_name}' not found.")
+        return app_id
+
+    def _require_title_id(self, title_name: str) -> int:
+        title_id = self._get_title_id(title_name)
+        if title_id is None:
+            raise ValueError(f"Title name '{title_name}' not found.")
+        return title_id
+
+    def clear_name_cache(self) -> None:
+        self._app_ids.clear()
+        self._title_ids.clear()
+        self._journal_apps.clear()
+        self._journal_app_ids.clear()
+        self._journal_title_ids.clear()
+
+    def prune_names(self) -> None:
+        # Removes names no longer used by any day log, summary or journaled tick, e.g. after the oldest day log is removed
+        with self._db.transaction() as tx:
+            tx.execute("DELETE FROM title WHERE id NOT IN (SELECT title_id FROM title_log UNION SELECT title_id FROM journal_title)")
+            tx.execute("""
+                DELETE FROM app WHERE id NOT IN (
+                    SELECT app_id FROM app_log
+                    UNION SELECT app_id FROM daily_app_summary
+                    UNION SELECT app_id FROM monthly_app_summary
+                    UNION SELECT app_id FROM journal_app
+                )
+            """)
+        self.clear_name_cache()
+
+    def _get_latest_daylog_query(self, columns: tuple[str, ...]) -> str:
+        query = self._latest_daylog_queries.get(columns)
+        if query is None:
+            UsagedataService._validate_day_log_columns(columns)
+            query = f"SELECT {', '.join(columns)} FROM day_log ORDER BY id DESC LIMIT 1"
+            self._latest_daylog_queries[columns] = query
+
+        return query
+
+    def _get_daylog_query(self, columns: tuple[str, ...]) -> str:
+        query = self._daylog_queries.get(columns)
+        if query is None:
+            UsagedataService._validate_day_log_columns(columns)
+            query = f"SELECT {', '.join(columns)} FROM day_log WHERE id = ?"
+            self._daylog_queries[columns] = query
+
+        return query
+
+    def _get_update_latest_daylog_query(self, columns: tuple[str, ...]) -> str:
+        query = self._update_latest_daylog_queries.get(columns)
+        if query is None:
+            UsagedataService._validate_day_log_columns(columns)
+            query = f"""
+                UPDATE day_log SET {', '.join(column + " = ?" for column in columns)}
+                WHERE id = (SELECT id FROM day_log ORDER BY id DESC LIMIT 1);
+            """
+            self._update_latest_daylog_queries[columns] = query
+
+        return query
+
+    def _get_update_daylog_query(self, columns: tuple[str, ...]) -> str:
+        query = self._update_daylog_queries.get(columns)
+        if query is None:
+            UsagedataService._validate_day_log_columns(columns)
+            query = f"""
+                UPDATE day_log SET {', '.join(column + " = ?" for column in columns)}
+                WHERE id = ?;
+            """
+            self._update_daylog_queries[columns] = query
+
+        return query
+
+    def _get_totalduration_query(self, day_count: int) -> str:
+        query = self._totalduration_queries.get(day_count)
+        if query is None:
+            day_placeholders = ','.join(['?'] * day_count)
+            query = f"""
+                SELECT SUM(total_duration) AS total_duration_sum
+                FROM app_log
+                WHERE app_id = ? AND day_log_id IN ({day_placeholders})
+            """
+            self._totalduration_queries[day_count] = query
+
+        return query
+
+    def _get_weighted_totaldurations_query(self, app_count: int) -> str:
+        query = self._weighted_totaldurations_queries.get(app_count)
+        if query is None:
+            # Today comes from the latest day log's app logs, history from the rollups
+            query = f"""
+                SELECT app.name,
+                    ? * COALESCE(app_log.total_duration, 0) + ? * COALESCE(app_rollup.total_duration, 0)
+                FROM app
+                LEFT JOIN app_log ON app_log.app_id = app.id AND app_log.day_log_id = (SELECT MAX(id) FROM day_log)
+                LEFT JOIN app_rollup ON app_rollup.app_id = app.id
+                WHERE app.name IN ({','.join(['?'] * app_count)})
+            """
+            self._weighted_totaldurations_queries[app_count] = query
+
+        return query
+
+    def _get_days_queries(self, day_count: int, titles: bool) -> tuple[str, str]:
+        queries = self._days_queries.get((day_count, titles))
+        if queries is None:
+            day_placeholders = ','.join(['?'] * day_count)
+            day_log_query = f"""
+                SELECT id, {', '.join(UsagedataService._day_log_columns)} FROM day_log
+                WHERE id IN ({day_placeholders})
+            """
+
+            # Every table is read in one pass. The first column tells which table a row came from,
+            # rows are sorted by it so apps and titles arrive before their focus periods, then by hour.
+            # With the vectors layout, focus and downtime rows carry whole vectors instead of one hour.
+            if self.focus_layout == FocusLayout.VECTORS:
+                focus_parts = [
+                    "SELECT 2, day_log_id, app.name, NULL, NULL, NULL, focus_durations, focus_counts FROM app_focus_vector JOIN app ON app.id = app_id WHERE day_log_id IN (SELECT id FROM days)",
+                    "SELECT 4, day_log_id, NULL, NULL, NULL, NULL, downtime_durations, NULL FROM downtime_vector WHERE day_log_id IN (SELECT id FROM days)",
+                    "SELECT 3, day_log_id, app.name, title.name, NULL, NULL, focus_durations, focus_counts FROM title_focus_vector JOIN app ON app.id = app_id JOIN title ON title.id = title_id WHERE day_log_id IN (SELECT id FROM days)"
+                ]
+            else:
+                focus_parts = [
+                    "SELECT 2, day_log_id, app.name, NULL, day_hour, NULL, focus_duration, focus_count FROM app_focus_period JOIN app ON app.id = app_id WHERE day_log_id IN (SELECT id FROM days)",
+                    "SELECT 4, day_log_id, NULL, NULL, day_hour, NULL, downtime_duration, NULL FROM downtime_period WHERE day_log_id IN (SELECT id FROM days)",
+                    "SELECT 3, day_log_id, app.name, title.name, day_hour, NULL, focus_duration, focus_count FROM title_focus_period JOIN app ON app.id = app_id JOIN title ON title.id = title_id WHERE day_log_id IN (SELECT id FROM days)"
+                ]
+
+            parts = [
+                "SELECT 0, day_log_id, app.name, NULL, executable_path, total_duration, total_focus_duration, total_focus_count FROM app_log JOIN app ON app.id = app_id WHERE day_log_id IN (SELECT id FROM days)",
+                *focus_parts[:2]
+            ]
+            if titles:
+                parts += [
+                    "SELECT 1, day_log_id, app.name, title.name, NULL, total_duration, total_focus_duration, total_focus_count FROM title_log JOIN app ON app.id = app_id JOIN title ON title.id = title_id WHERE day_log_id IN (SELECT id FROM days)",
+                    focus_parts[2]
+                ]
+            usage_query = f"""
+                WITH days(id) AS (SELECT id FROM day_log WHERE id IN ({day_placeholders}))
+                {' UNION ALL '.join(parts)}
+                ORDER BY 1, 5
+            """
+
+            queries = (day_log_query, usage_query)
+            self._days_queries[(day_count, titles)] = queries
+
+        return queries
+
+    def close(self) -> None:
+        self._db.close()
+
+    def flush(self) -> None:
+        self._db.flush()
+
+    def interrupt(self, thread_id: int) -> None:
+        self._db.interrupt(thread_id)
+
+    def in_snapshot(self) -> bool:
+        return self._db.in_snapshot()
+
+    @contextmanager
+    def snapshot(self) -> Iterator[None]:
+        # Service reads made on this thread inside the block see one state of the database
+        with self._db.snapshot():
+            yield
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # Service calls made on this thread inside the block commit together
+        with self._db.transaction():
+            yield
+
+    def get_query_stats(self) -> dict[str, dict[str, Any]]:
+        if self._db.profiler is None:
+            raise RuntimeError("Query profiling is disabled.")
+
+        return self._db.profiler.stats()
+
+    def export_query_stats(self, path: str, metadata: dict[str, Any] | None = None) -> None:
+        if self._db.profiler is None:
+            raise RuntimeError("Query profiling is disabled.")
+
+        self._db.profiler.export(path, metadata)
 
     def create_if_not_exists_schema(self) -> None:
+        schema_version = self._db.fetchone("PRAGMA user_version")[0]
+
+        # Existing databases are upgraded one version at a time, new databases start at the latest version
+        if schema_version < UsagedataService._schema_version and self._db.fetchone("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'day_log'"):
+            for version, migration in sorted(UsagedataService._migrations.items()):
+                if version > schema_version:
+                    self._db.execute_script(os.path.join(settings.migrations_dir, migration))
+
+        # Also stamps the database with the latest version
         self._db.execute_script(settings.schema_dir)
 
+        # Journals from before version 6 have no name references, they are read back from the journaled ticks
+        if 4 <= schema_version < 6:
+            self._reference_journal_names()
+
+    def _reference_journal_names(self) -> None:
+        app_ids: set[tuple[int, int]] = set()
+        title_ids: set[tuple[int, int]] = set()
+        for day_log_id, active_app_id, active_title_id, open_windows in self._db.iterate("SELECT day_log_id, active_app_id, active_title_id, open_windows FROM tick_journal", (), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            ids = memoryview(open_windows).cast("i")
+            app_ids.update((day_log_id, app_id) for app_id in ids[::2])
+            title_ids.update((day_log_id, title_id) for title_id in ids[1::2] if title_id != -1)
+            if active_app_id is not None:
+                app_ids.add((day_log_id, active_app_id))
+            if active_title_id is not None:
+                title_ids.add((day_log_id, active_title_id))
+
+        with self._db.transaction() as tx:
+            tx.execute_many("INSERT OR IGNORE INTO journal_app (day_log_id, app_id) VALUES (?, ?)", list(app_ids))
+            tx.execute_many("INSERT OR IGNORE INTO journal_title (day_log_id, title_id) VALUES (?, ?)", list(title_ids))
+
+    def check_schema_version(self) -> None:
+        # Read-only clients cannot migrate, an outdated database is upgraded by the writer
+        schema_version = self._db.fetchone("PRAGMA user_version")[0]
+        if schema_version < UsagedataService._schema_version:
+            raise RuntimeError(f"Usage data schema version {schema_version} is older than {UsagedataService._schema_version}, run observe to upgrade it.")
+
+    def incremental_vacuum_enabled(self) -> bool:
+        result = self._db.fetchone("PRAGMA auto_vacuum")
+
+        # 2 is INCREMENTAL
+        return bool(result) and result[0] == 2
+
+    def enable_incremental_vacuum(self) -> None:
+        # Switching an existing database to incremental vacuum requires a full VACUUM
+        self._db.execute_maintenance("PRAGMA auto_vacuum=INCREMENTAL;")
+        self._db.execute_maintenance("VACUUM;")
+
+    def checkpoint(self, truncate: bool = False, busy_timeout: float | None = None) -> tuple[int, int, int]:
+        # Returns (busy, WAL frames, checkpointed frames). Passive checkpoints never wait, truncating waits for readers up to busy_timeout.
+        result = self._db.execute_maintenance(f"PRAGMA wal_checkpoint({'TRUNCATE' if truncate else 'PASSIVE'});", busy_timeout)
+
+        return tuple(result[0]) if result else (0, 0, 0)
+
+    def get_freelist_count(self) -> int:
+        result = self._db.fetchone("PRAGMA freelist_count")
+
+        return result[0] if result else 0
+
+    def incremental_vacuum(self, pages: int, busy_timeout: float | None = None) -> None:
+        if pages <= 0:
+            raise ValueError(f"Invalid page count: {pages}")
+
+        self._db.execute_maintenance(f"PRAGMA incremental_vacuum({int(pages)});", busy_timeout)
+
+    def get_wal_size(self) -> int:
+        wal_path = f"{self._db.db_path}-wal"
+
+        return os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+
     def add_daylog(self, time_anchor: str, monotonic_anchor: float) -> None:
         query = "INSERT INTO day_log (time_anchor, monotonic_start, monotonic_last_updated) VALUES (?, ?, ?)"
         self._db.execute(query, (time_anchor, monotonic_anchor, monotonic_anchor))
 
     def get_latest_daylog(self, columns: tuple[str] | None = None) -> dict[str, str | int | float]:
-        if columns:
-            for column in columns:
-                if column not in UsagedataService._day_log_columns:
-                    raise ValueError(f"Invalid column name: {column}")
-        else:
-            columns = UsagedataService._day_log_columns
-
-        query = f"SELECT {', '.join(columns)} FROM day_log ORDER BY id DESC LIMIT 1"
+        query = self._get_latest_daylog_query(tuple(columns) if columns else UsagedataService._day_log_columns)
         result = self._db.fetchone(query)
 
         return dict(result) if result else dict()
     
     def get_daylog(self, id: int, columns: tuple[str] | None = None) -> dict[str, str | int | float]:
-        if columns:
-            for column in columns:
-                if column not in UsagedataService._day_log_columns:
-                    raise ValueError(f"Invalid column name: {column}")
-        else:
-            columns = UsagedataService._day_log_columns
-
-        query = f"SELECT {', '.join(columns)} FROM day_log WHERE id = ?"
+        query = self._get_daylog_query(tuple(columns) if columns else UsagedataService._day_log_columns)
         result = self._db.fetchone(query, (id,))
 
         return dict(result) if result else dict()
@@ -72,9 +481,9 @@ class UsagedataService:
 
     def get_daylog_ids(self) -> list[int]:
         query = "SELECT id FROM day_log ORDER BY id ASC"
-        result = self._db.fetchall(query)
+        result = self._db.fetchall(query, row_factory=RowFactory.TUPLE)
 
-        return [row[0] for row in result] if result else []
+        return [row[0] for row in result]
 
     def get_daylog_rowcount(self) -> int:
         query = "SELECT COUNT(*) FROM day_log"
@@ -82,48 +491,136 @@ class UsagedataService:
 
         return result[0] if result else 0
     
-    def get_applog_titlelog(self, day_log_id: int) -> dict[str, dict[str, int | float | dict[str, str | int | float]]]:
+    def iterate_applog_titlelog(self, day_log_id: int) -> Iterator[tuple[str, dict[str, int | float | dict[str, str | int | float]]]]:
+        # Yields one app at a time with its titles, rows are streamed in batches instead of loaded at once
+
         query = """
             SELECT 
-                app_log.app_name,
+                app.name,
                 app_log.executable_path,
                 app_log.total_duration AS app_total_duration,
                 app_log.total_focus_duration AS app_total_focus_duration,
                 app_log.total_focus_count AS app_total_focus_count,
-                title_log.title_name,
+                title.name,
                 title_log.total_duration AS title_total_duration,
                 title_log.total_focus_duration AS title_total_focus_duration,
                 title_log.total_focus_count AS title_total_focus_count
             FROM app_log
+            JOIN app ON app.id = app_log.app_id
             LEFT JOIN title_log 
                 ON app_log.day_log_id = title_log.day_log_id 
-            AND app_log.app_name = title_log.app_name
+            AND app_log.app_id = title_log.app_id
+            LEFT JOIN title ON title.id = title_log.title_id
             WHERE app_log.day_log_id = ?
+            ORDER BY app_log.app_id
         """
 
-        result = self._db.fetchall(query, (day_log_id,))
-        
-        if not result:
+        # Rows are plain tuples, unpacked in the order of the select list
+        app_name = None
+        app_data = None
+        for row_app_name, executable_path, app_total_duration, app_total_focus_duration, app_total_focus_count, title_name, title_total_duration, title_total_focus_duration, title_total_focus_count in self._db.iterate(query, (day_log_id,), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            if row_app_name != app_name:
+                if app_data is not None:
+                    yield app_name, app_data
+
+                app_name = row_app_name
+                app_data = {
+                    'executable_path': executable_path,
+                    'total_duration': app_total_duration,
+                    'total_focus_duration': app_total_focus_duration,
+                    'total_focus_count': app_total_focus_count,
+                    'titles': {}
+                }
+            app_data['titles'][title_name] = {
+                'total_duration': title_total_duration,
+                'total_focus_duration': title_total_focus_duration,
+                'total_focus_count': title_total_focus_count
+            }
+
+        if app_data is not None:
+            yield app_name, app_data
+
+    # day dict structure
+    # {
+    #   "time_anchor", "monotonic_start", ... (day log columns),
+    #   "downtime_period": {hour: downtime_duration},
+    #   "apps": {
+    #       "app_name": {
+    #           "executable_path", "total_duration", "total_focus_duration", "total_focus_count",
+    #           "hourly_focus_data": {hour: {"focus_duration": float, "focus_count": integer}},
+    #           "titles": {
+    #               "title_name": {
+    #                   "total_duration", "total_focus_duration", "total_focus_count",
+    #                   "hourly_focus_data": {hour: {"focus_duration": float, "focus_count": integer}}
+    #               }
+    #           }
+    #       }
+    #   }
+    # }
+    def get_days(self, day_log_ids: tuple[int], titles: bool = True) -> dict[int, dict]:
+        # Loads whole days in two queries, however many apps and titles they have.
+        # Titles and their focus periods are skipped when titles is False.
+        if not day_log_ids:
             return dict()
 
-        apps_titles = dict()
-        for row in result:
-            app_name = row['app_name']
-            if app_name not in apps_titles:
-                apps_titles[app_name] = {
-                    'executable_path': row['executable_path'],
-                    'total_duration': row['app_total_duration'],
-                    'total_focus_duration': row['app_total_focus_duration'],
-                    'total_focus_count': row['app_total_focus_count'],
+        day_log_query, usage_query = self._get_days_queries(len(day_log_ids), titles)
+
+        # Both queries read the same state, so a day never mixes ticks
+        with self._db.snapshot():
+            return self._load_days(day_log_ids, day_log_query, usage_query)
+
+    def _load_days(self, day_log_ids: tuple[int], day_log_query: str, usage_query: str) -> dict[int, dict]:
+        vectors = self.focus_layout == FocusLayout.VECTORS
+
+        days = dict()
+        for day_log_id, *values in self._db.fetchall(day_log_query, tuple(day_log_ids), RowFactory.TUPLE):
+            days[day_log_id] = dict(zip(UsagedataService._day_log_columns, values))
+            days[day_log_id]["downtime_period"] = dict()
+            days[day_log_id]["apps"] = dict()
+
+        for source, day_log_id, app_name, title_name, detail, total_duration, duration, count in self._db.iterate(usage_query, tuple(day_log_ids), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            day = days.get(day_log_id)
+            if day is None:
+                # Day log was added after the day logs were read
+                continue
+
+            if source == 0:
+                day["apps"][app_name] = {
+                    'executable_path': detail,
+                    'total_duration': total_duration,
+                    'total_focus_duration': duration,
+                    'total_focus_count': count,
+                    'hourly_focus_data': {},
                     'titles': {}
                 }
-            apps_titles[app_name]['titles'][row['title_name']] = {
-                'total_duration': row['title_total_duration'],
-                'total_focus_duration': row['title_total_focus_duration'],
-                'total_focus_count': row['title_total_focus_count']
-            }
+            elif source == 1:
+                day["apps"][app_name]['titles'][title_name] = {
+                    'total_duration': total_duration,
+                    'total_focus_duration': duration,
+                    'total_focus_count': count,
+                    'hourly_focus_data': {}
+                }
+            elif vectors:
+                if source == 2:
+                    day["apps"][app_name]['hourly_focus_data'] = UsagedataService._unpack_focus_vector(duration, count)
+                elif source == 3:
+                    day["apps"][app_name]['titles'][title_name]['hourly_focus_data'] = UsagedataService._unpack_focus_vector(duration, count)
+                else:
+                    day["downtime_period"] = UsagedataService._unpack_downtime_vector(duration)
+            elif source == 2:
+                day["apps"][app_name]['hourly_focus_data'][detail] = {'focus_duration': duration, 'focus_count': count}
+            elif source == 3:
+                day["apps"][app_name]['titles'][title_name]['hourly_focus_data'][detail] = {'focus_duration': duration, 'focus_count': count}
+            else:
+                day["downtime_period"][detail] = duration
+
+        return days
+
+    def get_day(self, day_log_id: int, titles: bool = True) -> dict:
+        return self.get_days((day_log_id,), titles).get(day_log_id, dict())
 
-        return apps_titles
+    def get_applog_titlelog(self, day_log_id: int) -> dict[str, dict[str, int | float | dict[str, str | int | float]]]:
+        return dict(self.iterate_applog_titlelog(day_log_id))
 
     def get_latest_applog_titlelog(self) -> dict[str, dict[str, int | float | dict[str, str | int | float]]]:
         latest_day_log_id = self.get_latest_daylog_id()
@@ -137,11 +634,15 @@ class UsagedataService:
         if not latest_day_log_id:
             return False
 
+        app_id = self._get_app_id(app_name)
+        if app_id is None:
+            return False
+
         query = """
             SELECT 1 FROM app_log
-            WHERE day_log_id = ? AND app_name = ?
+            WHERE day_log_id = ? AND app_id = ?
         """
-        result = self._db.fetchone(query, (latest_day_log_id, app_name))
+        result = self._db.fetchone(query, (latest_day_log_id, app_id))
 
         return bool(result)
 
@@ -150,11 +651,16 @@ class UsagedataService:
         if not latest_day_log_id:
             return False
 
+        app_id = self._get_app_id(app_name)
+        title_id = self._get_title_id(title_name)
+        if app_id is None or title_id is None:
+            return False
+
         query = """
             SELECT 1 FROM title_log
-            WHERE day_log_id = ? AND app_name = ? AND title_name = ?
+            WHERE day_log_id = ? AND app_id = ? AND title_id = ?
         """
-        result = self._db.fetchone(query, (latest_day_log_id, app_name, title_name))
+        result = self._db.fetchone(query, (latest_day_log_id, app_id, title_id))
 
         return bool(result)
 
@@ -163,22 +669,37 @@ class UsagedataService:
         if not latest_day_log_id:
             return dict()
 
+        return self.get_downtimeperiod(latest_day_log_id)
+
+    def get_downtimeperiod(self, day_log_id: int) -> dict[int, float]:
+        if self.focus_layout == FocusLayout.VECTORS:
+            result = self._db.fetchone("SELECT downtime_durations FROM downtime_vector WHERE day_log_id = ?", (day_log_id,), RowFactory.TUPLE)
+
+            return UsagedataService._unpack_downtime_vector(result[0]) if result else dict()
+
         query = """
             SELECT day_hour, downtime_duration FROM downtime_period
             WHERE day_log_id = ?
         """
-        result = self._db.fetchall(query, (latest_day_log_id,))
+        result = self._db.fetchall(query, (day_log_id,), RowFactory.TUPLE)
 
-        return {row[0]: row[1] for row in result} if result else dict()
+        return dict(result)
 
     def get_appfocusperiod(self, day_log_id: int, app_name: str) -> dict[int, dict[str, int | float]]:
+        if self.focus_layout == FocusLayout.VECTORS:
+            return UsagedataService._unpack_focus_vector(*self._fetch_appfocusvector(day_log_id, app_name))
+
+        app_id = self._get_app_id(app_name)
+        if app_id is None:
+            return dict()
+
         query = """
             SELECT day_hour, focus_duration, focus_count FROM app_focus_period
-            WHERE day_log_id = ? AND app_name = ?
+            WHERE day_log_id = ? AND app_id = ?
         """
-        result = self._db.fetchall(query, (day_log_id, app_name))
+        result = self._db.fetchall(query, (day_log_id, app_id), RowFactory.TUPLE)
 
-        return {row[0]: {'focus_duration': row[1], 'focus_count': row[2]} for row in result} if result else dict()
+        return {day_hour: {'focus_duration': focus_duration, 'focus_count': focus_count} for day_hour, focus_duration, focus_count in result}
 
     def get_latest_appfocusperiod(self, app_name: str) -> dict[int, dict[str, int | float]]:
         latest_day_log_id = self.get_latest_daylog_id()
@@ -188,13 +709,21 @@ class UsagedataService:
         return self.get_appfocusperiod(latest_day_log_id, app_name)
     
     def get_titlefocusperiod(self, day_log_id: int, app_name: str, title_name: str) -> dict[int, dict[str, int | float]]:
+        if self.focus_layout == FocusLayout.VECTORS:
+            return UsagedataService._unpack_focus_vector(*self._fetch_titlefocusvector(day_log_id, app_name, title_name))
+
+        app_id = self._get_app_id(app_name)
+        title_id = self._get_title_id(title_name)
+        if app_id is None or title_id is None:
+            return dict()
+
         query = """
             SELECT day_hour, focus_duration, focus_count FROM title_focus_period
-            WHERE day_log_id = ? AND app_name = ? AND title_name = ?
+            WHERE day_log_id = ? AND app_id = ? AND title_id = ?
         """
-        result = self._db.fetchall(query, (day_log_id, app_name, title_name))
+        result = self._db.fetchall(query, (day_log_id, app_id, title_id), RowFactory.TUPLE)
 
-        return {row[0]: {'focus_duration': row[1], 'focus_count': row[2]} for row in result} if result else dict()
+        return {day_hour: {'focus_duration': focus_duration, 'focus_count': focus_count} for day_hour, focus_duration, focus_count in result}
 
     def get_latest_titlefocusperiod(self, app_name: str, title_name: str) -> dict[int, dict[str, int | float]]:
         latest_day_log_id = self.get_latest_daylog_id()
@@ -202,40 +731,80 @@ class UsagedataService:
             return dict()
 
         return self.get_titlefocusperiod(latest_day_log_id, app_name, title_name)
+
+    # Vector getters return 24 slot views indexed by hour, focus durations as float32 and focus counts as int32.
+    # With the vectors layout they view the stored BLOBs without copying, e.g. numpy.frombuffer(focus_durations, numpy.float32).
+    def get_downtimevector(self, day_log_id: int) -> memoryview:
+        if self.focus_layout == FocusLayout.VECTORS:
+            result = self._db.fetchone("SELECT downtime_durations FROM downtime_vector WHERE day_log_id = ?", (day_log_id,), RowFactory.TUPLE)
+            downtime_durations = result[0] if result else UsagedataService._empty_vector
+        else:
+            downtime_durations = UsagedataService._pack_downtime_vector(self.get_downtimeperiod(day_log_id))
+
+        return memoryview(downtime_durations).cast("f")
+
+    def _fetch_appfocusvector(self, day_log_id: int, app_name: str) -> tuple[bytes, bytes]:
+        app_id = self._get_app_id(app_name)
+        if app_id is None:
+            return UsagedataService._empty_vector, UsagedataService._empty_vector
+
+        query = "SELECT focus_durations, focus_counts FROM app_focus_vector WHERE day_log_id = ? AND app_id = ?"
+        result = self._db.fetchone(query, (day_log_id, app_id), RowFactory.TUPLE)
+
+        return result if result else (UsagedataService._empty_vector, UsagedataService._empty_vector)
+
+    def _fetch_titlefocusvector(self, day_log_id: int, app_name: str, title_name: str) -> tuple[bytes, bytes]:
+        app_id = self._get_app_id(app_name)
+        title_id = self._get_title_id(title_name)
+        if app_id is None or title_id is None:
+            return UsagedataService._empty_vector, UsagedataService._empty_vector
+
+        query = "SELECT focus_durations, focus_counts FROM title_focus_vector WHERE day_log_id = ? AND app_id = ? AND title_id = ?"
+        result = self._db.fetchone(query, (day_log_id, app_id, title_id), RowFactory.TUPLE)
+
+        return result if result else (UsagedataService._empty_vector, UsagedataService._empty_vector)
+
+    def get_appfocusvector(self, day_log_id: int, app_name: str) -> tuple[memoryview, memoryview]:
+        if self.focus_layout == FocusLayout.VECTORS:
+            focus_durations, focus_counts = self._fetch_appfocusvector(day_log_id, app_name)
+        else:
+            focus_durations, focus_counts = UsagedataService._pack_focus_vector(self.get_appfocusperiod(day_log_id, app_name))
+
+        return memoryview(focus_durations).cast("f"), memoryview(focus_counts).cast("i")
+
+    def get_titlefocusvector(self, day_log_id: int, app_name: str, title_name: str) -> tuple[memoryview, memoryview]:
+        if self.focus_layout == FocusLayout.VECTORS:
+            focus_durations, focus_counts = self._fetch_titlefocusvector(day_log_id, app_name, title_name)
+        else:
+            focus_durations, focus_counts = UsagedataService._pack_focus_vector(self.get_titlefocusperiod(day_log_id, app_name, title_name))
+
+        return memoryview(focus_durations).cast("f"), memoryview(focus_counts).cast("i")
     
     def get_totalduration(self, app_name: str, day_log_ids: tuple[int]) -> float:
-        def get_query() -> str:
-            day_placeholders = ','.join(['?'] * len(day_log_ids))
-
-            return f"""
-                SELECT SUM(total_duration) AS total_duration_sum
-                FROM app_log
-                WHERE app_name = ? AND day_log_id IN ({day_placeholders})
-            """
-        
         if not day_log_ids:
             return 0
         
-        result = self._db.fetchone(get_query(), (app_name, *day_log_ids))
-        return result[0] if result else 0
+        app_id = self._get_app_id(app_name)
+        if app_id is None:
+            return 0
+
+        # SUM over no rows is NULL
+        result = self._db.fetchone(self._get_totalduration_query(len(day_log_ids)), (app_id, *day_log_ids))
+        return (result[0] or 0) if result else 0
 
     def update_latest_daylog(self, column_values: dict[str, float | int]) -> None:
         if not column_values:
             return
 
-        columns = []
-        values = []
-        for column, value in column_values.items():
-            if column not in UsagedataService._day_log_columns:
-                raise ValueError(f"Invalid column name: {column}")
-            columns.append(column + " = ?")
-            values.append(value)
+        query = self._get_update_latest_daylog_query(tuple(column_values))
+        self._db.execute(query, tuple(column_values.values()))
 
-        query = f"""
-            UPDATE day_log SET {', '.join(columns)}
-            WHERE id = (SELECT id FROM day_log ORDER BY id DESC LIMIT 1);
-        """
-        self._db.execute(query, tuple(values))
+    def update_daylog(self, day_log_id: int, column_values: dict[str, float | int]) -> None:
+        if not column_values:
+            return
+
+        query = self._get_update_daylog_query(tuple(column_values))
+        self._db.execute(query, (*column_values.values(), day_log_id))
 
     def upsert_latest_applog_titlelog(self, apps_titles: dict[str, dict]) -> None:
         if not apps_titles:
@@ -245,37 +814,43 @@ class UsagedataService:
         if not latest_day_log_id:
             raise ValueError("No latest day log found.")
 
+        self.upsert_applog_titlelog(latest_day_log_id, apps_titles)
+
+    def upsert_applog_titlelog(self, day_log_id: int, apps_titles: dict[str, dict]) -> None:
+        if not apps_titles:
+            return
+
         app_log_query = """
-            INSERT INTO app_log (day_log_id, app_name, executable_path, total_duration, total_focus_duration, total_focus_count)
+            INSERT INTO app_log (day_log_id, app_id, executable_path, total_duration, total_focus_duration, total_focus_count)
             VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(day_log_id, app_name) DO UPDATE SET
+            ON CONFLICT(day_log_id, app_id) DO UPDATE SET
                 total_duration = excluded.total_duration,
                 total_focus_duration = excluded.total_focus_duration,
                 total_focus_count = excluded.total_focus_count
         """
 
         title_log_query = """
-            INSERT INTO title_log (day_log_id, app_name, title_name, total_duration, total_focus_duration, total_focus_count)
+            INSERT INTO title_log (day_log_id, app_id, title_id, total_duration, total_focus_duration, total_focus_count)
             VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(day_log_id, app_name, title_name) DO UPDATE SET
+            ON CONFLICT(day_log_id, app_id, title_id) DO UPDATE SET
                 total_duration = excluded.total_duration,
                 total_focus_duration = excluded.total_focus_duration,
                 total_focus_count = excluded.total_focus_count
         """
 
+        # Names are interned up front, so the logs below only store ids
+        self._intern("app", self._app_ids, apps_titles.keys())
+        self._intern("title", self._title_ids, {title_name for app_data in apps_titles.values() for title_name in app_data.get('titles', {})})
+
         app_values = []
         title_values = []
 
         for app_name, app_data in apps_titles.items():
-            titles = dict()
+            invalid_columns = app_data.keys() - UsagedataService._app_log_keys
+            if invalid_columns:
+                raise ValueError(f"Invalid column name: {next(iter(invalid_columns))}")
 
-            for app_column in app_data:
-                if app_column == 'titles':
-                    titles = app_data.get('titles', {})
-                    continue
-
-                if app_column not in UsagedataService._app_log_columns:
-                    raise ValueError(f"Invalid column name: {app_column}")
+            titles = app_data.get('titles', {})
                 
             executable_path = app_data.get('executable_path', '')
 
@@ -291,12 +866,13 @@ class UsagedataService:
             if total_focus_count < 0:
                 raise ValueError(f"Invalid focus count: {total_focus_count}")
             
-            app_values.append((latest_day_log_id, app_name, executable_path, total_duration, total_focus_duration, total_focus_count))
+            app_id = self._app_ids[app_name]
+            app_values.append((day_log_id, app_id, executable_path, total_duration, total_focus_duration, total_focus_count))
 
             for title_name, title_data in titles.items():
-                for title_column in title_data:
-                    if title_column not in UsagedataService._title_log_columns:
-                        raise ValueError(f"Invalid column name: {title_column}")
+                invalid_columns = title_data.keys() - UsagedataService._title_log_keys
+                if invalid_columns:
+                    raise ValueError(f"Invalid column name: {next(iter(invalid_columns))}")
 
                 total_duration: int = title_data.get('total_duration', 0)
                 if total_duration < 0:
@@ -310,7 +886,7 @@ class UsagedataService:
                 if total_focus_count < 0:
                     raise ValueError(f"Invalid focus count: {total_focus_count}")
                 
-                title_values.append((latest_day_log_id, app_name, title_name, total_duration, total_focus_duration, total_focus_count))
+                title_values.append((day_log_id, app_id, self._title_ids[title_name], total_duration, total_focus_duration, total_focus_count))
 
         with self._db.transaction() as tx:
             tx.execute_many(app_log_query, app_values)
@@ -320,16 +896,23 @@ class UsagedataService:
         if not hour_durations:
             return
 
-        for hour, duration in hour_durations.items():
-            if hour < 0 or hour > 23:
-                raise ValueError(f"Invalid hour: {hour}")
-            if duration < 0 or duration > 3600:
-                raise ValueError(f"Invalid duration: {duration}")
-
         latest_day_log_id = self.get_latest_daylog_id()
         if not latest_day_log_id:
             raise ValueError("No latest day log found.")
-        
+
+        self.upsert_downtimeperiod(latest_day_log_id, hour_durations)
+
+    def upsert_downtimeperiod(self, day_log_id: int, hour_durations: dict[int, float]) -> None:
+        if not hour_durations:
+            return
+
+        UsagedataService._validate_downtime_periods(hour_durations)
+
+        if self.focus_layout == FocusLayout.VECTORS:
+            # Vectors are written whole, so stored hours are merged in first
+            self._write_downtimevector(day_log_id, {**self.get_downtimeperiod(day_log_id), **hour_durations})
+            return
+
         query = """
             INSERT INTO downtime_period (day_log_id, day_hour, downtime_duration)
             VALUES (?, ?, ?)
@@ -338,29 +921,36 @@ class UsagedataService:
         values = []
 
         for hour, duration in hour_durations.items():
-            values.append((latest_day_log_id, hour, duration))
+            values.append((day_log_id, hour, duration))
 
         self._db.execute_many(query, values)
 
-    def upsert_latest_appfocusperiod(self, app_name: str, app_focus_periods: dict[int, dict[str, int | float]]) -> None:
-        if not app_focus_periods:
+    def replace_downtimeperiod(self, day_log_id: int, hour_durations: dict[int, float]) -> None:
+        # Writes a day's whole downtime, hours left out are removed
+        UsagedataService._validate_downtime_periods(hour_durations)
+
+        if self.focus_layout == FocusLayout.VECTORS:
+            self._write_downtimevector(day_log_id, hour_durations)
             return
-        
-        for hour, focus_data in app_focus_periods.items():
-            if hour < 0 or hour > 23:
-                raise ValueError(f"Invalid hour: {hour}")
-            
-            for focus_column in focus_data:
-                if focus_column not in UsagedataService._focus_period_columns:
-                    raise ValueError(f"Invalid column name: {focus_column}")
 
-            focus_duration = focus_data.get("focus_duration", 0)
-            if focus_duration < 0 or focus_duration > 3600:
-                raise ValueError(f"Invalid duration: {focus_duration}")
+        with self._db.transaction() as tx:
+            tx.execute("DELETE FROM downtime_period WHERE day_log_id = ?", (day_log_id,))
+            tx.execute_many(
+                "INSERT INTO downtime_period (day_log_id, day_hour, downtime_duration) VALUES (?, ?, ?)",
+                [(day_log_id, hour, duration) for hour, duration in hour_durations.items()]
+            )
 
-            focus_count = focus_data.get("focus_count", 0)
-            if focus_count < 0:
-                raise ValueError(f"Invalid focus count: {focus_count}")
+    def _write_downtimevector(self, day_log_id: int, hour_durations: dict[int, float]) -> None:
+        query = """
+            INSERT INTO downtime_vector (day_log_id, downtime_durations)
+            VALUES (?, ?)
+            ON CONFLICT(day_log_id) DO UPDATE SET downtime_durations = excluded.downtime_durations
+        """
+        self._db.execute(query, (day_log_id, UsagedataService._pack_downtime_vector(hour_durations)))
+
+    def upsert_latest_appfocusperiod(self, app_name: str, app_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        if not app_focus_periods:
+            return
 
         latest_day_log_id = self.get_latest_daylog_id()
         if not latest_day_log_id:
@@ -369,39 +959,66 @@ class UsagedataService:
         if not self.latest_applog_name_exists(app_name):
             raise ValueError(f"App name '{app_name}' not found in the latest day log app logs.")
 
+        self.upsert_appfocusperiod(latest_day_log_id, app_name, app_focus_periods)
+
+    def upsert_appfocusperiod(self, day_log_id: int, app_name: str, app_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        # App log must already exist, the foreign key rejects focus periods for unknown apps
+        if not app_focus_periods:
+            return
+        
+        UsagedataService._validate_focus_periods(app_focus_periods)
+
+        if self.focus_layout == FocusLayout.VECTORS:
+            # Vectors are written whole, so stored hours are merged in first
+            self._write_appfocusvector(day_log_id, app_name, {**self.get_appfocusperiod(day_log_id, app_name), **app_focus_periods})
+            return
+
+        app_id = self._require_app_id(app_name)
+
         query = """
-            INSERT INTO app_focus_period (day_log_id, app_name, day_hour, focus_duration, focus_count)
+            INSERT INTO app_focus_period (day_log_id, app_id, day_hour, focus_duration, focus_count)
             VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(day_log_id, app_name, day_hour) DO UPDATE SET
+            ON CONFLICT(day_log_id, app_id, day_hour) DO UPDATE SET
                 focus_duration = excluded.focus_duration,
                 focus_count = excluded.focus_count
         """
         values = []
 
         for hour, focus_data in app_focus_periods.items():
-            values.append((latest_day_log_id, app_name, hour, focus_data["focus_duration"], focus_data["focus_count"]))
+            values.append((day_log_id, app_id, hour, focus_data["focus_duration"], focus_data["focus_count"]))
 
         self._db.execute_many(query, values)
 
-    def upsert_latest_titlefocusperiod(self, app_name: str, title_name: str, title_focus_periods: dict[int, dict[str, int | float]]) -> None:
-        if not title_focus_periods:
+    def replace_appfocusperiod(self, day_log_id: int, app_name: str, app_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        # Writes an app's whole day of focus periods, hours left out are removed
+        UsagedataService._validate_focus_periods(app_focus_periods)
+
+        if self.focus_layout == FocusLayout.VECTORS:
+            self._write_appfocusvector(day_log_id, app_name, app_focus_periods)
             return
-        
-        for hour, focus_data in title_focus_periods.items():
-            if hour < 0 or hour > 23:
-                raise ValueError(f"Invalid hour: {hour}")
-            
-            for focus_column in focus_data:
-                if focus_column not in UsagedataService._focus_period_columns:
-                    raise ValueError(f"Invalid column name: {focus_column}")
 
-            focus_duration = focus_data.get("focus_duration", 0)
-            if focus_duration < 0 or focus_duration > 3600:
-                raise ValueError(f"Invalid duration: {focus_duration}")
+        app_id = self._require_app_id(app_name)
 
-            focus_count = focus_data.get("focus_count", 0)
-            if focus_count < 0:
-                raise ValueError(f"Invalid focus count: {focus_count}")
+        with self._db.transaction() as tx:
+            tx.execute("DELETE FROM app_focus_period WHERE day_log_id = ? AND app_id = ?", (day_log_id, app_id))
+            tx.execute_many(
+                "INSERT INTO app_focus_period (day_log_id, app_id, day_hour, focus_duration, focus_count) VALUES (?, ?, ?, ?, ?)",
+                [(day_log_id, app_id, hour, focus_data["focus_duration"], focus_data["focus_count"]) for hour, focus_data in app_focus_periods.items()]
+            )
+
+    def _write_appfocusvector(self, day_log_id: int, app_name: str, app_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        query = """
+            INSERT INTO app_focus_vector (day_log_id, app_id, focus_durations, focus_counts)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(day_log_id, app_id) DO UPDATE SET
+                focus_durations = excluded.focus_durations,
+                focus_counts = excluded.focus_counts
+        """
+        self._db.execute(query, (day_log_id, self._require_app_id(app_name), *UsagedataService._pack_focus_vector(app_focus_periods)))
+
+    def upsert_latest_titlefocusperiod(self, app_name: str, title_name: str, title_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        if not title_focus_periods:
+            return
 
         latest_day_log_id = self.get_latest_daylog_id()
         if not latest_day_log_id:
@@ -413,23 +1030,598 @@ class UsagedataService:
         if not self.latest_titlelog_name_exists(app_name, title_name):
             raise ValueError(f"Title name '{title_name}' for app '{app_name}' not found in the latest day log title logs.")
 
+        self.upsert_titlefocusperiod(latest_day_log_id, app_name, title_name, title_focus_periods)
+
+    def upsert_titlefocusperiod(self, day_log_id: int, app_name: str, title_name: str, title_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        # Title log must already exist, the foreign key rejects focus periods for unknown titles
+        if not title_focus_periods:
+            return
+        
+        UsagedataService._validate_focus_periods(title_focus_periods)
+
+        if self.focus_layout == FocusLayout.VECTORS:
+            # Vectors are written whole, so stored hours are merged in first
+            self._write_titlefocusvector(day_log_id, app_name, title_name, {**self.get_titlefocusperiod(day_log_id, app_name, title_name), **title_focus_periods})
+            return
+
+        app_id = self._require_app_id(app_name)
+        title_id = self._require_title_id(title_name)
+
         query = """
-            INSERT INTO title_focus_period (day_log_id, app_name, title_name, day_hour, focus_duration, focus_count)
+            INSERT INTO title_focus_period (day_log_id, app_id, title_id, day_hour, focus_duration, focus_count)
             VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(day_log_id, app_name, title_name, day_hour) DO UPDATE SET
+            ON CONFLICT(day_log_id, app_id, title_id, day_hour) DO UPDATE SET
                 focus_duration = excluded.focus_duration,
                 focus_count = excluded.focus_count
         """
         values = []
 
         for hour, focus_data in title_focus_periods.items():
-            values.append((latest_day_log_id, app_name, title_name, hour, focus_data["focus_duration"], focus_data["focus_count"]))
+            values.append((day_log_id, app_id, title_id, hour, focus_data["focus_duration"], focus_data["focus_count"]))
 
         self._db.execute_many(query, values)
 
-    def remove_oldest_daylog(self) -> None:
+    def replace_titlefocusperiod(self, day_log_id: int, app_name: str, title_name: str, title_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        # Writes a title's whole day of focus periods, hours left out are removed
+        UsagedataService._validate_focus_periods(title_focus_periods)
+
+        if self.focus_layout == FocusLayout.VECTORS:
+            self._write_titlefocusvector(day_log_id, app_name, title_name, title_focus_periods)
+            return
+
+        app_id = self._require_app_id(app_name)
+        title_id = self._require_title_id(title_name)
+
+        with self._db.transaction() as tx:
+            tx.execute("DELETE FROM title_focus_period WHERE day_log_id = ? AND app_id = ? AND title_id = ?", (day_log_id, app_id, title_id))
+            tx.execute_many(
+                "INSERT INTO title_focus_period (day_log_id, app_id, title_id, day_hour, focus_duration, focus_count) VALUES (?, ?, ?, ?, ?, ?)",
+                [(day_log_id, app_id, title_id, hour, focus_data["focus_duration"], focus_data["focus_count"]) for hour, focus_data in title_focus_periods.items()]
+            )
+
+    def _write_titlefocusvector(self, day_log_id: int, app_name: str, title_name: str, title_focus_periods: dict[int, dict[str, int | float]]) -> None:
+        query = """
+            INSERT INTO title_focus_vector (day_log_id, app_id, title_id, focus_durations, focus_counts)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(day_log_id, app_id, title_id) DO UPDATE SET
+                focus_durations = excluded.focus_durations,
+                focus_counts = excluded.focus_counts
+        """
+        self._db.execute(query, (day_log_id, self._require_app_id(app_name), self._require_title_id(title_name), *UsagedataService._pack_focus_vector(title_focus_periods)))
+
+    @staticmethod
+    def _validate_focus_buckets(bucket_minutes: int, focus_durations: array, focus_counts: array) -> None:
+        if bucket_minutes <= 0 or 60 % bucket_minutes:
+            raise ValueError(f"Invalid bucket minutes: {bucket_minutes}")
+
+        slots = 1440 // bucket_minutes
+        if len(focus_durations) != slots or len(focus_counts) != slots:
+            raise ValueError(f"Focus buckets of {bucket_minutes} minutes need {slots} slots")
+
+    @staticmethod
+    def downsample_to_hours(bucket_minutes: int, focus_durations: memoryview, focus_counts: memoryview) -> tuple[Any, Any]:
+        # Sums focus buckets into the 24 hourly slots of the vector getters, as numpy arrays
+        import numpy
+
+        buckets_per_hour = 60 // bucket_minutes
+        return (
+            numpy.frombuffer(focus_durations, numpy.float32).reshape(24, buckets_per_hour).sum(axis=1),
+            numpy.frombuffer(focus_counts, numpy.int32).reshape(24, buckets_per_hour).sum(axis=1)
+        )
+
+    def replace_appfocusbuckets(self, day_log_id: int, app_name: str, bucket_minutes: int, focus_durations: array, focus_counts: array) -> None:
+        # Writes an app's whole day of focus buckets, float32 durations and int32 counts
+        UsagedataService._validate_focus_buckets(bucket_minutes, focus_durations, focus_counts)
+
+        query = """
+            INSERT INTO app_focus_bucket (day_log_id, app_id, bucket_minutes, focus_durations, focus_counts)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(day_log_id, app_id) DO UPDATE SET
+                bucket_minutes = excluded.bucket_minutes,
+                focus_durations = excluded.focus_durations,
+                focus_counts = excluded.focus_counts
+        """
+        self._db.execute(query, (day_log_id, self._require_app_id(app_name), bucket_minutes, focus_durations.tobytes(), focus_counts.tobytes()))
+
+    def replace_titlefocusbuckets(self, day_log_id: int, app_name: str, title_name: str, bucket_minutes: int, focus_durations: array, focus_counts: array) -> None:
+        UsagedataService._validate_focus_buckets(bucket_minutes, focus_durations, focus_counts)
+
+        query = """
+            INSERT INTO title_focus_bucket (day_log_id, app_id, title_id, bucket_minutes, focus_durations, focus_counts)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(day_log_id, app_id, title_id) DO UPDATE SET
+                bucket_minutes = excluded.bucket_minutes,
+                focus_durations = excluded.focus_durations,
+                focus_counts = excluded.focus_counts
+        """
+        self._db.execute(query, (day_log_id, self._require_app_id(app_name), self._require_title_id(title_name), bucket_minutes, focus_durations.tobytes(), focus_counts.tobytes()))
+
+    # Bucket getters return (bucket_minutes, focus_durations, focus_counts) as stored, or None without buckets.
+    # Views are float32 and int32 over the stored BLOBs, e.g. for numpy.frombuffer or downsample_to_hours.
+    def get_appfocusbuckets(self, day_log_id: int, app_name: str) -> tuple[int, memoryview, memoryview] | None:
+        app_id = self._get_app_id(app_name)
+        if app_id is None:
+            return None
+
+        query = "SELECT bucket_minutes, focus_durations, focus_counts FROM app_focus_bucket WHERE day_log_id = ? AND app_id = ?"
+        result = self._db.fetchone(query, (day_log_id, app_id), RowFactory.TUPLE)
+        if result is None:
+            return None
+
+        return result[0], memoryview(result[1]).cast("f"), memoryview(result[2]).cast("i")
+
+    def get_titlefocusbuckets(self, day_log_id: int, app_name: str, title_name: str) -> tuple[int, memoryview, memoryview] | None:
+        app_id = self._get_app_id(app_name)
+        title_id = self._get_title_id(title_name)
+        if app_id is None or title_id is None:
+            return None
+
+        query = "SELECT bucket_minutes, focus_durations, focus_counts FROM title_focus_bucket WHERE day_log_id = ? AND app_id = ? AND title_id = ?"
+        result = self._db.fetchone(query, (day_log_id, app_id, title_id), RowFactory.TUPLE)
+        if result is None:
+            return None
+
+        return result[0], memoryview(result[1]).cast("f"), memoryview(result[2]).cast("i")
+
+    def get_day_focusbuckets(self, day_log_id: int) -> tuple[dict[str, tuple[int, bytes, bytes]], dict[tuple[str, str], tuple[int, bytes, bytes]]]:
+        # Every focus bucket of a day in two queries, app buckets by app name and title buckets by (app name, title name)
+        app_query = """
+            SELECT app.name, bucket_minutes, focus_durations, focus_counts FROM app_focus_bucket
+            JOIN app ON app.id = app_focus_bucket.app_id
+            WHERE day_log_id = ?
+        """
+        title_query = """
+            SELECT app.name, title.name, bucket_minutes, focus_durations, focus_counts FROM title_focus_bucket
+            JOIN app ON app.id = title_focus_bucket.app_id
+            JOIN title ON title.id = title_focus_bucket.title_id
+            WHERE day_log_id = ?
+        """
+        app_buckets = {row[0]: row[1:] for row in self._db.fetchall(app_query, (day_log_id,), RowFactory.TUPLE)}
+        title_buckets = {(row[0], row[1]): row[2:] for row in self._db.fetchall(title_query, (day_log_id,), RowFactory.TUPLE)}
+
+        return app_buckets, title_buckets
+
+    def migrate_focus_layout(self) -> None:
+        # Moves periods stored in the other layout's tables, e.g. after settings.focus_layout changed
+        if self.focus_layout == FocusLayout.VECTORS:
+            source_tables = ("downtime_period", "app_focus_period", "title_focus_period")
+        else:
+            source_tables = ("downtime_vector", "app_focus_vector", "title_focus_vector")
+
+        if not self._db.fetchone(" UNION ALL ".join(f"SELECT 1 FROM {table}" for table in source_tables) + " LIMIT 1"):
+            return
+
+        downtime: dict[int, dict] = dict()
+        app_focus: dict[tuple[int, int], dict] = dict()
+        title_focus: dict[tuple[int, int, int], dict] = dict()
+
+        if self.focus_layout == FocusLayout.VECTORS:
+            for day_log_id, hour, duration in self._db.iterate("SELECT day_log_id, day_hour, downtime_duration FROM downtime_period", row_factory=RowFactory.TUPLE):
+                downtime.setdefault(day_log_id, dict())[hour] = duration
+            for day_log_id, app_id, hour, focus_duration, focus_count in self._db.iterate("SELECT day_log_id, app_id, day_hour, focus_duration, focus_count FROM app_focus_period", row_factory=RowFactory.TUPLE):
+                app_focus.setdefault((day_log_id, app_id), dict())[hour] = {'focus_duration': focus_duration, 'focus_count': focus_count}
+            for day_log_id, app_id, title_id, hour, focus_duration, focus_count in self._db.iterate("SELECT day_log_id, app_id, title_id, day_hour, focus_duration, focus_count FROM title_focus_period", row_factory=RowFactory.TUPLE):
+                title_focus.setdefault((day_log_id, app_id, title_id), dict())[hour] = {'focus_duration': focus_duration, 'focus_count': focus_count}
+
+            with self._db.transaction() as tx:
+                tx.execute_many("INSERT OR REPLACE INTO downtime_vector (day_log_id, downtime_durations) VALUES (?, ?)", [
+                    (day_log_id, UsagedataService._pack_downtime_vector(hour_durations)) for day_log_id, hour_durations in downtime.items()
+                ])
+                tx.execute_many("INSERT OR REPLACE INTO app_focus_vector (day_log_id, app_id, focus_durations, focus_counts) VALUES (?, ?, ?, ?)", [
+                    (*key, *UsagedataService._pack_focus_vector(focus_periods)) for key, focus_periods in app_focus.items()
+                ])
+                tx.execute_many("INSERT OR REPLACE INTO title_focus_vector (day_log_id, app_id, title_id, focus_durations, focus_counts) VALUES (?, ?, ?, ?, ?)", [
+                    (*key, *UsagedataService._pack_focus_vector(focus_periods)) for key, focus_periods in title_focus.items()
+                ])
+                for table in source_tables:
+                    tx.execute(f"DELETE FROM {table}")
+        else:
+            for day_log_id, downtime_durations in self._db.iterate("SELECT day_log_id, downtime_durations FROM downtime_vector", row_factory=RowFactory.TUPLE):
+                downtime[day_log_id] = UsagedataService._unpack_downtime_vector(downtime_durations)
+            for day_log_id, app_id, focus_durations, focus_counts in self._db.iterate("SELECT day_log_id, app_id, focus_durations, focus_counts FROM app_focus_vector", row_factory=RowFactory.TUPLE):
+                app_focus[(day_log_id, app_id)] = UsagedataService._unpack_focus_vector(focus_durations, focus_counts)
+            for day_log_id, app_id, title_id, focus_durations, focus_counts in self._db.iterate("SELECT day_log_id, app_id, title_id, focus_durations, focus_counts FROM title_focus_vector", row_factory=RowFactory.TUPLE):
+                title_focus[(day_log_id, app_id, title_id)] = UsagedataService._unpack_focus_vector(focus_durations, focus_counts)
+
+            with self._db.transaction() as tx:
+                tx.execute_many("INSERT OR REPLACE INTO downtime_period (day_log_id, day_hour, downtime_duration) VALUES (?, ?, ?)", [
+                    (day_log_id, hour, duration) for day_log_id, hour_durations in downtime.items() for hour, duration in hour_durations.items()
+                ])
+                tx.execute_many("INSERT OR REPLACE INTO app_focus_period (day_log_id, app_id, day_hour, focus_duration, focus_count) VALUES (?, ?, ?, ?, ?)", [
+                    (*key, hour, focus_data["focus_duration"], focus_data["focus_count"]) for key, focus_periods in app_focus.items() for hour, focus_data in focus_periods.items()
+                ])
+                tx.execute_many("INSERT OR REPLACE INTO title_focus_period (day_log_id, app_id, title_id, day_hour, focus_duration, focus_count) VALUES (?, ?, ?, ?, ?, ?)", [
+                    (*key, hour, focus_data["focus_duration"], focus_data["focus_count"]) for key, focus_periods in title_focus.items() for hour, focus_data in focus_periods.items()
+                ])
+                for table in source_tables:
+                    tx.execute(f"DELETE FROM {table}")
+
+    def append_tick(self, day_log_id: int, monotonic: float, timestamp: float, app_title_map: dict[str, set[str]], app_executable_path: dict[str, str], active_app: str | None, active_title: str | None) -> None:
+        # One insert per tick once names are interned, executable paths are written once per app and day
+        self._intern("app", self._app_ids, app_title_map.keys())
+        self._intern("title", self._title_ids, {title for titles in app_title_map.values() for title in titles} | ({active_title} if active_title else set()))
+        if active_app:
+            self._intern("app", self._app_ids, (active_app,))
+
+        new_paths = [(day_log_id, self._app_ids[app], app_executable_path[app]) for app in app_title_map if (day_log_id, app) not in self._journal_apps]
+        if new_paths:
+            self._db.execute_many("INSERT OR IGNORE INTO journal_executable_path (day_log_id, app_id, executable_path) VALUES (?, ?, ?)", new_paths)
+            self._journal_apps.update((day_log_id, app) for app in app_title_map)
+
+        # Apps without titles are stored with title id -1
+        open_windows = array("i")
+        for app, titles in app_title_map.items():
+            app_id = self._app_ids[app]
+            if not titles:
+                open_windows.extend((app_id, -1))
+            for title in titles:
+                open_windows.extend((app_id, self._title_ids[title]))
+
+        active_app_id: int | None = self._app_ids[active_app] if active_app else None
+        active_title_id: int | None = self._title_ids[active_title] if active_title else None
+
+        # Names first seen in the day's journal are referenced, so pruning keeps them while the ticks exist
+        new_app_ids = {(day_log_id, app_id) for app_id in open_windows[::2]} - self._journal_app_ids
+        new_title_ids = {(day_log_id, title_id) for title_id in open_windows[1::2] if title_id != -1} - self._journal_title_ids
+        if active_app_id is not None and (day_log_id, active_app_id) not in self._journal_app_ids:
+            new_app_ids.add((day_log_id, active_app_id))
+        if active_title_id is not None and (day_log_id, active_title_id) not in self._journal_title_ids:
+            new_title_ids.add((day_log_id, active_title_id))
+        if new_app_ids:
+            self._db.execute_many("INSERT OR IGNORE INTO journal_app (day_log_id, app_id) VALUES (?, ?)", list(new_app_ids))
+            self._journal_app_ids.update(new_app_ids)
+        if new_title_ids:
+            self._db.execute_many("INSERT OR IGNORE INTO journal_title (day_log_id, title_id) VALUES (?, ?)", list(new_title_ids))
+            self._journal_title_ids.update(new_title_ids)
+
+        self._db.execute(
+            "INSERT INTO tick_journal (day_log_id, monotonic, timestamp, active_app_id, active_title_id, open_windows) VALUES (?, ?, ?, ?, ?, ?)",
+            (day_log_id, monotonic, timestamp, active_app_id, active_title_id, open_windows.tobytes())
+        )
+
+    def _iterate_ticks(self, query: str, params: tuple) -> Iterator[tuple[int, int, float, float, str | None, str | None, dict[str, set[str]]]]:
+        app_names: dict[int, str] = dict(self._db.fetchall("SELECT id, name FROM app", row_factory=RowFactory.TUPLE))
+        title_names: dict[int, str] = dict(self._db.fetchall("SELECT id, name FROM title", row_factory=RowFactory.TUPLE))
+
+        for tick_id, day_log_id, monotonic, timestamp, active_app_id, active_title_id, open_windows in self._db.iterate(query, params, settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            app_title_map: dict[str, set[str]] = dict()
+            ids = memoryview(open_windows).cast("i")
+            for i in range(0, len(ids), 2):
+                titles = app_title_map.setdefault(app_names[ids[i]], set())
+                if ids[i + 1] != -1:
+                    titles.add(title_names[ids[i + 1]])
+
+            yield tick_id, day_log_id, monotonic, timestamp, app_names.get(active_app_id), title_names.get(active_title_id), app_title_map
+
+    def iterate_pending_ticks(self) -> Iterator[tuple[int, int, float, float, str | None, str | None, dict[str, set[str]]]]:
+        # Ticks not yet derived, in order, each day preceded by its last derived tick if there is one, since replay starts from its state.
+        # Yields (tick_id, day_log_id, monotonic, timestamp, active_app, active_title, app_title_map).
+        query = f"""
+            SELECT tick_journal.id, tick_journal.day_log_id, monotonic, timestamp, active_app_id, active_title_id, open_windows FROM tick_journal
+            LEFT JOIN journal_watermark ON journal_watermark.day_log_id = tick_journal.day_log_id
+            WHERE tick_journal.id >= COALESCE(journal_watermark.tick_id, 0)
+            AND tick_journal.day_log_id IN (SELECT id FROM day_log WHERE {UsagedataService._pending_ticks_condition})
+            ORDER BY tick_journal.id
+        """
+        return self._iterate_ticks(query, ())
+
+    def iterate_ticks(self, day_log_id: int) -> Iterator[tuple[int, int, float, float, str | None, str | None, dict[str, set[str]]]]:
+        # Every journaled tick of a day, e.g. to aggregate it again at another resolution
+        query = """
+            SELECT id, day_log_id, monotonic, timestamp, active_app_id, active_title_id, open_windows FROM tick_journal
+            WHERE day_log_id = ?
+            ORDER BY id
+        """
+        return self._iterate_ticks(query, (day_log_id,))
+
+    def get_journal_watermark(self, day_log_id: int) -> int:
+        result = self._db.fetchone("SELECT tick_id FROM journal_watermark WHERE day_log_id = ?", (day_log_id,), RowFactory.TUPLE)
+        return result[0] if result else 0
+
+    def set_journal_watermark(self, day_log_id: int, tick_id: int) -> None:
+        self._db.execute("INSERT INTO journal_watermark (day_log_id, tick_id) VALUES (?, ?) ON CONFLICT(day_log_id) DO UPDATE SET tick_id = excluded.tick_id", (day_log_id, tick_id))
+
+    def get_journal_executable_paths(self, day_log_id: int) -> dict[str, str]:
+        query = """
+            SELECT app.name, executable_path FROM journal_executable_path
+            JOIN app ON app.id = journal_executable_path.app_id
+            WHERE day_log_id = ?
+        """
+        return dict(self._db.fetchall(query, (day_log_id,), RowFactory.TUPLE))
+
+    def remove_oldest_daylog(self, on_remove: Callable[[dict], None] | None = None) -> None:
+        # on_remove gets the whole day before it is deleted, e.g. to archive it
+        oldest = self._db.fetchone("SELECT id FROM day_log ORDER BY id ASC LIMIT 1", row_factory=RowFactory.TUPLE)
+        if oldest is None:
+            return
+
+        day_log_id = oldest[0]
+        day = self.get_day(day_log_id)
+        if on_remove is not None:
+            on_remove(day)
+        rolled_up = self._db.fetchone("SELECT 1 FROM rollup_day WHERE day_log_id = ?", (day_log_id,))
+
+        # Rollups only cover kept day logs, so a removed day is taken out of them in the same transaction it is summarized in
+        # Values are built before the transaction, reads inside it would wait on the write-behind lock it holds
+        rollup_values = self._get_rollup_values(day, -1) if rolled_up else None
+        summary_values = self._get_daily_summary_values(day)
+        with self._db.transaction() as tx:
+            if rollup_values:
+                self._write_rollup_values(tx, rollup_values)
+                tx.execute("DELETE FROM rollup_day WHERE day_log_id = ?", (day_log_id,))
+            UsagedataService._write_daily_summary(tx, summary_values)
+            tx.execute("DELETE FROM day_log WHERE id = ?", (day_log_id,))
+
+    def _get_daily_summary_values(self, day: dict) -> tuple[tuple, list[tuple]]:
+        date = day["time_anchor"][:10]
+        apps = day["apps"]
+
+        return (
+            (date, day["total_downtime_duration"], day["total_anomalies"], sum(app_data["total_focus_count"] for app_data in apps.values())),
+            [
+                (date, self._require_app_id(app_name), app_data["total_duration"], app_data["total_focus_duration"], app_data["total_focus_count"])
+                for app_name, app_data in apps.items()
+            ]
+        )
+
+    @staticmethod
+    def _write_daily_summary(tx: SQLiteWrapper._TxProxy, values: tuple[tuple, list[tuple]]) -> None:
+        day_values, app_values = values
+
+        tx.execute("""
+            INSERT INTO daily_summary (day, total_downtime_duration, total_anomalies, total_switch_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                total_downtime_duration = total_downtime_duration + excluded.total_downtime_duration,
+                total_anomalies = total_anomalies + excluded.total_anomalies,
+                total_switch_count = total_switch_count + excluded.total_switch_count
+        """, day_values)
+        tx.execute_many("""
+            INSERT INTO daily_app_summary (day, app_id, total_duration, total_focus_duration, total_focus_count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(day, app_id) DO UPDATE SET
+                total_duration = total_duration + excluded.total_duration,
+                total_focus_duration = total_focus_duration + excluded.total_focus_duration,
+                total_focus_count = total_focus_count + excluded.total_focus_count
+        """, app_values)
+
+    def compact_summaries(self, daily_cutoff: str, monthly_cutoff: str) -> None:
+        # Merges daily summaries before daily_cutoff (YYYY-MM-DD) into monthly ones, and drops months before monthly_cutoff (YYYY-MM).
+        # Keeps the history tiers bounded, by the retention settings times the number of apps used.
+        with self._db.transaction() as tx:
+            tx.execute("""
+                INSERT INTO monthly_summary (month, day_count, total_downtime_duration, total_anomalies, total_switch_count)
+                SELECT substr(day, 1, 7), COUNT(*), SUM(total_downtime_duration), SUM(total_anomalies), SUM(total_switch_count)
+                FROM daily_summary WHERE day < ? GROUP BY 1
+                ON CONFLICT(month) DO UPDATE SET
+                    day_count = day_count + excluded.day_count,
+                    total_downtime_duration = total_downtime_duration + excluded.total_downtime_duration,
+                    total_anomalies = total_anomalies + excluded.total_anomalies,
+                    total_switch_count = total_switch_count + excluded.total_switch_count
+            """, (daily_cutoff,))
+            tx.execute("""
+                INSERT INTO monthly_app_summary (month, app_id, total_duration, total_focus_duration, total_focus_count, day_count)
+                SELECT substr(day, 1, 7), app_id, SUM(total_duration), SUM(total_focus_duration), SUM(total_focus_count), COUNT(*)
+                FROM daily_app_summary WHERE day < ? GROUP BY 1, 2
+                ON CONFLICT(month, app_id) DO UPDATE SET
+                    total_duration = total_duration + excluded.total_duration,
+                    total_focus_duration = total_focus_duration + excluded.total_focus_duration,
+                    total_focus_count = total_focus_count + excluded.total_focus_count,
+                    day_count = day_count + excluded.day_count
+            """, (daily_cutoff,))
+            tx.execute("DELETE FROM daily_summary WHERE day < ?", (daily_cutoff,))
+            tx.execute("DELETE FROM daily_app_summary WHERE day < ?", (daily_cutoff,))
+            tx.execute("DELETE FROM monthly_summary WHERE month < ?", (monthly_cutoff,))
+            tx.execute("DELETE FROM monthly_app_summary WHERE month < ?", (monthly_cutoff,))
+
+    # Output format, periods in ascending order:
+    # {
+    #   "period": {
+    #       "day_count": int,
+    #       "total_downtime_duration": float,
+    #       "total_anomalies": int,
+    #       "total_switch_count": int,
+    #       "apps": {
+    #           "app_name": { "total_duration": float, "total_focus_duration": float, "total_focus_count": int, "day_count": int }
+    #       }
+    #   }
+    # }
+    def get_history(self, resolution: HistoryResolution = HistoryResolution.DAY) -> dict[str, dict]:
+        # Reads across every tier as if it were one table. Days come from day logs and daily summaries,
+        # months also include monthly summaries, since those can not be split back into days.
+        period_length = 10 if resolution == HistoryResolution.DAY else 7
+
+        period_query = f"""
+            SELECT period, SUM(day_count), SUM(total_downtime_duration), SUM(total_anomalies), SUM(total_switch_count) FROM (
+                SELECT substr(time_anchor, 1, {period_length}) AS period, 1 AS day_count, total_downtime_duration, total_anomalies,
+                    (SELECT COALESCE(SUM(total_focus_count), 0) FROM app_log WHERE app_log.day_log_id = day_log.id) AS total_switch_count
+                FROM day_log
+                UNION ALL
+                SELECT substr(day, 1, {period_length}), 1, total_downtime_duration, total_anomalies, total_switch_count FROM daily_summary
+                {"UNION ALL SELECT month, day_count, total_downtime_duration, total_anomalies, total_switch_count FROM monthly_summary" if resolution == HistoryResolution.MONTH else ""}
+            )
+            GROUP BY period
+            ORDER BY period
+        """
+        app_query = f"""
+            SELECT period, app.name, SUM(total_duration), SUM(total_focus_duration), SUM(total_focus_count), SUM(day_count) FROM (
+                SELECT substr(day_log.time_anchor, 1, {period_length}) AS period, app_id, total_duration, total_focus_duration, total_focus_count, 1 AS day_count
+                FROM app_log JOIN day_log ON day_log.id = app_log.day_log_id
+                UNION ALL
+                SELECT substr(day, 1, {period_length}), app_id, total_duration, total_focus_duration, total_focus_count, 1 FROM daily_app_summary
+                {"UNION ALL SELECT month, app_id, total_duration, total_focus_duration, total_focus_count, day_count FROM monthly_app_summary" if resolution == HistoryResolution.MONTH else ""}
+            ) history
+            JOIN app ON app.id = history.app_id
+            GROUP BY period, history.app_id
+        """
+
+        history: dict[str, dict] = dict()
+        for period, day_count, total_downtime_duration, total_anomalies, total_switch_count in self._db.iterate(period_query, (), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            history[period] = {
+                'day_count': day_count,
+                'total_downtime_duration': total_downtime_duration,
+                'total_anomalies': total_anomalies,
+                'total_switch_count': total_switch_count,
+                'apps': dict()
+            }
+
+        for period, app_name, total_duration, total_focus_duration, total_focus_count, day_count in self._db.iterate(app_query, (), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            history[period]['apps'][app_name] = {
+                'total_duration': total_duration,
+                'total_focus_duration': total_focus_duration,
+                'total_focus_count': total_focus_count,
+                'day_count': day_count
+            }
+
+        return history
+
+    def _get_rollup_values(self, day: dict, sign: int) -> dict[str, list[tuple]]:
+        # Rows a day adds to the rollups, negated with sign -1 to take it out again
+        values: dict[str, list[tuple]] = {"apps": [], "titles": [], "app_hours": [], "hours": []}
+        hours: dict[int, list[float]] = {hour: [0, 0, 0] for hour in range(24)}
+
+        for hour, duration in day.get("downtime_period", {}).items():
+            hours[hour][2] += duration
+
+        for app_name, app_data in day.get("apps", {}).items():
+            app_id = self._require_app_id(app_name)
+            values["apps"].append((app_id, sign * app_data["total_duration"], sign * app_data["total_focus_duration"], sign * app_data["total_focus_count"], sign))
+
+            for title_name, title_data in app_data["titles"].items():
+                values["titles"].append((app_id, self._require_title_id(title_name), sign * title_data["total_duration"], sign * title_data["total_focus_duration"], sign * title_data["total_focus_count"], sign))
+
+            for hour, focus_data in app_data["hourly_focus_data"].items():
+                values["app_hours"].append((app_id, hour, sign * focus_data["focus_duration"], sign * focus_data["focus_count"]))
+                hours[hour][0] += focus_data["focus_duration"]
+                hours[hour][1] += focus_data["focus_count"]
+
+        values["hours"] = [(hour, sign * focus_duration, sign * switch_count, sign * downtime_duration) for hour, (focus_duration, switch_count, downtime_duration) in hours.items() if focus_duration or switch_count or downtime_duration]
+        return values
+
+    @staticmethod
+    def _write_rollup_values(tx: SQLiteWrapper._TxProxy, values: dict[str, list[tuple]]) -> None:
+        tx.execute_many("""
+            INSERT INTO app_rollup (app_id, total_duration, total_focus_duration, total_focus_count, day_count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(app_id) DO UPDATE SET
+                total_duration = total_duration + excluded.total_duration,
+                total_focus_duration = total_focus_duration + excluded.total_focus_duration,
+                total_focus_count = total_focus_count + excluded.total_focus_count,
+                day_count = day_count + excluded.day_count
+        """, values["apps"])
+        tx.execute_many("""
+            INSERT INTO title_rollup (app_id, title_id, total_duration, total_focus_duration, total_focus_count, day_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(app_id, title_id) DO UPDATE SET
+                total_duration = total_duration + excluded.total_duration,
+                total_focus_duration = total_focus_duration + excluded.total_focus_duration,
+                total_focus_count = total_focus_count + excluded.total_focus_count,
+                day_count = day_count + excluded.day_count
+        """, values["titles"])
+        tx.execute_many("""
+            INSERT INTO app_hour_rollup (app_id, day_hour, focus_duration, focus_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(app_id, day_hour) DO UPDATE SET
+                focus_duration = focus_duration + excluded.focus_duration,
+                focus_count = focus_count + excluded.focus_count
+        """, values["app_hours"])
+        tx.execute_many("""
+            INSERT INTO hour_rollup (day_hour, focus_duration, switch_count, downtime_duration)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(day_hour) DO UPDATE SET
+                focus_duration = focus_duration + excluded.focus_duration,
+                switch_count = switch_count + excluded.switch_count,
+                downtime_duration = downtime_duration + excluded.downtime_duration
+        """, values["hours"])
+
+        # Apps and titles with no day left are dropped, along with their heatmaps
+        tx.execute("DELETE FROM app_hour_rollup WHERE app_id IN (SELECT app_id FROM app_rollup WHERE day_count <= 0)")
+        tx.execute("DELETE FROM app_rollup WHERE day_count <= 0")
+        tx.execute("DELETE FROM title_rollup WHERE day_count <= 0")
+
+    def finalize_rollups(self) -> None:
+        # Folds every finished day log not yet in the rollups, the latest day log is still being written.
+        # Days with journal ticks not yet derived wait until they are.
+        # Also backfills rollups for databases created before them, or days missed by a crash at rollover.
+        query = """
+            SELECT id FROM day_log
+            WHERE id < (SELECT MAX(id) FROM day_log) AND id NOT IN (SELECT day_log_id FROM rollup_day)
+        """ + f"""
+            AND NOT {UsagedataService._pending_ticks_condition}
+            ORDER BY id
+        """
+        for (day_log_id,) in self._db.fetchall(query, row_factory=RowFactory.TUPLE):
+            rollup_values = self._get_rollup_values(self.get_day(day_log_id), 1)
+            try:
+                with self._db.transaction() as tx:
+                    # Marker goes first, if another process folded the day already its primary key rejects the whole fold
+                    tx.execute("INSERT INTO rollup_day (day_log_id) VALUES (?)", (day_log_id,))
+                    self._write_rollup_values(tx, rollup_values)
+            except sqlite3.IntegrityError:
+                pass
+
+    def get_weighted_totaldurations(self, app_names: tuple[str], historical_weight: float) -> dict[str, float]:
+        # Today's total duration and the total over every finished day, blended by historical_weight, in one query.
+        # Apps never seen are left out.
+        if not app_names:
+            return dict()
+
+        rows = self._db.fetchall(self._get_weighted_totaldurations_query(len(app_names)), (1 - historical_weight, historical_weight, *app_names), RowFactory.TUPLE)
+        return dict(rows)
+
+    # Output format:
+    # {
+    #   "day_count": int,
+    #   "apps": {
+    #       "app_name": {
+    #           "total_duration": float, "total_focus_duration": float, "total_focus_count": int, "day_count": int,
+    #           "hourly_focus_data": { hour: { "focus_duration": float, "focus_count": int } },
+    #           "titles": { "title_name": { "total_duration": float, "total_focus_duration": float, "total_focus_count": int, "day_count": int } }
+    #       }
+    #   },
+    #   "hourly": { hour: { "focus_duration": float, "switch_count": int, "downtime_duration": float } }
+    # }
+    def get_rollup(self, titles: bool = True) -> dict:
+        rollup: dict = {
+            "day_count": self._db.fetchone("SELECT COUNT(*) FROM rollup_day", row_factory=RowFactory.TUPLE)[0],
+            "apps": dict(),
+            "hourly": dict()
+        }
+        apps: dict = rollup["apps"]
+
         query = """
-            DELETE FROM day_log 
-            WHERE id = (SELECT id FROM day_log ORDER BY id ASC LIMIT 1);
+            SELECT app_rollup.app_id, app.name, total_duration, total_focus_duration, total_focus_count, day_count FROM app_rollup
+            JOIN app ON app.id = app_rollup.app_id
         """
-        self._db.execute(query)
\ No newline at end of file
+        app_names: dict[int, str] = dict()
+        for app_id, app_name, total_duration, total_focus_duration, total_focus_count, day_count in self._db.iterate(query, (), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            app_names[app_id] = app_name
+            apps[app_name] = {
+                'total_duration': total_duration,
+                'total_focus_duration': total_focus_duration,
+                'total_focus_count': total_focus_count,
+                'day_count': day_count,
+                'hourly_focus_data': dict(),
+                'titles': dict()
+            }
+
+        for app_id, hour, focus_duration, focus_count in self._db.iterate("SELECT app_id, day_hour, focus_duration, focus_count FROM app_hour_rollup ORDER BY app_id, day_hour", (), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            apps[app_names[app_id]]['hourly_focus_data'][hour] = {'focus_duration': focus_duration, 'focus_count': focus_count}
+
+        if titles:
+            query = """
+                SELECT title_rollup.app_id, title.name, total_duration, total_focus_duration, total_focus_count, day_count FROM title_rollup
+                JOIN title ON title.id = title_rollup.title_id
+            """
+            for app_id, title_name, total_duration, total_focus_duration, total_focus_count, day_count in self._db.iterate(query, (), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+                apps[app_names[app_id]]['titles'][title_name] = {
+                    'total_duration': total_duration,
+                    'total_focus_duration': total_focus_duration,
+                    'total_focus_count': total_focus_count,
+                    'day_count': day_count
+                }
+
+        for hour, focus_duration, switch_count, downtime_duration in self._db.iterate("SELECT day_hour, focus_duration, switch_count, downtime_duration FROM hour_rollup ORDER BY day_hour", (), settings.sqlite_fetch_batchsize, RowFactory.TUPLE):
+            rollup["hourly"][hour] = {'focus_duration': focus_duration, 'switch_count': switch_count, 'downtime_duration': downtime_duration}
+
+        return rollup
\ No newline at end of file
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable
+
+from typing import Any
+
+import settings
+from settings import HistoryResolution
+from Include.subsystem.usagedata_db import UsagedataDB
+
+class AsyncUsagedataDB:
+    # Asyncio facade over UsagedataDB. Operations run on long-lived executors, so no thread is created per call.
+    # Reads share a pool of threads, each with its own pooled connection. Writes run on a single thread, in order.
+    # Reads never write, day log integrity is ensured on the writer thread before one is dispatched.
+
+    def __init__(self, db_handler: UsagedataDB, read_workers: int | None = None):
+        self._db_handler: UsagedataDB = db_handler
+
+        self._read_executor = ThreadPoolExecutor(max_workers=read_workers or settings.async_read_workers, thread_name_prefix="usagedata-read")
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usagedata-write")
+
+    async def _run(self, executor: ThreadPoolExecutor, function: Callable, *args: Any) -> Any:
+        # Cancelling a queued call drops it, cancelling a running call interrupts its SQLite statement.
+        # Under write-behind a running write is not interrupted, it finishes and only the await is cancelled.
+
+        running_thread: dict[str, int | None] = {"id": None}
+        running_lock = threading.Lock()
+
+        def job() -> Any:
+            with running_lock:
+                running_thread["id"] = threading.get_ident()
+            try:
+                return function(*args)
+            finally:
+                with running_lock:
+                    running_thread["id"] = None
+
+        future = asyncio.get_running_loop().run_in_executor(executor, job)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Lock keeps the job from finishing and picking up another call before the interrupt lands
+            with running_lock:
+                if running_thread["id"] is not None:
+                    self._db_handler.interrupt(running_thread["id"])
+            raise
+
+    def _read_job(self, function: Callable, *args: Any) -> Any:
+        with self._db_handler.reads():
+            return function(*args)
+
+    async def _read(self, function: Callable, *args: Any) -> Any:
+        if self._db_handler.log_integrity_due():
+            await self._write(self._db_handler.ensure_log_integrity)
+
+        return await self._run(self._read_executor, self._read_job, function, *args)
+
+    async def _write(self, function: Callable, *args: Any) -> Any:
+        return await self._run(self._write_executor, function, *args)
+
+    async def close(self) -> None:
+        # Running reads finish before their pooled connections are closed on the writer
+        await asyncio.get_running_loop().run_in_executor(None, lambda: self._read_executor.shutdown(wait=True, cancel_futures=True))
+        await self._write(self._db_handler.close)
+
+        self._write_executor.shutdown(wait=True)
+
+    async def flush(self) -> None:
+        await self._write(self._db_handler.flush)
+
+    async def update_apps(self, app_title_map: dict[str, set[str]], app_executable_path: dict[str, str], active_app: str | None = None, active_title: str | None = None) -> None:
+        await self._write(self._db_handler.update_apps, app_title_map, app_executable_path, active_app, active_title)
+
+    async def materialize(self) -> None:
+        await self._write(self._db_handler.materialize)
+
+    async def get_daylog_ids(self) -> list[int]:
+        return await self._read(self._db_handler.get_daylog_ids)
+
+    async def get_recent_daylog(self, columns: tuple[str] | None = None) -> dict[str, str | int | float]:
+        return await self._read(self._db_handler.get_recent_daylog, columns)
+
+    async def get_daylog(self, day_log_id: int, columns: tuple[str] | None = None) -> dict[str, str | int | float]:
+        return await self._read(self._db_handler.get_daylog, day_log_id, columns)
+
+    async def get_applog_titlelog(self, day_log_id: int) -> dict[str, dict[str, int | float | dict[str, str | int | float]]]:
+        return await self._read(self._db_handler.get_applog_titlelog, day_log_id)
+
+    async def get_days(self, day_log_ids: tuple[int], titles: bool = True) -> dict[int, dict]:
+        return await self._read(self._db_handler.get_days, day_log_ids, titles)
+
+    async def get_day(self, day_log_id: int, titles: bool = True) -> dict:
+        return await self._read(self._db_handler.get_day, day_log_id, titles)
+
+    async def get_appfocusperiod(self, day_log_id: int, app_name: str) -> dict[int, dict[str, float]]:
+        return await self._read(self._db_handler.get_appfocusperiod, day_log_id, app_name)
+
+    async def get_titlefocusperiod(self, day_log_id: int, app_name: str, title_name: str) -> dict[int, dict[str, float]]:
+        return await self._read(self._db_handler.get_titlefocusperiod, day_log_id, app_name, title_name)
+
+    async def get_appfocusbuckets(self, day_log_id: int, app_name: str) -> tuple[int, memoryview, memoryview] | None:
+        return await self._read(self._db_handler.get_appfocusbuckets, day_log_id, app_name)
+
+    async def get_titlefocusbuckets(self, day_log_id: int, app_name: str, title_name: str) -> tuple[int, memoryview, memoryview] | None:
+        return await self._read(self._db_handler.get_titlefocusbuckets, day_log_id, app_name, title_name)
+
+    async def get_history(self, resolution: HistoryResolution = HistoryResolution.DAY) -> dict[str, dict]:
+        return await self._read(self._db_handler.get_history, resolution)
+
+    async def get_rollup(self, titles: bool = True) -> dict:
+        return await self._read(self._db_handler.get_rollup, titles)
+
+    async def get_mostused_app(self, app_names: tuple[str]) -> str | None:
+        return await self._read(self._db_handler.get_mostused_app, app_names)
\ No newline at end of file
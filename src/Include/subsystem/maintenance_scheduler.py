@@ -0,0 +1,43 @@
+import time
+import sqlite3
+from datetime import timedelta
+
+import settings
+from Include.subsystem.usagedata_db import UsagedataDB
+
+class MaintenanceScheduler:
+    # Keeps the database and its WAL bounded, meant to run between observe ticks
+
+    def __init__(self, db_handler: UsagedataDB):
+        self._db_handler: UsagedataDB = db_handler
+        self._last_checkpoint: float = time.monotonic()
+
+        # Databases created before incremental vacuum was enabled are converted once, by the first run that gets the database
+        self._incremental_vacuum_enabled: bool = self._db_handler.incremental_vacuum_enabled()
+
+    def run(self, budget: timedelta) -> None:
+        deadline: float = time.monotonic() + budget.total_seconds()
+
+        try:
+            # Converting needs a full VACUUM, so it is the only maintenance of its run
+            if not self._incremental_vacuum_enabled:
+                self._db_handler.enable_incremental_vacuum()
+                self._incremental_vacuum_enabled = True
+                return
+
+            # Checkpoints passively on an interval, or once the WAL grows too large. Passive checkpoints never wait on readers.
+            # Truncating does, so it only follows a passive checkpoint that copied every frame, and waits no longer than the budget left.
+            wal_too_large: bool = self._db_handler.get_wal_size() > settings.wal_size_limit
+            if wal_too_large or time.monotonic() - self._last_checkpoint >= settings.checkpoint_interval.total_seconds():
+                busy, log_frames, checkpointed_frames = self._db_handler.checkpoint()
+                self._last_checkpoint = time.monotonic()
+
+                if wal_too_large and not busy and log_frames == checkpointed_frames and time.monotonic() < deadline:
+                    self._db_handler.checkpoint(truncate=True, busy_timeout=deadline - time.monotonic())
+
+            # Reclaim pages freed by deleted day logs, a few at a time until the budget runs out
+            while time.monotonic() < deadline and self._db_handler.get_freelist_count() > 0:
+                self._db_handler.incremental_vacuum(settings.vacuum_pages_per_step, busy_timeout=deadline - time.monotonic())
+        except sqlite3.OperationalError:
+            # Database is busy, maintenance is retried on the next idle tick
+            pass
\ No newline at end of file
@@ -100,16 +100,13 @@ class SuggestionEngine:
     #       }
     #   }
     # }
-    def _top_data(self, day_log_id: int, only_apps: bool = False, aggregate: bool = False) -> dict:
-        apps_titles: dict = self._db_handler.get_applog_titlelog(day_log_id)
-
-        apps_titles = dict(heapq.nlargest(settings.data_limit, apps_titles.items(), key=lambda x: self._score(x[1])))
+    def _top_data(self, day: dict, only_apps: bool = False, aggregate: bool = False) -> dict:
+        # Day is loaded with its focus periods by UsagedataDB.get_day(s), so no query runs per app or title
+        apps_titles = dict(heapq.nlargest(settings.data_limit, day["apps"].items(), key=lambda x: self._score(x[1])))
 
         for app_name, app_data in apps_titles.items():
             if aggregate:
-                app_data["aggregated_focus_duration"] = self._aggregate_focus_hours(self._db_handler.get_appfocusperiod(day_log_id, app_name))
-            else:
-                app_data["hourly_focus_data"] = self._db_handler.get_appfocusperiod(day_log_id, app_name)
+                app_data["aggregated_focus_duration"] = self._aggregate_focus_hours(app_data.pop("hourly_focus_data"))
 
             if only_apps:
                 continue
@@ -121,15 +118,13 @@ class SuggestionEngine:
 
             for title_name, title_data in app_data["titles"].items():
                 if aggregate:
-                    title_data["aggregated_focus_duration"] = self._aggregate_focus_hours(self._db_handler.get_titlefocusperiod(day_log_id, app_name, title_name))
-                else:
-                    title_data["hourly_focus_data"] = self._db_handler.get_titlefocusperiod(day_log_id, app_name, title_name)
+                    title_data["aggregated_focus_duration"] = self._aggregate_focus_hours(title_data.pop("hourly_focus_data"))
 
         return apps_titles
 
     def _preprocess_log_detailed(self, day_log_id: int) -> None:
-        day_log: dict = self._db_handler.get_daylog(day_log_id, ('time_anchor',))
-        apps_titles = self._top_data(day_log_id)
+        day_log: dict = self._db_handler.get_day(day_log_id)
+        apps_titles = self._top_data(day_log)
 
         summary = textwrap.dedent(f"""
         Date Created: {datetime.fromisoformat(day_log['time_anchor']).date().isoformat()}""")
@@ -173,9 +168,15 @@ class SuggestionEngine:
 
         self.preprocessed_logs[day_log_id] = summary
 
-    def _preprocess_log_condensed(self, day_log_id: int) -> None:
-        day_log: dict = self._db_handler.get_daylog(day_log_id, ('time_anchor',))
-        apps = self._top_data(day_log_id, only_apps=True, aggregate=True)
+    def _preprocess_logs_condensed(self, day_log_ids: tuple[int]) -> None:
+        # Historical days are loaded together in one round trip, without titles
+        days: dict[int, dict] = self._db_handler.get_days(day_log_ids, titles=False)
+
+        for day_log_id in day_log_ids:
+            self._preprocess_log_condensed(day_log_id, days[day_log_id])
+
+    def _preprocess_log_condensed(self, day_log_id: int, day_log: dict) -> None:
+        apps = self._top_data(day_log, only_apps=True, aggregate=True)
 
         summary = textwrap.dedent(f"""
         Date Created: {datetime.fromisoformat(day_log['time_anchor']).date().isoformat()}""")
@@ -213,8 +214,8 @@ class SuggestionEngine:
         thread.start()
         self.preprocess_threads.append(thread)
 
-        for i in range(len(self._day_log_ids) - 1):
-            thread = threading.Thread(target=self._preprocess_log_condensed, args=(self._day_log_ids[i],), daemon=True)
+        if len(self._day_log_ids) > 1:
+            thread = threading.Thread(target=self._preprocess_logs_condensed, args=(tuple(self._day_log_ids[:-1]),), daemon=True)
             thread.start()
             self.preprocess_threads.append(thread)
 
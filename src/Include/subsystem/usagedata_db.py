@@ -1,60 +1,464 @@
 import time
-from datetime import datetime, timedelta
+import threading
+
+from array import array
+from datetime import date, datetime, timedelta
 
 from pathlib import Path
 
+from collections.abc import Iterator
+from contextlib import contextmanager
+
 from typing import Any
 
 import settings
+from settings import FocusLayout, HistoryResolution, TickStorage
 from Include.service.usagedata_service import UsagedataService
+from Include.usagedata_archive import UsagedataArchive
+from Include.interval_engine import DaySpan, split_interval
 
 class UsagedataDB:
-    def __init__(self, usagedata_dir: str):
+    db_name: str = "usagedata.db"
+
+    def __init__(self, usagedata_dir: str, write_behind: bool = False, read_only: bool = False):
         usagedata: Path = Path(usagedata_dir)
-        usagedata.mkdir(parents=True, exist_ok=True)
+        self.db_path: Path = usagedata / UsagedataDB.db_name
+
+        # observe is the only writer, other clients open the database read-only and never take its write lock
+        # or create any files
+        self.read_only: bool = read_only
+        if self.read_only and not UsagedataDB.exists(usagedata_dir):
+            raise RuntimeError("Usage data database not found, it is created by observe.")
+        if not self.read_only:
+            usagedata.mkdir(parents=True, exist_ok=True)
 
-        self.db_path: Path = usagedata / "usagedata.db"
-        self._service: UsagedataService = UsagedataService(str(self.db_path))
+        self._service: UsagedataService = UsagedataService(str(self.db_path), write_behind, read_only)
+
+        # Removed day logs are kept in full detail here, one columnar file per month
+        self.archive: UsagedataArchive = UsagedataArchive(str(usagedata / settings.archive_dir_name), read_only)
 
         self.apps_open: dict[str, set[str]] = dict()
         self.active_app: str | None = None
         self.active_title: str | None = None
 
+        # Today's log is held in memory and written through, so ticks never read from the database.
+        # It is loaded on the first tick and on day rollover, which also rebuilds it after a crash.
+        self._today_id: int | None = None
+        self._today_log: dict[str, str | int | float] = dict()
+        self._today_apps: dict[str, dict] = dict()
+        self._today_app_focus: dict[str, dict[int, dict[str, int | float]]] = dict()
+        self._today_title_focus: dict[tuple[str, str], dict[int, dict[str, int | float]]] = dict()
+        self._today_downtime: dict[int, float] = dict()
+
+        # Sub-hour focus buckets of today, float32 durations and int32 counts at focus_bucket_minutes resolution
+        self._bucket_minutes: int | None = settings.focus_bucket_minutes
+        if self._bucket_minutes is not None and (self._bucket_minutes <= 0 or 60 % self._bucket_minutes):
+            raise ValueError(f"Invalid focus bucket minutes: {self._bucket_minutes}")
+        self._today_app_buckets: dict[str, tuple[array, array]] = dict()
+        self._today_title_buckets: dict[tuple[str, str], tuple[array, array]] = dict()
+
+        # Apps and titles whose counters changed since the last write, only these rows are written
+        self._dirty_apps: set[str] = set()
+        self._dirty_titles: set[tuple[str, str]] = set()
+
+        # Replayed journal ticks only change the state in memory, it is written once per batch
+        self._defer_writes: bool = False
+
+        # Day journaled ticks go to, and ticks appended since the aggregates were last derived
+        self._journal_day: tuple[date, int] | None = None
+        self._journal_ticks: int = 0
+
+        # Integrity only changes with the date, so it is checked once and trusted until the next midnight
+        self._integrity_valid_until: datetime | None = None
+        self._integrity_lock = threading.Lock()
+
+        # Threads inside reads() leave the integrity check to the caller
+        self._local = threading.local()
+
+        # Schema, integrity and rollups are kept up to date by the writer
+        if self.read_only:
+            try:
+                self._service.check_schema_version()
+            except Exception:
+                self._service.close()
+                raise
+            return
+
         self._service.create_if_not_exists_schema()
+        self._service.migrate_focus_layout()
 
         self._ensure_log_integrity()
+
+        # Folds finished days into the rollups, for days logged before rollups existed or missed by a crash at rollover
+        self._service.finalize_rollups()
+
+    @staticmethod
+    def exists(usagedata_dir: str) -> bool:
+        # Whether observe has created the database yet
+        return (Path(usagedata_dir) / UsagedataDB.db_name).exists()
+
+    def close(self) -> None:
+        # Derives ticks this process journaled and flushes deferred writes before closing
+        if self._journal_ticks:
+            self.materialize()
+
+        self._service.close()
+
+    def flush(self) -> None:
+        self._service.flush()
+
+    def interrupt(self, thread_id: int) -> None:
+        # Aborts the query a thread is running, only supported with pooled connections. Under write-behind, writes are not aborted.
+        self._service.interrupt(thread_id)
+
+    @contextmanager
+    def snapshot(self) -> Iterator[None]:
+        # Reads made on this thread inside the block see one state of the database, on one connection.
+        # Writers are never blocked, their commits are seen after the block. Writes inside it raise RuntimeError.
+        self._ensure_log_integrity()
+
+        with self._service.snapshot():
+            yield
+
+    @contextmanager
+    def reads(self) -> Iterator[None]:
+        # Getters called on this thread inside the block never write. The caller runs ensure_log_integrity on its writer first,
+        # so reads from other threads do not add or remove day logs alongside it.
+        self._local.skip_integrity = True
+        try:
+            yield
+        finally:
+            self._local.skip_integrity = False
+
+    def log_integrity_due(self) -> bool:
+        return not self.read_only and (self._integrity_valid_until is None or datetime.today() >= self._integrity_valid_until)
+
+    def ensure_log_integrity(self) -> None:
+        self._ensure_log_integrity()
+
+    def incremental_vacuum_enabled(self) -> bool:
+        return self._service.incremental_vacuum_enabled()
+
+    def enable_incremental_vacuum(self) -> None:
+        self._service.enable_incremental_vacuum()
+
+    def checkpoint(self, truncate: bool = False, busy_timeout: float | None = None) -> tuple[int, int, int]:
+        return self._service.checkpoint(truncate, busy_timeout)
+
+    def get_freelist_count(self) -> int:
+        return self._service.get_freelist_count()
+
+    def incremental_vacuum(self, pages: int, busy_timeout: float | None = None) -> None:
+        self._service.incremental_vacuum(pages, busy_timeout)
+
+    def get_wal_size(self) -> int:
+        return self._service.get_wal_size()
+
+    def get_query_stats(self) -> dict[str, dict[str, Any]]:
+        return self._service.get_query_stats()
+
+    def export_query_stats(self, path: str, process: str) -> None:
+        self._service.export_query_stats(path, {"process": process})
+
     def _ensure_log_integrity(self) -> None:
-        self._ensure_today_log()
-        self._ensure_max_logs()
+        # Nothing can be written inside a snapshot, integrity was ensured when it began
+        if self.read_only or self._service.in_snapshot() or getattr(self._local, "skip_integrity", False):
+            return
+
+        now: datetime = datetime.today()
+        if self._integrity_valid_until is not None and now < self._integrity_valid_until:
+            return
+
+        # Threads reaching midnight together check it once, so only one of them adds the new day log
+        with self._integrity_lock:
+            if self._integrity_valid_until is not None and now < self._integrity_valid_until:
+                return
+
+            self._ensure_today_log()
+            self._ensure_max_logs()
+
+            self._integrity_valid_until = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+
+    def _invalidate_log_integrity(self) -> None:
+        self._integrity_valid_until = None
 
     def _ensure_today_log(self) -> None:
         datetime_today: datetime = datetime.today()
         current_date = datetime_today.date()
         today: str = datetime_today.isoformat()
 
-        latest_day: dict | None = self._service.get_latest_daylog(("time_anchor",))
+        latest_day: dict | None = self._service.get_latest_daylog()
         if latest_day and datetime.fromisoformat(latest_day["time_anchor"]).date() == current_date:
             return
 
         now_monotonic: float = time.monotonic()
-        self._service.add_daylog(today, now_monotonic)
+        with self._service.transaction():
+            latest_day_id: int | None = self._service.get_latest_daylog_id() if latest_day else None
+            gap: list[DaySpan] = self._downtime_since(latest_day, now_monotonic, datetime_today) if latest_day else []
+
+            # Downtime before midnight goes to the day it fell on, days in between have no day log to hold theirs
+            for span in gap:
+                if span.day == datetime.fromisoformat(latest_day["time_anchor"]).date():
+                    self._add_downtime(latest_day_id, span)
+
+            self._service.add_daylog(today, now_monotonic)
+            for span in gap:
+                if span.day == current_date:
+                    self._add_downtime(self._service.get_latest_daylog_id(), span)
+
+        # State in memory of the previous day no longer matches what was written to it
+        if gap and self._today_id == latest_day_id:
+            self._today_id = None
+
+        # Previous day is finished, so it is folded into the rollups
+        self._service.finalize_rollups()
+
+    def _downtime_since(self, day_log: dict, now: float, now_datetime: datetime) -> list[DaySpan]:
+        # Splits the time since a day log was last updated into days and hours, when it is long enough to be downtime.
+        # Nothing is split when the clocks disagree, e.g. after a reboot restarted the monotonic clock.
+        time_anchor: datetime = datetime.fromisoformat(day_log["time_anchor"])
+        datetime_shift: timedelta = now_datetime - time_anchor
+        monotime_shift: float = now - day_log["monotonic_start"]
+        if abs(datetime_shift.total_seconds() - monotime_shift) > settings.time_threshold.total_seconds():
+            return []
+
+        if now - day_log["monotonic_last_updated"] <= settings.time_threshold.total_seconds():
+            return []
+
+        last_update: datetime = time_anchor + timedelta(seconds=day_log["monotonic_last_updated"] - day_log["monotonic_start"])
+        return split_interval(last_update, now_datetime)
+
+    def _add_downtime(self, day_log_id: int, span: DaySpan) -> None:
+        downtime_period: dict[int, float] = self._service.get_downtimeperiod(day_log_id)
+        for hour, duration in span.items():
+            downtime_period[hour] = min(3600, downtime_period.get(hour, 0) + duration)
+        self._service.upsert_downtimeperiod(day_log_id, {hour: downtime_period[hour] for hour, _ in span.items()})
+
+        total_downtime_duration: float = self._service.get_daylog(day_log_id, ("total_downtime_duration",))["total_downtime_duration"]
+        self._service.update_daylog(day_log_id, {"total_downtime_duration": total_downtime_duration + sum(span.durations)})
 
     def _ensure_max_logs(self) -> None:
+        removed = False
         while self._service.get_daylog_rowcount() > settings.max_logs:
-            self._service.remove_oldest_daylog()
-
-    def _convert_mono_to_time(self, monotonic_anchor: float, datetime_compare: str, monotonic_time: float) -> Any:
-        elapsed_mono: float = monotonic_time - monotonic_anchor
-        return (datetime.fromisoformat(datetime_compare) + timedelta(seconds=elapsed_mono)).time()
+            self._service.remove_oldest_daylog(self.archive.write_day if settings.archive_expired_logs else None)
+            removed = True
+
+        # Removed day logs live on as daily summaries, older summaries are merged into months
+        if removed:
+            today = datetime.today().date()
+            monthly_cutoff = (today.year * 12 + today.month - 1) - (settings.monthly_summary_months - 1)
+            self._service.compact_summaries(
+                (today - timedelta(days=settings.daily_summary_days)).isoformat(),
+                f"{monthly_cutoff // 12:04d}-{monthly_cutoff % 12 + 1:02d}"
+            )
+
+            # Names no longer used by any day log or summary are dropped
+            self._service.prune_names()
+
+    def _load_today(self) -> None:
+        self._ensure_log_integrity()
+        self._load_day(self._service.get_latest_daylog_id())
+
+    def _load_day(self, day_log_id: int) -> None:
+        # Cached name ids may belong to writes that were rolled back
+        self._service.clear_name_cache()
+
+        self._today_id = day_log_id
+        day: dict = self._service.get_day(self._today_id)
+
+        self._today_downtime = day.pop("downtime_period")
+        self._today_apps = day.pop("apps")
+        self._today_log = day
+
+        self._today_app_focus = {app_name: app_data.pop("hourly_focus_data") for app_name, app_data in self._today_apps.items()}
+        self._today_title_focus = {
+            (app_name, title_name): title_data.pop("hourly_focus_data")
+            for app_name, app_data in self._today_apps.items()
+            for title_name, title_data in app_data["titles"].items()
+        }
+
+        self._today_app_buckets.clear()
+        self._today_title_buckets.clear()
+        if self._bucket_minutes:
+            app_buckets, title_buckets = self._service.get_day_focusbuckets(self._today_id)
+            self._today_app_buckets = {app_name: self._rebucket(*buckets) for app_name, buckets in app_buckets.items()}
+            self._today_title_buckets = {app_title: self._rebucket(*buckets) for app_title, buckets in title_buckets.items()}
+
+        self._dirty_apps.clear()
+        self._dirty_titles.clear()
+
+    def _empty_focus_buckets(self) -> tuple[array, array]:
+        slots = 1440 // self._bucket_minutes
+        return array("f", bytes(slots * 4)), array("i", bytes(slots * 4))
+
+    def _rebucket(self, bucket_minutes: int, focus_durations: bytes, focus_counts: bytes) -> tuple[array, array]:
+        if bucket_minutes == self._bucket_minutes:
+            return array("f", focus_durations), array("i", focus_counts)
+
+        # Stored at another resolution, e.g. after the setting changed mid-day, each bucket goes to the one its start falls in
+        durations, counts = self._empty_focus_buckets()
+        for i, (focus_duration, focus_count) in enumerate(zip(memoryview(focus_durations).cast("f"), memoryview(focus_counts).cast("i"))):
+            bucket = i * bucket_minutes // self._bucket_minutes
+            durations[bucket] += focus_duration
+            counts[bucket] += focus_count
+
+        return durations, counts
+
+    def _add_focus(self, focus_period: dict[int, dict[str, int | float]], buckets: tuple[array, array] | None, focus_hours: list[tuple[int, float]], focus_buckets: list[tuple[int, float]], current_hour: int, current_bucket: int, focus_count: int) -> None:
+        for hour, duration in focus_hours:
+            hour_focus = focus_period.setdefault(hour, {"focus_duration": 0, "focus_count": 0})
+            hour_focus["focus_duration"] = min(3600, hour_focus["focus_duration"] + duration)
+        focus_period[current_hour]["focus_count"] += focus_count
+
+        if buckets is not None:
+            for bucket, duration in focus_buckets:
+                buckets[0][bucket] = min(self._bucket_minutes * 60, buckets[0][bucket] + duration)
+            buckets[1][current_bucket] += focus_count
+
+    def _changed_apps_titles(self) -> dict[str, dict]:
+        # Changed apps with only their changed titles, in the shape upsert_applog_titlelog takes
+        changed: dict[str, dict] = dict()
+        for app_name in self._dirty_apps:
+            changed[app_name] = {**self._today_apps[app_name], "titles": {}}
+
+        for app_name, title_name in self._dirty_titles:
+            if app_name not in changed:
+                changed[app_name] = {**self._today_apps[app_name], "titles": {}}
+            changed[app_name]["titles"][title_name] = self._today_apps[app_name]["titles"][title_name]
+
+        return changed
+
+    def _ensure_today_state(self) -> None:
+        # Day rollover is detected from the state in memory, the database is only read when the day changes
+        if self._today_id is None or datetime.fromisoformat(self._today_log["time_anchor"]).date() != datetime.today().date():
+            self._load_today()
 
     def update_apps(self, app_title_map: dict[str, set[str]], app_executable_path: dict[str, str], active_app: str | None = None, active_title: str | None = None) -> None:
-        self._ensure_log_integrity()
+        if settings.tick_storage == TickStorage.JOURNAL:
+            self._append_tick(app_title_map, app_executable_path, active_app, active_title)
+            return
+
+        self._ensure_today_state()
 
-        today_log: dict = self._service.get_latest_daylog()
+        try:
+            self._update_today(app_title_map, app_executable_path, active_app, active_title, time.monotonic(), datetime.today())
+        except Exception:
+            # State in memory may no longer match the database, so it is rebuilt and checked again on the next tick
+            self._today_id = None
+            self._invalidate_log_integrity()
+            raise
 
+    def _append_tick(self, app_title_map: dict[str, set[str]], app_executable_path: dict[str, str], active_app: str | None, active_title: str | None) -> None:
         now: float = time.monotonic()
         now_datetime: datetime = datetime.today()
 
+        # On the first tick and at rollover the finished day is derived before the next day log is created and rolled up
+        if self._journal_day is None or self._journal_day[0] != now_datetime.date():
+            self.materialize()
+            self._ensure_log_integrity()
+            self._journal_day = (now_datetime.date(), self._service.get_latest_daylog_id())
+
+        self._service.append_tick(self._journal_day[1], now, now_datetime.timestamp(), app_title_map, app_executable_path, active_app, active_title)
+
+        self._journal_ticks += 1
+        if self._journal_ticks >= settings.journal_derive_ticks:
+            self.materialize()
+
+    def materialize(self) -> None:
+        # Derives the aggregate tables from journaled ticks not derived yet, by replaying them in order.
+        # Each day's aggregates and watermark are written in one transaction, so a crash never derives a tick twice.
+        self._journal_ticks = 0
+
+        ticks = list(self._service.iterate_pending_ticks())
+        if not ticks:
+            return
+
+        try:
+            day_log_id: int | None = None
+            last_tick_id: int = 0
+            for tick_id, tick_day_log_id, monotonic, timestamp, active_app, active_title, app_title_map in ticks:
+                if tick_day_log_id != day_log_id:
+                    if day_log_id is not None:
+                        self._finish_materialize(day_log_id, last_tick_id)
+
+                    day_log_id = tick_day_log_id
+                    if self._today_id != day_log_id:
+                        self._load_day(day_log_id)
+                    executable_paths: dict[str, str] = self._service.get_journal_executable_paths(day_log_id)
+
+                    # The day's last derived tick is not replayed, it only restores the state the next tick starts from
+                    if tick_id == self._service.get_journal_watermark(day_log_id):
+                        self.apps_open.clear()
+                        self.apps_open.update(app_title_map)
+                        if active_app and active_title:
+                            self.active_app = active_app
+                            self.active_title = active_title
+                        last_tick_id = tick_id
+                        continue
+
+                self._defer_writes = True
+                try:
+                    self._update_today(app_title_map, executable_paths, active_app, active_title, monotonic, datetime.fromtimestamp(timestamp))
+                finally:
+                    self._defer_writes = False
+                last_tick_id = tick_id
+
+            self._finish_materialize(day_log_id, last_tick_id)
+        except Exception:
+            # State in memory may no longer match the database, so it is rebuilt from the last watermark
+            self._today_id = None
+            self._invalidate_log_integrity()
+            raise
+
+    def _finish_materialize(self, day_log_id: int, tick_id: int) -> None:
+        with self._service.transaction():
+            self._flush_today()
+            self._service.set_journal_watermark(day_log_id, tick_id)
+
+    def _flush_today(self) -> None:
+        # Writes the state in memory that deferred ticks changed
+        vectors: bool = self._service.focus_layout == FocusLayout.VECTORS
+
+        self._service.upsert_applog_titlelog(self._today_id, self._changed_apps_titles())
+        for app_name in self._dirty_apps:
+            if app_name in self._today_app_focus:
+                if vectors:
+                    self._service.replace_appfocusperiod(self._today_id, app_name, self._today_app_focus[app_name])
+                else:
+                    self._service.upsert_appfocusperiod(self._today_id, app_name, self._today_app_focus[app_name])
+        for app_name, title_name in self._dirty_titles:
+            if (app_name, title_name) in self._today_title_focus:
+                if vectors:
+                    self._service.replace_titlefocusperiod(self._today_id, app_name, title_name, self._today_title_focus[(app_name, title_name)])
+                else:
+                    self._service.upsert_titlefocusperiod(self._today_id, app_name, title_name, self._today_title_focus[(app_name, title_name)])
+
+        if self._bucket_minutes:
+            for app_name in self._dirty_apps:
+                if app_name in self._today_app_buckets:
+                    self._service.replace_appfocusbuckets(self._today_id, app_name, self._bucket_minutes, *self._today_app_buckets[app_name])
+            for app_name, title_name in self._dirty_titles:
+                if (app_name, title_name) in self._today_title_buckets:
+                    self._service.replace_titlefocusbuckets(self._today_id, app_name, title_name, self._bucket_minutes, *self._today_title_buckets[(app_name, title_name)])
+
+        if vectors:
+            self._service.replace_downtimeperiod(self._today_id, self._today_downtime)
+        else:
+            self._service.upsert_downtimeperiod(self._today_id, self._today_downtime)
+        self._service.update_daylog(self._today_id, self._today_log)
+
+        self._dirty_apps.clear()
+        self._dirty_titles.clear()
+
+    def get_ticks(self, day_log_id: int) -> Iterator[tuple[int, int, float, float, str | None, str | None, dict[str, set[str]]]]:
+        # Journaled ticks of a day, as (tick_id, day_log_id, monotonic, timestamp, active_app, active_title, app_title_map)
+        self._ensure_log_integrity()
+
+        return self._service.iterate_ticks(day_log_id)
+
+    def _update_today(self, app_title_map: dict[str, set[str]], app_executable_path: dict[str, str], active_app: str | None, active_title: str | None, now: float, now_datetime: datetime) -> None:
+        today_log: dict = self._today_log
+
         datetime_shift: timedelta = now_datetime - datetime.fromisoformat(today_log["time_anchor"])
         monotime_shift: float = now - today_log["monotonic_start"]
         if abs(datetime_shift.total_seconds() - monotime_shift) > settings.time_threshold.total_seconds():
@@ -70,47 +474,32 @@ class UsagedataDB:
                 self.active_app = active_app
                 self.active_title = active_title
 
-            self._service.update_latest_daylog(today_log)
+            if not self._defer_writes:
+                self._service.update_daylog(self._today_id, today_log)
 
             return
         
-        current_hour: int = self._convert_mono_to_time(today_log["monotonic_start"], today_log["time_anchor"], now).hour
+        # Time since the last update is split into the hours and buckets it covers.
+        # Gaps across midnight are split when the next day log is created, so parts falling on another date are left out here.
+        time_anchor: datetime = datetime.fromisoformat(today_log["time_anchor"])
+        today_date: date = time_anchor.date()
+        last_update: datetime = time_anchor + timedelta(seconds=today_log["monotonic_last_updated"] - today_log["monotonic_start"])
+        current_time: datetime = last_update + timedelta(seconds=now - today_log["monotonic_last_updated"])
+        current_hour: int = current_time.hour
 
         downtime: float = now - today_log["monotonic_last_updated"]
         if downtime > settings.time_threshold.total_seconds():
             today_log["total_downtime_duration"] += downtime
 
-            last_update_timestamp: Any = self._convert_mono_to_time(today_log["monotonic_start"], today_log["time_anchor"], today_log["monotonic_last_updated"])
-            last_update_hour: int = last_update_timestamp.hour
-
-            downtime_period: dict[int, float] = self._service.get_latest_downtimeperiod()
-
-            blackout_hours: int = (current_hour - last_update_hour) % 24
-            while blackout_hours > 1:
-                blackout_hour: int = (last_update_hour + blackout_hours - 1) % 24
-                if blackout_hour not in downtime_period:
-                    downtime_period[blackout_hour] = 0
-                downtime_period[blackout_hour] = 3600
-
-                downtime -= 3600
-                blackout_hours -= 1
-
-            downtime: float = max(0, downtime)
+            downtime_period: dict[int, float] = self._today_downtime
+            changed_hours: set[int] = set()
 
-            if blackout_hours == 1:
-                if last_update_hour not in downtime_period:
-                    downtime_period[last_update_hour] = 0
-
-                last_update_hour_downtime: int = 3600 - (last_update_timestamp.minute * 60 + last_update_timestamp.second)
-                downtime_period[last_update_hour] = min(3600, downtime_period[last_update_hour] + last_update_hour_downtime)
-
-                downtime -= last_update_hour_downtime
-
-            downtime: float = max(0, downtime)
-
-            if current_hour not in downtime_period:
-                downtime_period[current_hour] = 0
-            downtime_period[current_hour] = min(3600, downtime_period[current_hour] + downtime)
+            for span in split_interval(last_update, current_time):
+                if span.day != today_date:
+                    continue
+                for hour, duration in span.items():
+                    downtime_period[hour] = min(3600, downtime_period.get(hour, 0) + duration)
+                    changed_hours.add(hour)
 
             self.apps_open.clear()
             self.apps_open.update(app_title_map)
@@ -121,51 +510,120 @@ class UsagedataDB:
 
             today_log["monotonic_last_updated"] = now
 
-            self._service.upsert_latest_downtimeperiod(downtime_period)
-            self._service.update_latest_daylog(today_log)                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                         
+            if self._defer_writes:
+                return
+
+            if self._service.focus_layout == FocusLayout.VECTORS:
+                # Vectors are written whole from the state in memory, so nothing is read back
+                self._service.replace_downtimeperiod(self._today_id, downtime_period)
+            else:
+                self._service.upsert_downtimeperiod(self._today_id, {hour: downtime_period[hour] for hour in changed_hours})
+            self._service.update_daylog(self._today_id, {
+                "total_downtime_duration": today_log["total_downtime_duration"],
+                "monotonic_last_updated": now
+            })
 
             return
         
         elapsed_time: float = now - today_log["monotonic_last_updated"]
 
-        apps_titles: dict = self._service.get_latest_applog_titlelog()
+        # Focus time goes to the hours and buckets it covers, focus counts to the current ones
+        focus_hours: list[tuple[int, float]] = [item for span in split_interval(last_update, current_time) if span.day == today_date for item in span.items()]
+        focus_buckets: list[tuple[int, float]] = []
+        current_bucket: int = 0
+        if self._bucket_minutes:
+            focus_buckets = [item for span in split_interval(last_update, current_time, self._bucket_minutes) if span.day == today_date for item in span.items()]
+            current_bucket = (current_hour * 60 + current_time.minute) // self._bucket_minutes
+
+        apps_titles: dict = self._today_apps
 
         # Update focus time and count for active app and active title
         if active_app and active_title and active_app in apps_titles:
-            active_app_focus_period: dict[int, dict[str, int | float]] = self._service.get_latest_appfocusperiod(active_app)
+            app_focused: bool = active_app in self.apps_open
+            app_switched: bool = not self.active_app or active_app != self.active_app
+
+            active_app_focus_period: dict[int, dict[str, int | float]] = self._today_app_focus.setdefault(active_app, dict())
             if current_hour not in active_app_focus_period:
                 active_app_focus_period[current_hour] = {
                     "focus_duration": 0,
                     "focus_count": 0
                 }
-
-            if active_app in self.apps_open:
-                active_app_focus_period[current_hour]["focus_duration"] = min(3600, active_app_focus_period[current_hour]["focus_duration"] + elapsed_time)
+                self._dirty_apps.add(active_app)
+
+            if self._bucket_minutes and active_app not in self._today_app_buckets:
+                self._today_app_buckets[active_app] = self._empty_focus_buckets()
+                self._dirty_apps.add(active_app)
+
+            self._add_focus(
+                active_app_focus_period,
+                self._today_app_buckets.get(active_app),
+                focus_hours if app_focused else [],
+                focus_buckets if app_focused else [],
+                current_hour,
+                current_bucket,
+                1 if app_switched else 0
+            )
+
+            if app_focused:
                 apps_titles[active_app]["total_focus_duration"] += elapsed_time
+                self._dirty_apps.add(active_app)
 
-            if not self.active_app or active_app != self.active_app:
-                active_app_focus_period[current_hour]["focus_count"] += 1
+            if app_switched:
                 apps_titles[active_app]["total_focus_count"] += 1
-
-            self._service.upsert_latest_appfocusperiod(active_app, active_app_focus_period)
+                self._dirty_apps.add(active_app)
+
+            # Only the hours since the last tick can change
+            changed_hours: set[int] = {current_hour, *(hour for hour, _ in focus_hours)} & active_app_focus_period.keys()
+            if not self._defer_writes:
+                if self._service.focus_layout == FocusLayout.VECTORS:
+                    self._service.replace_appfocusperiod(self._today_id, active_app, active_app_focus_period)
+                else:
+                    self._service.upsert_appfocusperiod(self._today_id, active_app, {hour: active_app_focus_period[hour] for hour in changed_hours})
+                if self._bucket_minutes:
+                    self._service.replace_appfocusbuckets(self._today_id, active_app, self._bucket_minutes, *self._today_app_buckets[active_app])
 
             if active_title in apps_titles[active_app]["titles"]:
-                active_title_focus_period: dict[int, dict[str, int | float]] = self._service.get_latest_titlefocusperiod(active_app, active_title)
+                title_focused: bool = active_title in self.apps_open.get(active_app, {})
+                title_switched: bool = not self.active_title or active_title != self.active_title
+
+                active_title_focus_period: dict[int, dict[str, int | float]] = self._today_title_focus.setdefault((active_app, active_title), dict())
                 if current_hour not in active_title_focus_period:
                     active_title_focus_period[current_hour] = {
                         "focus_duration": 0,
                         "focus_count": 0
                     }
-
-                if active_title in self.apps_open.get(active_app, {}):
-                    active_title_focus_period[current_hour]["focus_duration"] = min(3600, active_title_focus_period[current_hour]["focus_duration"] + elapsed_time)
+                    self._dirty_titles.add((active_app, active_title))
+
+                if self._bucket_minutes and (active_app, active_title) not in self._today_title_buckets:
+                    self._today_title_buckets[(active_app, active_title)] = self._empty_focus_buckets()
+                    self._dirty_titles.add((active_app, active_title))
+
+                self._add_focus(
+                    active_title_focus_period,
+                    self._today_title_buckets.get((active_app, active_title)),
+                    focus_hours if title_focused else [],
+                    focus_buckets if title_focused else [],
+                    current_hour,
+                    current_bucket,
+                    1 if title_switched else 0
+                )
+
+                if title_focused:
                     apps_titles[active_app]["titles"][active_title]["total_focus_duration"] += elapsed_time
+                    self._dirty_titles.add((active_app, active_title))
 
-                if not self.active_title or active_title != self.active_title:
-                    active_title_focus_period[current_hour]["focus_count"] += 1
+                if title_switched:
                     apps_titles[active_app]["titles"][active_title]["total_focus_count"] += 1
+                    self._dirty_titles.add((active_app, active_title))
 
-                self._service.upsert_latest_titlefocusperiod(active_app, active_title, active_title_focus_period)
+                changed_hours = {current_hour, *(hour for hour, _ in focus_hours)} & active_title_focus_period.keys()
+                if not self._defer_writes:
+                    if self._service.focus_layout == FocusLayout.VECTORS:
+                        self._service.replace_titlefocusperiod(self._today_id, active_app, active_title, active_title_focus_period)
+                    else:
+                        self._service.upsert_titlefocusperiod(self._today_id, active_app, active_title, {hour: active_title_focus_period[hour] for hour in changed_hours})
+                    if self._bucket_minutes:
+                        self._service.replace_titlefocusbuckets(self._today_id, active_app, active_title, self._bucket_minutes, *self._today_title_buckets[(active_app, active_title)])
 
         # Ensure all apps and titles are present in the database
         for app in app_title_map:
@@ -177,6 +635,7 @@ class UsagedataDB:
                     "total_focus_count": 0,
                     "titles": {}
                 }
+                self._dirty_apps.add(app)
             for title in app_title_map[app]:
                 if title not in apps_titles[app]["titles"]:
                     apps_titles[app]["titles"][title] = {
@@ -184,15 +643,18 @@ class UsagedataDB:
                         "total_focus_duration": 0,
                         "total_focus_count": 0
                     }
+                    self._dirty_titles.add((app, title))
 
         # Update executable and durations for all apps and titles
         for app in app_title_map:
             if app in self.apps_open:
                 apps_titles[app]["total_duration"] += elapsed_time
+                self._dirty_apps.add(app)
 
             for title in app_title_map[app]:
                 if title in self.apps_open.get(app, {}):
                     apps_titles[app]["titles"][title]["total_duration"] += elapsed_time
+                    self._dirty_titles.add((app, title))
 
         # Update apps_open with current state
         self.apps_open.clear()
@@ -205,8 +667,14 @@ class UsagedataDB:
 
         today_log["monotonic_last_updated"] = now
 
-        self._service.upsert_latest_applog_titlelog(apps_titles)
-        self._service.update_latest_daylog(today_log)
+        if self._defer_writes:
+            return
+
+        self._service.upsert_applog_titlelog(self._today_id, self._changed_apps_titles())
+        self._service.update_daylog(self._today_id, {"monotonic_last_updated": now})
+
+        self._dirty_apps.clear()
+        self._dirty_titles.clear()
     
     def get_daylog_ids(self) -> list[int]:
         self._ensure_log_integrity()
@@ -227,7 +695,22 @@ class UsagedataDB:
         self._ensure_log_integrity()
 
         return self._service.get_applog_titlelog(day_log_id)
+
+    def iterate_applog_titlelog(self, day_log_id: int) -> Iterator[tuple[str, dict[str, int | float | dict[str, str | int | float]]]]:
+        self._ensure_log_integrity()
+
+        return self._service.iterate_applog_titlelog(day_log_id)
     
+    def get_days(self, day_log_ids: tuple[int], titles: bool = True) -> dict[int, dict]:
+        self._ensure_log_integrity()
+
+        return self._service.get_days(day_log_ids, titles)
+
+    def get_day(self, day_log_id: int, titles: bool = True) -> dict:
+        self._ensure_log_integrity()
+
+        return self._service.get_day(day_log_id, titles)
+
     def get_appfocusperiod(self, day_log_id: int, app_name: str) -> dict[int, dict[str, float]]:
         self._ensure_log_integrity()
 
@@ -237,21 +720,52 @@ class UsagedataDB:
         self._ensure_log_integrity()
 
         return self._service.get_titlefocusperiod(day_log_id, app_name, title_name)
+
+    def get_downtimevector(self, day_log_id: int) -> memoryview:
+        self._ensure_log_integrity()
+
+        return self._service.get_downtimevector(day_log_id)
+
+    def get_appfocusvector(self, day_log_id: int, app_name: str) -> tuple[memoryview, memoryview]:
+        self._ensure_log_integrity()
+
+        return self._service.get_appfocusvector(day_log_id, app_name)
+
+    def get_titlefocusvector(self, day_log_id: int, app_name: str, title_name: str) -> tuple[memoryview, memoryview]:
+        self._ensure_log_integrity()
+
+        return self._service.get_titlefocusvector(day_log_id, app_name, title_name)
     
-    def get_mostused_app(self, app_names: tuple[str]) -> str | None:
+    def get_appfocusbuckets(self, day_log_id: int, app_name: str) -> tuple[int, memoryview, memoryview] | None:
+        # (bucket_minutes, focus_durations, focus_counts) as stored, None if the app has no buckets that day
+        self._ensure_log_integrity()
+
+        return self._service.get_appfocusbuckets(day_log_id, app_name)
+
+    def get_titlefocusbuckets(self, day_log_id: int, app_name: str, title_name: str) -> tuple[int, memoryview, memoryview] | None:
+        self._ensure_log_integrity()
+
+        return self._service.get_titlefocusbuckets(day_log_id, app_name, title_name)
+
+    def get_history(self, resolution: HistoryResolution = HistoryResolution.DAY) -> dict[str, dict]:
+        # App totals per day or month, across day logs and the summaries of removed day logs
         self._ensure_log_integrity()
 
-        day_log_ids: tuple = tuple(self._service.get_daylog_ids())
+        return self._service.get_history(resolution)
+
+    def get_rollup(self, titles: bool = True) -> dict:
+        # Totals and hourly heatmaps over every finished day, today is left out until rollover
+        self._ensure_log_integrity()
+
+        return self._service.get_rollup(titles)
+
+    def get_mostused_app(self, app_names: tuple[str]) -> str | None:
+        self._ensure_log_integrity()
 
-        total_durations_today: tuple = tuple(self._service.get_totalduration(app_name, day_log_ids[-1]) for app_name in app_names)
-        total_durations_historical: tuple = tuple(self._service.get_totalduration(app_name, day_log_ids[:-1]) for app_name in app_names)
+        if not app_names:
+            return None
 
-        total_durations_weighted = tuple(map(
-            lambda total_durations: settings.class_day_historical_weight * total_durations[1] + (1 - settings.class_day_historical_weight) * total_durations[0],
-            zip(total_durations_today, total_durations_historical)
-        ))
+        # Weighted durations of every candidate come from one query, apps never used weigh 0
+        total_durations_weighted: dict[str, float] = self._service.get_weighted_totaldurations(app_names, settings.class_day_historical_weight)
 
-        return max(
-            zip(app_names, total_durations_weighted),
-            key=lambda item: item[1]
-        )[0]
\ No newline at end of file
+        return max(app_names, key=lambda app_name: total_durations_weighted.get(app_name, 0))
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import mmap
+import struct
+
+from array import array
+from pathlib import Path
+from collections.abc import Iterator
+
+from typing import Any
+
+class ArchiveMonth:
+    # Memory mapped reader for one month of the archive. Columns are returned as memoryviews over the mapping,
+    # so nothing is copied until they are read, and they can be handed to numpy.frombuffer as they are.
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: list[memoryview] = []
+
+        magic, header_length = struct.unpack_from("<8sI", self._mmap, 0)
+        if magic != UsagedataArchive.magic:
+            self.close()
+            raise ValueError(f"Not a usage data archive: {path}")
+
+        header: dict[str, Any] = json.loads(self._mmap[12:12 + header_length])
+        if header["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"Archive byte order {header['byteorder']} does not match this machine: {path}")
+
+        self.month: str = header["month"]
+        self.names: list[str] = header["names"]
+        self._tables: dict[str, dict] = header["tables"]
+        self._data_start: int = 12 + header_length
+
+    def __enter__(self) -> "ArchiveMonth":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # Views handed out are released first, the mapping can not be closed while they are exported
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+
+        self._mmap.close()
+        self._file.close()
+
+    def row_count(self, table: str) -> int:
+        return self._tables[table]["rows"]
+
+    def column(self, table: str, column: str) -> memoryview:
+        table_info = self._tables[table]
+        column_info = table_info["columns"][column]
+        size = struct.calcsize(column_info["format"])
+
+        start = self._data_start + column_info["offset"]
+        view = memoryview(self._mmap)
+        block = view[start:start + table_info["rows"] * size]
+        values = block.cast(column_info["format"])
+        self._views.extend((view, block, values))
+
+        return values
+
+    def iterate(self, table: str) -> Iterator[tuple]:
+        # Rows as tuples in column order, app and title columns hold indexes into names
+        return zip(*(self.column(table, column) for column in UsagedataArchive.tables[table]))
+
+class UsagedataArchive:
+    # Cold storage for day logs removed from the database, one columnar file per month.
+    # Each file holds a JSON header, then every column as a fixed width block aligned to 8 bytes.
+    # App and title names are dictionary encoded into the header, days are stored as YYYYMMDD integers.
+
+    magic: bytes = b"PAOSARC1"
+
+    # Table name to its columns and their array formats
+    tables: dict[str, dict[str, str]] = {
+        "days": {"day": "i", "total_downtime_duration": "d", "total_anomalies": "i"},
+        "apps": {"day": "i", "app": "i", "total_duration": "d", "total_focus_duration": "d", "total_focus_count": "i"},
+        "titles": {"day": "i", "app": "i", "title": "i", "total_duration": "d", "total_focus_duration": "d", "total_focus_count": "i"},
+        "downtime_hours": {"day": "i", "hour": "i", "downtime_duration": "d"},
+        "app_hours": {"day": "i", "app": "i", "hour": "i", "focus_duration": "d", "focus_count": "i"},
+        "title_hours": {"day": "i", "app": "i", "title": "i", "hour": "i", "focus_duration": "d", "focus_count": "i"}
+    }
+
+    def __init__(self, archive_dir: str, read_only: bool = False):
+        self.archive_dir: Path = Path(archive_dir)
+
+        # Read-only archives never touch the filesystem, a missing directory reads as an empty archive
+        self.read_only: bool = read_only
+        if not self.read_only:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, month: str) -> Path:
+        return self.archive_dir / f"{month}.parc"
+
+    def months(self) -> list[str]:
+        return sorted(path.stem for path in self.archive_dir.glob("*.parc"))
+
+    def open_month(self, month: str) -> ArchiveMonth:
+        path = self._path(month)
+        if not path.exists():
+            raise ValueError(f"No archive for month: {month}")
+
+        return ArchiveMonth(str(path))
+
+    @staticmethod
+    def _day_rows(day: dict, name_index: dict[str, int], names: list[str]) -> dict[str, list[tuple]]:
+        def index(name: str) -> int:
+            if name not in name_index:
+                name_index[name] = len(names)
+                names.append(name)
+            return name_index[name]
+
+        date = int(day["time_anchor"][:10].replace("-", ""))
+        rows: dict[str, list[tuple]] = {table: [] for table in UsagedataArchive.tables}
+
+        rows["days"].append((date, day["total_downtime_duration"], day["total_anomalies"]))
+        for hour, duration in day["downtime_period"].items():
+            rows["downtime_hours"].append((date, hour, duration))
+
+        for app_name, app_data in day["apps"].items():
+            app = index(app_name)
+            rows["apps"].append((date, app, app_data["total_duration"], app_data["total_focus_duration"], app_data["total_focus_count"]))
+            for hour, focus_data in app_data["hourly_focus_data"].items():
+                rows["app_hours"].append((date, app, hour, focus_data["focus_duration"], focus_data["focus_count"]))
+
+            for title_name, title_data in app_data["titles"].items():
+                title = index(title_name)
+                rows["titles"].append((date, app, title, title_data["total_duration"], title_data["total_focus_duration"], title_data["total_focus_count"]))
+                for hour, focus_data in title_data["hourly_focus_data"].items():
+                    rows["title_hours"].append((date, app, title, hour, focus_data["focus_duration"], focus_data["focus_count"]))
+
+        return rows
+
+    def write_day(self, day: dict) -> None:
+        # Adds a day, as loaded by UsagedataService.get_day, to its month's file.
+        # A day already in the file is replaced, so archiving it again after a crash does not duplicate it.
+        if self.read_only:
+            raise RuntimeError("Archive is opened read-only.")
+
+        month = day["time_anchor"][:7]
+        date = int(day["time_anchor"][:10].replace("-", ""))
+
+        names: list[str] = []
+        rows: dict[str, list[tuple]] = {table: [] for table in UsagedataArchive.tables}
+
+        if self._path(month).exists():
+            with self.open_month(month) as archive_month:
+                names = list(archive_month.names)
+                for table in UsagedataArchive.tables:
+                    rows[table] = [row for row in archive_month.iterate(table) if row[0] != date]
+
+        for table, table_rows in UsagedataArchive._day_rows(day, {name: i for i, name in enumerate(names)}, names).items():
+            rows[table].extend(table_rows)
+
+        self._write(month, names, rows)
+
+    def _write(self, month: str, names: list[str], rows: dict[str, list[tuple]]) -> None:
+        blocks: list[bytes] = []
+        tables: dict[str, dict] = dict()
+
+        # Offsets are relative to the first column block, which follows the header
+        offset = 0
+        for table, columns in UsagedataArchive.tables.items():
+            tables[table] = {"rows": len(rows[table]), "columns": dict()}
+            for i, (column, column_format) in enumerate(columns.items()):
+                block = array(column_format, (row[i] for row in rows[table])).tobytes()
+                block += bytes(-len(block) % 8)
+                tables[table]["columns"][column] = {"format": column_format, "offset": offset}
+                blocks.append(block)
+                offset += len(block)
+
+        header = json.dumps({"month": month, "byteorder": sys.byteorder, "names": names, "tables": tables}).encode()
+        header += b" " * (-(12 + len(header)) % 8)
+
+        # Written next to the month's file and swapped in, so readers never see a partial file
+        path = self._path(month)
+        temporary_path = path.with_suffix(".tmp")
+        with open(temporary_path, "wb") as file:
+            file.write(struct.pack("<8sI", UsagedataArchive.magic, len(header)))
+            file.write(header)
+            for block in blocks:
+                file.write(block)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
@@ -31,7 +31,8 @@ class ParserWrapper:
         self._apps_with_nicknames: set | None = None
         self._apps_in_class: set | None = None
 
-        self._usagedata_db: UsagedataDB = UsagedataDB(settings.usagedata_dir)
+        # Opened read-only on first use, observe is the writer and creates the database once it starts
+        self._usagedata_db: UsagedataDB | None = None
 
         self._observe: subprocess.Popen | None = None
         if environment == settings.Environment.PROD:
@@ -41,6 +42,13 @@ class ParserWrapper:
         else:
             raise ValueError(f"Invalid environment: '{environment}'. Valid options are: {[env.value for env in settings.Environment]}")
         
+    def _get_usagedata_db(self) -> UsagedataDB | None:
+        # None until observe has created the database
+        if self._usagedata_db is None and UsagedataDB.exists(settings.usagedata_dir):
+            self._usagedata_db = UsagedataDB(settings.usagedata_dir, read_only = True)
+
+        return self._usagedata_db
+
     def _load_commands(self) -> dict:
         # Loads commands from file
 
@@ -267,6 +275,9 @@ class ParserWrapper:
         if self._observe is not None:
             self._observe.terminate()
             self._observe.wait()
+
+        if self._usagedata_db is not None:
+            self._usagedata_db.close()
     
     def has_nicknames(self, app: str) -> bool:
         # Returns whether an app has nicknames
@@ -641,9 +652,13 @@ class ParserWrapper:
 
         app_executablepath_map = dict()
         
-        daylog_ids = self._usagedata_db.get_daylog_ids()
+        usagedata_db = self._get_usagedata_db()
+        if usagedata_db is None:
+            return app_executablepath_map
+
+        daylog_ids = usagedata_db.get_daylog_ids()
         for daylog_id in daylog_ids:
-            applog_titlelog = self._usagedata_db.get_applog_titlelog(daylog_id)
+            applog_titlelog = usagedata_db.get_applog_titlelog(daylog_id)
             
             for app_name, app_data in applog_titlelog.items():
                 if "executable_path" not in app_data:
@@ -686,4 +701,8 @@ class ParserWrapper:
         if class_name not in class_app_map:
             raise ValueError(f"Class {class_name} not found in nickname app map")
         
-        return self._usagedata_db.get_mostused_app(tuple(class_app_map[class_name]))
\ No newline at end of file
+        usagedata_db = self._get_usagedata_db()
+        if usagedata_db is None:
+            return None
+
+        return usagedata_db.get_mostused_app(tuple(class_app_map[class_name]))
\ No newline at end of file
@@ -1,74 +1,540 @@
 import sqlite3
 import threading
+import time
+from collections import namedtuple
+from collections.abc import Iterator
 from contextlib import contextmanager
+from enum import Enum
 from pathlib import Path
 
+from typing import Any
+
+from Include.query_profiler import QueryProfiler
+
+class RowFactory(Enum):
+    ROW = "row"         # sqlite3.Row, indexed by position or column name
+    TUPLE = "tuple"     # Plain tuples, cheapest to build
+    RECORD = "record"   # Named tuples, one class generated per column list
+
 class SQLiteWrapper:
     class _TxProxy:
-        def __init__(self, conn: sqlite3.Connection):
+        def __init__(self, conn: sqlite3.Connection, wrapper: "SQLiteWrapper"):
             self._conn = conn
+            self._wrapper = wrapper
 
         def execute(self, query: str, params: tuple = ()) -> None:
-            self._conn.execute(query, params)
+            started = time.perf_counter()
+            cursor = self._conn.execute(query, params)
+            self._wrapper._record(self._conn, query, params, started, cursor.rowcount)
 
         def execute_many(self, query: str, params: list[tuple] = []) -> None:
-            self._conn.executemany(query, params)
-        
-    def __init__(self, db_path: str):
+            started = time.perf_counter()
+            cursor = self._conn.executemany(query, params)
+            self._wrapper._record(self._conn, query, params[0] if params else (), started, cursor.rowcount)
+
+    # Seconds a connection waits on locks held by other connections
+    _busy_timeout: int = 30
+
+    # PRAGMAs that can be tuned through the pragmas argument
+    _connection_pragmas: tuple = ("mmap_size", "cache_size", "temp_store", "wal_autocheckpoint")
+    _database_pragmas: tuple = ("page_size", "auto_vacuum")
+
+    def __init__(self, db_path: str, pooled: bool = False, health_check_interval: float = 60, write_behind: bool = False, flush_interval: float = 10, profiler: QueryProfiler | None = None, pragmas: dict[str, int | str] | None = None, statement_cache_size: int = 128, row_factory: RowFactory = RowFactory.ROW, read_only: bool = False):
         self.db_path = Path(db_path)
-        self._lock = threading.Lock()
+
+        # Read-only clients open the database through a mode=ro URI, so they never take a write lock
+        self.read_only = read_only
+        if self.read_only and write_behind:
+            raise ValueError("Write-behind mode needs a writable database.")
+
+        # Default shape of fetched rows, each fetch can override it
+        self.row_factory: RowFactory = row_factory
+        self._record_classes: dict[tuple[str, ...], type] = dict()
+
+        # Each connection keeps an LRU of prepared statements keyed by SQL text
+        self._statement_cache_size = statement_cache_size
+
+        self.pragmas: dict[str, int | str] = dict(pragmas or {})
+        for pragma, value in self.pragmas.items():
+            if pragma not in SQLiteWrapper._connection_pragmas and pragma not in SQLiteWrapper._database_pragmas:
+                raise ValueError(f"Invalid pragma: {pragma}")
+            if not isinstance(value, int) and not str(value).isalnum():
+                raise ValueError(f"Invalid value for pragma {pragma}: {value}")
+
+        # Opt-in statement timings, None disables profiling
+        self.profiler = profiler
+
+        # WAL allows readers alongside a writer, so only writes are serialized
+        self._write_lock = threading.Lock()
+
+        # Pooled mode keeps one long-lived connection per thread instead of connecting on every call
+        self.pooled = pooled
+        self._health_check_interval = health_check_interval
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._pool: dict[int, tuple[threading.Thread, sqlite3.Connection]] = dict()
+        self._closed = False
+
+        # Write-behind mode runs writes inside an open transaction on a single writer connection,
+        # a background thread commits them together every flush interval.
+        # The commit only appends to the WAL, which synchronous=NORMAL does not fsync. The fsync happens when the WAL is
+        # checkpointed, which the background thread does after releasing the write lock, so writes never wait on it.
+        # Writes still wait while a commit appends to the WAL. Between flushes the writer holds the database write lock,
+        # so other connections that write wait up to a flush interval, readers are not blocked.
+        self.write_behind = write_behind
+        self._flush_interval = flush_interval
+        self._writer_conn: sqlite3.Connection | None = None
+        # Thread reading through the writer connection, reads there can be interrupted, writes can not
+        self._writer_reader: int | None = None
+        self._writer_reader_lock = threading.Lock()
+        self._flush_stop = threading.Event()
+        self._flush_thread: threading.Thread | None = None
 
         self._initialize_db()
 
+        if self.write_behind:
+            self._flush_thread = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flush_thread.start()
+
+    def _connect(self, shared: bool = False) -> sqlite3.Connection:
+        database: str | Path = self.db_path
+        options: dict[str, Any] = dict()
+        if self.read_only:
+            database = f"{self.db_path.resolve().as_uri()}?mode=ro"
+            options["uri"] = True
+
+        if self.pooled or shared:
+            # Pooled and writer connections may be closed from the thread calling close(), so same thread check is disabled.
+            # Each connection is still only used by one thread at a time.
+            conn = sqlite3.connect(database, timeout=SQLiteWrapper._busy_timeout, isolation_level=None, check_same_thread=False, cached_statements=self._statement_cache_size, **options)
+        else:
+            conn = sqlite3.connect(database, timeout=SQLiteWrapper._busy_timeout, isolation_level=None, cached_statements=self._statement_cache_size, **options)
+        conn.row_factory = sqlite3.Row if self.row_factory == RowFactory.ROW else None
+
+        # Connection level PRAGMAs, applied once per connection
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA foreign_keys=ON;")
+        for pragma, value in self.pragmas.items():
+            if pragma in SQLiteWrapper._connection_pragmas:
+                conn.execute(f"PRAGMA {pragma}={value};")
+
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _prune_pool(self) -> None:
+        # Closes connections owned by threads that have exited
+        for thread_id, (thread, conn) in list(self._pool.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._pool[thread_id]
+
+    def _get_pooled_conn(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Database connection pool is closed.")
+
+        now = time.monotonic()
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+
+        if conn is not None and now - self._local.last_checked > self._health_check_interval:
+            if self._is_healthy(conn):
+                self._local.last_checked = now
+            else:
+                with self._pool_lock:
+                    self._pool.pop(threading.get_ident(), None)
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+                conn = None
+
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.last_checked = now
+
+            with self._pool_lock:
+                self._prune_pool()
+                self._pool[threading.get_ident()] = (threading.current_thread(), conn)
+
+        return conn
+
     @contextmanager
-    def _get_conn(self):
-        with self._lock:
-            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
-            conn.row_factory = sqlite3.Row
+    def _open_conn(self):
+        if self.pooled:
+            yield self._get_pooled_conn()
+            return
+
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _has_pending_writes(self) -> bool:
+        return self._writer_conn is not None and self._writer_conn.in_transaction
+
+    def _get_writer_conn(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Database writer connection is closed.")
+
+        if self._writer_conn is None:
+            self._writer_conn = self._connect(shared=True)
+            # Commits never checkpoint, so they never fsync while holding the write lock
+            self._writer_conn.execute("PRAGMA wal_autocheckpoint=0;")
+
+        return self._writer_conn
+
+    @contextmanager
+    def _get_conn(self, write: bool = True):
+        # Calls made inside a transaction on this thread join it, the write lock is already held
+        tx_conn: sqlite3.Connection | None = getattr(self._local, "tx_conn", None)
+        if tx_conn is not None:
+            yield tx_conn
+            return
+
+        # Reads inside a snapshot on this thread share its read transaction
+        snapshot_conn: sqlite3.Connection | None = getattr(self._local, "snapshot_conn", None)
+        if snapshot_conn is not None:
+            if write:
+                raise RuntimeError("Writes cannot run inside a read snapshot.")
+            yield snapshot_conn
+            return
+
+        if write and self.read_only:
+            raise RuntimeError("Database is opened read-only.")
+
+        # Reads go through the writer connection while it holds uncommitted writes, so they are never stale
+        if not write and not self._has_pending_writes():
+            with self._open_conn() as conn:
+                yield conn
+            return
+
+        waited = time.perf_counter()
+        with self._write_lock:
+            self._local.lock_wait = time.perf_counter() - waited
+
+            if not self.write_behind:
+                with self._open_conn() as conn:
+                    yield conn
+                return
+
+            conn = self._get_writer_conn()
+            if write:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                yield conn
+                return
+
+            with self._writer_reader_lock:
+                self._writer_reader = threading.get_ident()
             try:
                 yield conn
             finally:
-                conn.close()
+                with self._writer_reader_lock:
+                    self._writer_reader = None
 
     @contextmanager
     def transaction(self):
         with self._get_conn() as conn:
+            # Write-behind keeps an open transaction, and nested blocks run inside an outer one, so both use a savepoint instead
+            outer_conn: sqlite3.Connection | None = getattr(self._local, "tx_conn", None)
+            savepoint = self.write_behind or outer_conn is not None
+
             try:
-                conn.execute("BEGIN")
-                yield self._TxProxy(conn)
-                conn.commit()
+                conn.execute("SAVEPOINT tx" if savepoint else "BEGIN")
+                self._local.tx_conn = conn
+                try:
+                    yield self._TxProxy(conn, self)
+                finally:
+                    self._local.tx_conn = outer_conn
+
+                if savepoint:
+                    conn.execute("RELEASE tx")
+                else:
+                    conn.commit()
             except Exception as e:
-                conn.rollback()
+                if savepoint:
+                    conn.execute("ROLLBACK TO tx")
+                    conn.execute("RELEASE tx")
+                else:
+                    conn.rollback()
                 raise e
 
+    def in_snapshot(self) -> bool:
+        return getattr(self._local, "snapshot_conn", None) is not None
+
+    @contextmanager
+    def snapshot(self):
+        # Reads on this thread inside the block run in one read transaction on one connection, so they see a single state
+        # of the database. Under WAL it never blocks writers, their commits are seen after the block.
+        if self.in_snapshot() or getattr(self._local, "tx_conn", None) is not None:
+            yield
+            return
+
+        # Deferred writes are committed first, so the snapshot sees them
+        self.flush()
+
+        with self._open_conn() as conn:
+            conn.execute("BEGIN")
+            self._local.snapshot_conn = conn
+            try:
+                yield
+            finally:
+                self._local.snapshot_conn = None
+                conn.rollback()
+
+    def _flush_periodically(self) -> None:
+        while not self._flush_stop.wait(self._flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Writes stay in the open transaction and are retried on the next flush
+                continue
+
+            try:
+                self._checkpoint_wal()
+            except sqlite3.Error:
+                pass
+
+    def _checkpoint_wal(self) -> tuple[int, int, int]:
+        # Copies committed pages back into the database outside the write lock. A passive checkpoint never waits on
+        # other connections, and writers keep appending to the WAL while it runs.
+        with self._open_conn() as conn:
+            return tuple(conn.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchone())
+
+    def flush(self) -> None:
+        # Commits writes deferred by write-behind mode. Inside a transaction they are committed when it ends.
+        if not self.write_behind or getattr(self._local, "tx_conn", None) is not None:
+            return
+
+        with self._write_lock:
+            if self._has_pending_writes():
+                self._writer_conn.commit()
+
+    def interrupt(self, thread_id: int) -> None:
+        # Aborts the statement running on a thread's pooled connection, it raises sqlite3.OperationalError in that thread.
+        # Under write-behind, reads that run on the writer connection are aborted too. Writes there are left to finish,
+        # since an interrupted write rolls back the whole open transaction, with every deferred write in it.
+        with self._pool_lock:
+            entry = self._pool.get(thread_id)
+            if entry is not None:
+                entry[1].interrupt()
+
+        with self._writer_reader_lock:
+            if self._writer_reader == thread_id and self._writer_conn is not None:
+                self._writer_conn.interrupt()
+
     def _initialize_db(self) -> None:
-        with self._get_conn() as conn:
-            conn.execute("PRAGMA journal_mode=WAL;")
-            conn.execute("PRAGMA synchronous=NORMAL;")
-            conn.execute("PRAGMA foreign_keys=ON;")
+        # Database level settings are left to the writer
+        if self.read_only:
+            return
+
+        # Journal mode cannot change inside a transaction, so this bypasses the write-behind writer connection
+        with self._write_lock:
+            with self._open_conn() as conn:
+                # Page size and auto vacuum must be set before the database switches to WAL, they are ignored for existing databases
+                for pragma, value in self.pragmas.items():
+                    if pragma in SQLiteWrapper._database_pragmas:
+                        conn.execute(f"PRAGMA {pragma}={value};")
+
+                # Journal mode is persistent, so it only needs to be set once per database
+                conn.execute("PRAGMA journal_mode=WAL;")
+
+    def close(self) -> None:
+        # Flushes deferred writes and closes every long-lived connection
+        if self._flush_thread is not None:
+            self._flush_stop.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+
+        self.flush()
+
+        with self._write_lock:
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+                self._writer_conn = None
+
+            with self._pool_lock:
+                for _, conn in self._pool.values():
+                    conn.close()
+                self._pool.clear()
+                self._closed = True
+
+        self._local = threading.local()
+
+    def _record(self, conn: sqlite3.Connection, query: str, params: tuple, started: float, rows: int, explain: bool = True) -> None:
+        # Records rows returned by reads, or rows changed by writes
+        if self.profiler is None:
+            return
+
+        execution_time = time.perf_counter() - started
+
+        # Lock wait is reported once, by the first statement after the write lock is acquired
+        lock_wait = getattr(self._local, "lock_wait", 0)
+        self._local.lock_wait = 0
+
+        statement = QueryProfiler.normalize(query)
+        plan = self.profiler.explain(conn, query, params) if explain and self.profiler.needs_plan(statement) else None
+
+        self.profiler.record(statement, execution_time, lock_wait, max(rows, 0), plan)
 
     def execute(self, query: str, params: tuple = ()) -> None:
         with self._get_conn() as conn:
-            conn.execute(query, params)
+            started = time.perf_counter()
+            cursor = conn.execute(query, params)
+            self._record(conn, query, params, started, cursor.rowcount)
 
     def execute_many(self, query: str, params: list[tuple] = []) -> None:
         with self._get_conn() as conn:
-            conn.executemany(query, params)
+            started = time.perf_counter()
+            cursor = conn.executemany(query, params)
+            self._record(conn, query, params[0] if params else (), started, cursor.rowcount)
 
     def execute_script(self, sql_dir: str) -> None:
         with open(sql_dir, 'r') as file:
             with self._get_conn() as conn:
+                started = time.perf_counter()
                 conn.executescript(file.read())
+                self._record(conn, f"SCRIPT {sql_dir}", (), started, 0, explain=False)
 
-    def fetchall(self, query: str, params: tuple = ()) -> list[sqlite3.Row]:
-        with self._get_conn() as conn:
-            return conn.execute(query, params).fetchall()
+    def _record_class(self, columns: tuple[str, ...]) -> type:
+        # Record classes are cached by column list, so a query reuses its class across calls
+        record_class = self._record_classes.get(columns)
+        if record_class is None:
+            record_class = namedtuple("Record", columns, rename=True)
+            self._record_classes[columns] = record_class
+        return record_class
 
-    def fetchone(self, query: str, params: tuple = ()) -> sqlite3.Row | None:
-        with self._get_conn() as conn:
-            return conn.execute(query, params).fetchone()
+    def _shape_rows(self, cursor: sqlite3.Cursor, row_factory: RowFactory | None) -> sqlite3.Cursor:
+        # Connections already build the default row shape, unless it is a record
+        row_factory = row_factory or self.row_factory
+        if row_factory == self.row_factory and row_factory != RowFactory.RECORD:
+            return cursor
+
+        if row_factory == RowFactory.ROW:
+            cursor.row_factory = sqlite3.Row
+        elif row_factory == RowFactory.TUPLE:
+            cursor.row_factory = None
+        elif cursor.description is not None:
+            record_class = self._record_class(tuple(column[0] for column in cursor.description))
+            cursor.row_factory = lambda _, row: tuple.__new__(record_class, row)
+
+        return cursor
+
+    def fetchall(self, query: str, params: tuple = (), row_factory: RowFactory | None = None) -> list[Any]:
+        with self._get_conn(write=False) as conn:
+            started = time.perf_counter()
+            rows = self._shape_rows(conn.execute(query, params), row_factory).fetchall()
+            self._record(conn, query, params, started, len(rows))
+
+            return rows
+
+    def fetchone(self, query: str, params: tuple = (), row_factory: RowFactory | None = None) -> Any | None:
+        with self._get_conn(write=False) as conn:
+            started = time.perf_counter()
+            row = self._shape_rows(conn.execute(query, params), row_factory).fetchone()
+            self._record(conn, query, params, started, 1 if row is not None else 0)
+
+            return row
+
+    def fetchmany(self, query: str, params: tuple = (), batch_size: int = 500, row_factory: RowFactory | None = None) -> Iterator[list[Any]]:
+        # Yields rows in batches, keeping the connection open until the generator is exhausted or closed
+
+        # A generator may stay suspended for a long time, so it never holds the write lock.
+        # Deferred writes are committed first, so the read connection sees them. Inside a snapshot or transaction it uses theirs.
+        self.flush()
+
+        joined = self.in_snapshot() or getattr(self._local, "tx_conn", None) is not None
+        with self._get_conn(write=False) if joined else self._open_conn() as conn:
+            # Only time spent fetching is profiled, not time spent by the consumer between batches
+            fetch_time = 0
+            total_rows = 0
+
+            started = time.perf_counter()
+            cursor = self._shape_rows(conn.execute(query, params), row_factory)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    fetch_time += time.perf_counter() - started
+                    if not rows:
+                        break
+
+                    total_rows += len(rows)
+                    yield rows
+                    started = time.perf_counter()
+            finally:
+                cursor.close()
+                self._record(conn, query, params, time.perf_counter() - fetch_time, total_rows)
+
+    def iterate(self, query: str, params: tuple = (), batch_size: int = 500, row_factory: RowFactory | None = None) -> Iterator[Any]:
+        for rows in self.fetchmany(query, params, batch_size, row_factory):
+            yield from rows
+
+    def fetch_columns(self, query: str, params: tuple = (), batch_size: int = 500) -> dict[str, list]:
+        # Returns one list per column instead of one object per row
+        with self._get_conn(write=False) as conn:
+            started = time.perf_counter()
+            cursor = self._shape_rows(conn.execute(query, params), RowFactory.TUPLE)
+
+            columns: dict[str, list] = {column[0]: [] for column in cursor.description or ()}
+            values = list(columns.values())
+            total_rows = 0
+            while rows := cursor.fetchmany(batch_size):
+                total_rows += len(rows)
+                for column, column_values in zip(values, zip(*rows)):
+                    column.extend(column_values)
+
+            self._record(conn, query, params, started, total_rows)
+
+            return columns
+
+    def execute_maintenance(self, query: str, busy_timeout: float | None = None) -> list[sqlite3.Row]:
+        # Runs statements that cannot run inside a transaction, like VACUUM and WAL checkpoints.
+        # Deferred writes are committed first. busy_timeout, in seconds, bounds how long the statement waits on other connections.
+        if self.read_only:
+            raise RuntimeError("Database is opened read-only.")
+
+        self.flush()
+
+        with self._write_lock:
+            if self.write_behind:
+                conn = self._get_writer_conn()
+                if conn.in_transaction:
+                    conn.commit()
+
+                return self._run_maintenance(conn, query, busy_timeout)
+
+            with self._open_conn() as conn:
+                return self._run_maintenance(conn, query, busy_timeout)
+
+    def _run_maintenance(self, conn: sqlite3.Connection, query: str, busy_timeout: float | None) -> list[sqlite3.Row]:
+        if busy_timeout is not None:
+            conn.execute(f"PRAGMA busy_timeout = {max(0, int(busy_timeout * 1000))}")
+
+        try:
+            started = time.perf_counter()
+            rows = conn.execute(query).fetchall()
+            self._record(conn, query, (), started, len(rows), explain=False)
+        finally:
+            # Back to the timeout the connection was opened with
+            if busy_timeout is not None:
+                conn.execute(f"PRAGMA busy_timeout = {SQLiteWrapper._busy_timeout * 1000}")
+
+        return rows
 
     def fetch_script(self, sql_dir: str) -> list[sqlite3.Row]:
         with open(sql_dir, 'r') as file:
-            with self._get_conn() as conn:
-                return conn.execute(file.read()).fetchall()
\ No newline at end of file
+            query = file.read()
+
+        with self._get_conn(write=False) as conn:
+            started = time.perf_counter()
+            rows = conn.execute(query).fetchall()
+            self._record(conn, query, (), started, len(rows))
+
+            return rows
\ No newline at end of file
@@ -8,6 +8,7 @@ import textwrap
 from Include.app_monitor import AppMonitor
 import settings
 from Include.subsystem.usagedata_db import UsagedataDB
+from Include.subsystem.maintenance_scheduler import MaintenanceScheduler
 
 shutdown_request: bool = False
 
@@ -39,7 +40,9 @@ if __name__ == "__main__":
 
     app_monitor = AppMonitor(os_name)
 
-    usagedataDB = UsagedataDB(settings.usagedata_dir)
+    # Tick writes are committed together on a background thread, so the monitor loop never waits on disk
+    usagedataDB = UsagedataDB(settings.usagedata_dir, write_behind = settings.observe_write_behind)
+    maintenance_scheduler = MaintenanceScheduler(usagedataDB)
     signal.signal(signal.SIGINT, shutdown_handler)
     signal.signal(signal.SIGTERM, shutdown_handler)
 
@@ -49,10 +52,15 @@ if __name__ == "__main__":
 
     while not shutdown_request:
         handle_app_data(app_monitor)
+        maintenance_scheduler.run(settings.maintenance_budget)
 
         elapsed_time = 0
         while elapsed_time < settings.tick.total_seconds() and not shutdown_request:
             time.sleep(sleep_interval)
             elapsed_time += sleep_interval
 
+    if settings.sqlite_profiling:
+        usagedataDB.export_query_stats(settings.query_stats_dir("observe"), "observe")
+    usagedataDB.close()
+
     input("\nPress any key to exit...")
\ No newline at end of file
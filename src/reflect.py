@@ -104,7 +104,14 @@ if __name__ == "__main__":
         input("\nPress any key to exit...")
         exit(1)
 
-    usagedataDB = UsagedataDB(settings.usagedata_dir)
+    try:
+        usagedataDB = UsagedataDB(settings.usagedata_dir, read_only = True)
+    except Exception as e:
+        print(f"\nError opening usage data: {e}")
+
+        input("\nPress any key to exit...")
+        exit(1)
+
     try:
         suggestion_engine = SuggestionEngine(usagedataDB)
     except Exception as e:
@@ -124,4 +131,8 @@ if __name__ == "__main__":
 
     suggestion_engine.close()
 
+    if settings.sqlite_profiling:
+        usagedataDB.export_query_stats(settings.query_stats_dir("reflect"), "reflect")
+    usagedataDB.close()
+
     input("\nPress any key to exit...")
\ No newline at end of file
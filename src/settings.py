@@ -2,7 +2,7 @@ import os
 
 from enum import Enum
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 # Stage environments
 class Environment(Enum):
@@ -28,6 +28,83 @@ device_config_dir: str = "device_config.json"
 usagedata_dir: str = "data"
 sql_dir: str = "sql"
 schema_dir: str = os.path.join(sql_dir, "schema.sql")
+migrations_dir: str = os.path.join(sql_dir, "migrations")
+
+# Database settings
+sqlite_pooled: bool = True
+sqlite_health_check_interval: timedelta = timedelta(minutes=1)
+sqlite_flush_interval: timedelta = timedelta(seconds=10)
+sqlite_fetch_batchsize: int = 500
+sqlite_statement_cache_size: int = 256 # Prepared statements kept per connection
+
+# Query profiling, stats are exported as JSON when a process exits
+sqlite_profiling: bool = False
+sqlite_slow_query_threshold: timedelta = timedelta(milliseconds=50)
+sqlite_explain_query_plan: bool = False
+
+query_stats_root_dir: str = os.path.join(usagedata_dir, "query_stats")
+def query_stats_dir(process: str) -> str:
+    return os.path.join(query_stats_root_dir, f"{process}_{datetime.now():%Y%m%d_%H%M%S}.json")
+
+observe_write_behind: bool = True
+
+async_read_workers: int = 4
+
+# SQLite performance profiles, PRAGMAs applied to every connection.
+# page_size only takes effect when the database file is created.
+class SQLiteProfile(Enum):
+    LOW_END_LAPTOP = "low_end_laptop"
+    SSD_DESKTOP = "ssd_desktop"
+    BULK_IMPORT = "bulk_import"
+
+sqlite_profiles: dict[SQLiteProfile, dict[str, int | str]] = {
+    SQLiteProfile.LOW_END_LAPTOP: {
+        "page_size": 4096,
+        "mmap_size": 0,
+        "cache_size": -4096, # Negative sizes are in KiB
+        "temp_store": "DEFAULT",
+        "wal_autocheckpoint": 1000
+    },
+    SQLiteProfile.SSD_DESKTOP: {
+        "page_size": 4096,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000
+    },
+    SQLiteProfile.BULK_IMPORT: {
+        "page_size": 8192,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 10000
+    }
+}
+sqlite_profile: SQLiteProfile = SQLiteProfile.LOW_END_LAPTOP
+
+# Focus and downtime period storage. Periods left in the other layout's tables are migrated on startup.
+class FocusLayout(Enum):
+    ROWS = "rows"       # One row per app/title/day and hour
+    VECTORS = "vectors" # One row per app/title/day, hours packed into 24 slot float32/int32 BLOBs
+focus_layout: FocusLayout = FocusLayout.ROWS
+
+# Sub-hour focus buckets, kept next to the hourly focus periods as one packed float32/int32 array per app/title/day.
+# Minutes per bucket must divide an hour, e.g. 5, 10 or 15. None turns them off.
+focus_bucket_minutes: int | None = None
+
+# How observe stores ticks. With the journal, each tick appends one record and the aggregate tables are derived from it
+# in batches of journal_derive_ticks ticks, at day rollover and on close, by the observing process.
+class TickStorage(Enum):
+    AGGREGATES = "aggregates" # Every tick updates the aggregate tables
+    JOURNAL = "journal"       # Every tick appends to tick_journal
+tick_storage: TickStorage = TickStorage.AGGREGATES
+journal_derive_ticks: int = 20
+
+# Maintenance settings, observe runs maintenance between ticks within the budget
+maintenance_budget: timedelta = timedelta(milliseconds=200)
+checkpoint_interval: timedelta = timedelta(minutes=5)
+wal_size_limit: int = 16 * 1024 * 1024 # Bytes, WAL is truncated once it grows past this
+vacuum_pages_per_step: int = 64
 
 # Model settings
 model_dir: str = os.path.join("models", "Phi-3-mini-4k-instruct-q4.gguf")
@@ -61,5 +138,16 @@ class_day_historical_weight: float = 0.6
 layer_batchsize_weight: float = 0.5
 
 # Suggestion settings
-max_logs: int = 7
+max_logs: int = 7 # Day logs kept in full detail
+
+# History tiers past max_logs. Removed day logs are kept as daily app totals, which are later merged into monthly totals.
+daily_summary_days: int = 90
+monthly_summary_months: int = 24
+class HistoryResolution(Enum):
+    DAY = "day"     # Day logs and daily summaries
+    MONTH = "month" # Every tier, grouped by month
+
+# Removed day logs are also archived in full detail, one memory mapped columnar file per month in this directory of the usage data directory
+archive_expired_logs: bool = True
+archive_dir_name: str = "archive"
 data_limit: int = 3
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from Include.service.usagedata_service import UsagedataService
+
+def _service(usagedata_dir: str) -> UsagedataService:
+    service = UsagedataService(os.path.join(usagedata_dir, "usagedata.db"))
+    service.create_if_not_exists_schema()
+    service.add_daylog("2025-01-06T09:00:00", 0.0)
+
+    return service
+
+def test_query_variants_are_reused():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        service = _service(usagedata_dir)
+        day_log_id = service.get_latest_daylog_id()
+
+        queries: list[str] = []
+        fetchone = service._db.fetchone
+        def record_fetchone(query: str, *args, **kwargs):
+            queries.append(query)
+            return fetchone(query, *args, **kwargs)
+
+        with patch.object(service._db, "fetchone", side_effect=record_fetchone):
+            # Same column subset, same query text, built once
+            service.get_daylog(day_log_id, ("time_anchor", "total_anomalies"))
+            cached = len(service._daylog_queries)
+            service.get_daylog(day_log_id, ("time_anchor", "total_anomalies"))
+            assert queries[0] is queries[1] is service._daylog_queries[("time_anchor", "total_anomalies")]
+            assert len(service._daylog_queries) == cached
+
+            # Total durations are prepared per day count when the service starts
+            service.get_totalduration("missing.exe", (day_log_id,))
+            service.upsert_latest_applog_titlelog({"app.exe": {"executable_path": "C:\\app.exe", "total_duration": 5, "total_focus_duration": 0, "total_focus_count": 0, "titles": {}}})
+            queries.clear()
+            service.get_totalduration("app.exe", (day_log_id,))
+            service.get_totalduration("app.exe", (day_log_id,))
+            assert queries[-1] is queries[-2] is service._totalduration_queries[1]
+
+        assert service.get_totalduration("app.exe", (day_log_id,)) == 5
+
+        service.close()
+
+def test_invalid_columns_are_rejected_through_cache():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        service = _service(usagedata_dir)
+        day_log_id = service.get_latest_daylog_id()
+
+        # Valid subsets are cached first, an invalid one is still validated and never cached
+        service.get_daylog(day_log_id, ("time_anchor",))
+        service.update_daylog(day_log_id, {"total_anomalies": 1})
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                service.get_daylog(day_log_id, ("time_anchor", "id FROM day_log; --"))
+            with pytest.raises(ValueError):
+                service.get_latest_daylog(("name",))
+            with pytest.raises(ValueError):
+                service.update_daylog(day_log_id, {"total_anomalies = 0, time_anchor": 1})
+            with pytest.raises(ValueError):
+                service.update_latest_daylog({"monotonic_start = 0 --": 1})
+
+        for queries in (service._daylog_queries, service._latest_daylog_queries, service._update_daylog_queries, service._update_latest_daylog_queries):
+            assert all(set(columns) <= set(UsagedataService._day_log_columns) for columns in queries)
+        assert ("time_anchor",) in service._daylog_queries and ("total_anomalies",) in service._update_daylog_queries
+        assert service.get_daylog(day_log_id, ("total_anomalies",)) == {"total_anomalies": 1}
+
+        service.close()
@@ -0,0 +1,158 @@
+import asyncio
+import tempfile
+import threading
+import time
+
+import pytest
+
+from Include.subsystem.usagedata_db import UsagedataDB
+from Include.subsystem.async_usagedata_db import AsyncUsagedataDB
+
+app_executablepaths = {f"app_{i}.exe": f"C:\\Programs\\app_{i}.exe" for i in range(5)}
+
+def _tick(i: int) -> tuple[dict[str, set[str]], dict[str, str], str, str]:
+    app_title_map = {app: {f"{app} title {i % 3}"} for app in app_executablepaths}
+    active_app = f"app_{i % 5}.exe"
+
+    return app_title_map, app_executablepaths, active_app, next(iter(app_title_map[active_app]))
+
+def test_concurrent_readers_and_writer():
+    async def run(usagedata_dir: str) -> None:
+        async_db = AsyncUsagedataDB(UsagedataDB(usagedata_dir), read_workers=4)
+
+        async def writer() -> None:
+            for i in range(20):
+                await async_db.update_apps(*_tick(i))
+
+        async def reader() -> list[int]:
+            seen_apps = []
+            for _ in range(20):
+                day_log_id = (await async_db.get_daylog_ids())[-1]
+                apps_titles = await async_db.get_applog_titlelog(day_log_id)
+                seen_apps.append(len(apps_titles))
+
+                for app_name in apps_titles:
+                    await async_db.get_appfocusperiod(day_log_id, app_name)
+            return seen_apps
+
+        results = await asyncio.gather(writer(), *(reader() for _ in range(4)))
+
+        # Readers never see a partially written tick, apps only ever appear
+        for seen_apps in results[1:]:
+            assert seen_apps == sorted(seen_apps)
+            assert all(count in (0, 5) for count in seen_apps)
+
+        day_log_id = (await async_db.get_daylog_ids())[-1]
+        assert set(await async_db.get_applog_titlelog(day_log_id)) == set(app_executablepaths)
+
+        await async_db.close()
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        asyncio.run(run(usagedata_dir))
+
+def test_calls_reuse_executor_threads():
+    async def run(usagedata_dir: str) -> None:
+        async_db = AsyncUsagedataDB(UsagedataDB(usagedata_dir), read_workers=2)
+
+        thread_ids = set()
+        for _ in range(20):
+            thread_ids.add(await async_db._read(threading.get_ident))
+        assert len(thread_ids) <= 2
+
+        await async_db.close()
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        asyncio.run(run(usagedata_dir))
+
+def test_cancel_queued_call():
+    async def run(usagedata_dir: str) -> None:
+        async_db = AsyncUsagedataDB(UsagedataDB(usagedata_dir))
+
+        # First write keeps the single writer thread busy, the second stays queued
+        blocker = asyncio.create_task(async_db._write(time.sleep, 0.3))
+        queued = asyncio.create_task(async_db.update_apps(*_tick(0)))
+        await asyncio.sleep(0.05)
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        await blocker
+
+        day_log_id = (await async_db.get_daylog_ids())[-1]
+        assert await async_db.get_applog_titlelog(day_log_id) == {}
+
+        await async_db.close()
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        asyncio.run(run(usagedata_dir))
+
+def test_cancel_running_query_interrupts_it():
+    async def run(usagedata_dir: str) -> None:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        async_db = AsyncUsagedataDB(usagedata_db)
+
+        interrupted = threading.Event()
+
+        def endless_query() -> None:
+            try:
+                usagedata_db._service._db.fetchone("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n")
+            except Exception:
+                interrupted.set()
+                raise
+
+        task = asyncio.create_task(async_db._read(endless_query))
+        await asyncio.sleep(0.1)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert await asyncio.to_thread(interrupted.wait, 5)
+
+        await async_db.close()
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        asyncio.run(run(usagedata_dir))
+
+def test_reads_leave_integrity_to_writer():
+    async def run(usagedata_dir: str) -> None:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        async_db = AsyncUsagedataDB(usagedata_db, read_workers=4)
+
+        checked_on: list[str] = []
+        ensure_today_log = usagedata_db._ensure_today_log
+        def record_ensure_today_log() -> None:
+            checked_on.append(threading.current_thread().name)
+            ensure_today_log()
+        usagedata_db._ensure_today_log = record_ensure_today_log
+
+        # Integrity is due again, as after midnight
+        usagedata_db._invalidate_log_integrity()
+        results = await asyncio.gather(*(async_db.get_daylog_ids() for _ in range(8)))
+
+        assert checked_on and all(name.startswith("usagedata-write") for name in checked_on)
+        assert all(day_log_ids == results[0] for day_log_ids in results)
+        assert len(results[0]) == 1
+
+        await async_db.close()
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        asyncio.run(run(usagedata_dir))
+
+def test_close_waits_for_running_reads():
+    async def run(usagedata_dir: str) -> None:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        async_db = AsyncUsagedataDB(usagedata_db)
+
+        def slow_read() -> list[int]:
+            time.sleep(0.2)
+            return usagedata_db.get_daylog_ids()
+
+        read = asyncio.create_task(async_db._read(slow_read))
+        await asyncio.sleep(0.05)
+
+        await async_db.close()
+        assert len(await read) == 1
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        asyncio.run(run(usagedata_dir))
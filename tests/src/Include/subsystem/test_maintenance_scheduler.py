@@ -0,0 +1,106 @@
+import os
+import time
+import sqlite3
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import settings
+from Include.subsystem.usagedata_db import UsagedataDB
+from Include.subsystem.maintenance_scheduler import MaintenanceScheduler
+
+def _fill_oldest_daylog(usagedata_db: UsagedataDB, apps: int) -> None:
+    day_log_id = usagedata_db.get_daylog_ids()[0]
+
+    with usagedata_db._service._db.transaction() as tx:
+        tx.execute_many("INSERT INTO app (id, name) VALUES (?, ?)", [(i, f"app_{i}" * 20) for i in range(apps)])
+        tx.execute_many(
+            "INSERT INTO app_log (day_log_id, app_id, executable_path) VALUES (?, ?, ?)",
+            [(day_log_id, i, "path" * 50) for i in range(apps)]
+        )
+
+def test_converts_legacy_database():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        conn = sqlite3.connect(os.path.join(usagedata_dir, "usagedata.db"))
+        with open(settings.schema_dir) as file:
+            conn.executescript(file.read())
+        conn.close()
+
+        usagedata_db = UsagedataDB(usagedata_dir)
+        assert not usagedata_db.incremental_vacuum_enabled()
+
+        # Nothing runs before the monitor loop, the conversion waits for the first run
+        scheduler = MaintenanceScheduler(usagedata_db)
+        assert not usagedata_db.incremental_vacuum_enabled()
+
+        # A busy database leaves it for the next run
+        with patch.object(usagedata_db, "enable_incremental_vacuum", side_effect=sqlite3.OperationalError("database is locked")):
+            scheduler.run(timedelta(seconds=10))
+        assert not usagedata_db.incremental_vacuum_enabled()
+
+        scheduler.run(timedelta(seconds=10))
+        assert usagedata_db.incremental_vacuum_enabled()
+
+        usagedata_db.close()
+
+def test_reclaims_deleted_pages():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir, write_behind=True)
+        scheduler = MaintenanceScheduler(usagedata_db)
+
+        _fill_oldest_daylog(usagedata_db, 2000)
+        usagedata_db._service.remove_oldest_daylog()
+        usagedata_db.flush()
+
+        assert usagedata_db.get_freelist_count() > 0
+
+        scheduler.run(timedelta(seconds=10))
+        assert usagedata_db.get_freelist_count() == 0
+
+        usagedata_db.close()
+
+def test_truncates_large_wal():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        scheduler = MaintenanceScheduler(usagedata_db)
+
+        _fill_oldest_daylog(usagedata_db, 500)
+        assert usagedata_db.get_wal_size() > 0
+
+        with patch.object(settings, "wal_size_limit", 0):
+            scheduler.run(timedelta(seconds=10))
+
+        assert usagedata_db.get_wal_size() == 0
+
+        usagedata_db.close()
+
+def test_open_reader_does_not_stall_run():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        scheduler = MaintenanceScheduler(usagedata_db)
+
+        _fill_oldest_daylog(usagedata_db, 500)
+
+        # A reader in another process keeps its snapshot of the WAL open, so it can not be truncated
+        reader = sqlite3.connect(usagedata_db.db_path)
+        reader.execute("BEGIN")
+        reader.execute("SELECT COUNT(*) FROM app_log").fetchone()
+        with usagedata_db._service._db.transaction() as tx:
+            tx.execute_many("INSERT INTO app (id, name) VALUES (?, ?)", [(i, f"app_{i}") for i in range(500, 600)])
+
+        try:
+            with patch.object(settings, "wal_size_limit", 0):
+                started = time.monotonic()
+                scheduler.run(timedelta(milliseconds=200))
+                assert time.monotonic() - started < 2
+            assert usagedata_db.get_wal_size() > 0
+        finally:
+            reader.rollback()
+            reader.close()
+
+        # Once the reader is gone the WAL is truncated
+        with patch.object(settings, "wal_size_limit", 0):
+            scheduler.run(timedelta(seconds=10))
+        assert usagedata_db.get_wal_size() == 0
+
+        usagedata_db.close()
@@ -0,0 +1,619 @@
+import os
+import sqlite3
+import tempfile
+
+from array import array
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+import settings
+import Include.subsystem.usagedata_db as usagedata_db_module
+from Include.service.usagedata_service import UsagedataService
+from Include.subsystem.usagedata_db import UsagedataDB
+from dev.usagedata_benchmark import SyntheticClock
+
+app_executablepaths = {f"app_{i}.exe": f"C:\\Programs\\app_{i}.exe" for i in range(5)}
+
+def _tick(i: int) -> tuple[dict[str, set[str]], dict[str, str], str, str]:
+    app_title_map = {app: {f"{app} title {i % 3}"} for app in app_executablepaths}
+    active_app = f"app_{i % 5}.exe"
+
+    return app_title_map, app_executablepaths, active_app, next(iter(app_title_map[active_app]))
+
+@pytest.fixture
+def clock(request: pytest.FixtureRequest) -> Iterator[SyntheticClock]:
+    # Simulated wall and monotonic time for UsagedataDB, starting at the datetime the test is parametrized with
+    synthetic_clock = SyntheticClock(getattr(request, "param", datetime(2025, 1, 6, 9)))
+    with synthetic_clock.patch():
+        yield synthetic_clock
+
+def test_get_days_matches_single_getters():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        for i in range(30):
+            usagedata_db.update_apps(*_tick(i))
+
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+        days = usagedata_db.get_days((day_log_id,))
+        assert list(days) == [day_log_id]
+
+        day = days[day_log_id]
+        assert day["time_anchor"] == usagedata_db.get_daylog(day_log_id)["time_anchor"]
+        assert day["downtime_period"] == {}
+
+        apps_titles = usagedata_db.get_applog_titlelog(day_log_id)
+        assert set(day["apps"]) == set(apps_titles)
+
+        for app_name, app_data in day["apps"].items():
+            assert app_data["total_duration"] == apps_titles[app_name]["total_duration"]
+            assert app_data["hourly_focus_data"] == usagedata_db.get_appfocusperiod(day_log_id, app_name)
+            assert set(app_data["titles"]) == set(apps_titles[app_name]["titles"])
+
+            for title_name, title_data in app_data["titles"].items():
+                assert title_data["total_focus_count"] == apps_titles[app_name]["titles"][title_name]["total_focus_count"]
+                assert title_data["hourly_focus_data"] == usagedata_db.get_titlefocusperiod(day_log_id, app_name, title_name)
+
+        # Titles can be skipped, unknown day logs are left out
+        day = usagedata_db.get_days((day_log_id, day_log_id + 1), titles=False)[day_log_id]
+        assert all(app_data["titles"] == {} for app_data in day["apps"].values())
+        assert usagedata_db.get_day(day_log_id + 1) == {}
+
+        usagedata_db.close()
+
+def test_ticks_do_not_read_from_database():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+
+        # First tick loads today's state, the first three see every name once, so their ids are cached
+        for i in range(3):
+            usagedata_db.update_apps(*_tick(i))
+
+        sqlite_wrapper = usagedata_db._service._db
+        with patch.object(sqlite_wrapper, "fetchone", side_effect=AssertionError), patch.object(sqlite_wrapper, "fetchall", side_effect=AssertionError), patch.object(sqlite_wrapper, "iterate", side_effect=AssertionError):
+            for i in range(3, 30):
+                usagedata_db.update_apps(*_tick(i))
+
+        # Written through, so the database matches the state in memory
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+        apps_titles = usagedata_db.get_applog_titlelog(day_log_id)
+        assert set(apps_titles) == set(app_executablepaths)
+        for app_name, app_data in apps_titles.items():
+            assert app_data["total_duration"] == usagedata_db._today_apps[app_name]["total_duration"]
+            assert usagedata_db.get_appfocusperiod(day_log_id, app_name) == usagedata_db._today_app_focus.get(app_name, {})
+
+        usagedata_db.close()
+
+def test_state_is_rebuilt_after_restart():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        for i in range(10):
+            usagedata_db.update_apps(*_tick(i))
+
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+        before = usagedata_db.get_applog_titlelog(day_log_id)
+
+        # Process is gone without closing, a new one picks up where the database left off
+        usagedata_db = UsagedataDB(usagedata_dir)
+        usagedata_db.update_apps(*_tick(10))
+
+        assert usagedata_db.get_daylog_ids()[-1] == day_log_id
+        after = usagedata_db.get_applog_titlelog(day_log_id)
+        for app_name, app_data in before.items():
+            assert after[app_name]["total_duration"] >= app_data["total_duration"]
+            assert after[app_name]["total_focus_count"] >= app_data["total_focus_count"]
+
+        usagedata_db.close()
+
+def test_ticks_write_only_changed_rows():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+
+        # Day holds many titles that are no longer open
+        usagedata_db.update_apps({"app_0.exe": {f"title {i}" for i in range(50)}}, app_executablepaths)
+        usagedata_db.update_apps({"app_0.exe": {f"title {i}" for i in range(50)}}, app_executablepaths)
+
+        service = usagedata_db._service
+        with patch.object(service, "upsert_applog_titlelog", wraps=service.upsert_applog_titlelog) as upsert:
+            usagedata_db.update_apps(*_tick(0))
+            usagedata_db.update_apps(*_tick(1))
+
+        # First tick only adds the newly opened apps and titles, second tick only updates those still open
+        for call, (app_title_map, *_) in zip(upsert.call_args_list, (_tick(0), _tick(1))):
+            changed = call.args[1]
+            assert set(changed) <= set(app_title_map) | {"app_0.exe"}
+            assert sum(len(app_data["titles"]) for app_data in changed.values()) <= len(app_title_map)
+
+        # Stale titles keep their totals
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+        assert len(usagedata_db.get_applog_titlelog(day_log_id)["app_0.exe"]["titles"]) >= 50
+
+        usagedata_db.close()
+
+def test_focus_layout_migration(monkeypatch):
+    def focus_periods(usagedata_db: UsagedataDB, day_log_id: int) -> dict:
+        return {app_name: usagedata_db.get_appfocusperiod(day_log_id, app_name) for app_name in app_executablepaths}
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        for i in range(30):
+            usagedata_db.update_apps(*_tick(i))
+
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+        rows = focus_periods(usagedata_db, day_log_id)
+        usagedata_db.close()
+
+        # Rows are packed into vectors on startup
+        monkeypatch.setattr(settings, "focus_layout", settings.FocusLayout.VECTORS)
+        usagedata_db = UsagedataDB(usagedata_dir)
+        assert usagedata_db._service._db.fetchone("SELECT COUNT(*) FROM app_focus_period")[0] == 0
+
+        vectors = focus_periods(usagedata_db, day_log_id)
+        assert set(vectors) == set(rows)
+        for app_name, periods in rows.items():
+            assert set(vectors[app_name]) == set(periods)
+            for hour, focus_data in periods.items():
+                assert vectors[app_name][hour]["focus_duration"] == pytest.approx(focus_data["focus_duration"], rel=1e-6)
+                assert vectors[app_name][hour]["focus_count"] == focus_data["focus_count"]
+
+            focus_durations, focus_counts = usagedata_db.get_appfocusvector(day_log_id, app_name)
+            assert len(focus_durations) == len(focus_counts) == 24
+            assert focus_durations.format == "f" and focus_counts.format == "i"
+            assert sum(focus_counts) == sum(focus_data["focus_count"] for focus_data in periods.values())
+
+        # Ticks keep working on vectors, and the bulk loader decodes them
+        for i in range(30, 40):
+            usagedata_db.update_apps(*_tick(i))
+        day = usagedata_db.get_day(day_log_id)
+        for app_name, app_data in day["apps"].items():
+            assert app_data["hourly_focus_data"] == usagedata_db.get_appfocusperiod(day_log_id, app_name)
+        vectors = focus_periods(usagedata_db, day_log_id)
+        usagedata_db.close()
+
+        # And unpacked back into rows
+        monkeypatch.setattr(settings, "focus_layout", settings.FocusLayout.ROWS)
+        usagedata_db = UsagedataDB(usagedata_dir)
+        assert usagedata_db._service._db.fetchone("SELECT COUNT(*) FROM app_focus_vector")[0] == 0
+        assert focus_periods(usagedata_db, day_log_id) == vectors
+        usagedata_db.close()
+
+def test_legacy_database_is_migrated():
+    # Version 0 schema, names stored on every row
+    legacy_schema = """
+        CREATE TABLE day_log (
+            id INTEGER PRIMARY KEY,
+            time_anchor TEXT NOT NULL,
+            monotonic_start REAL NOT NULL,
+            monotonic_last_updated REAL NOT NULL,
+            total_downtime_duration REAL DEFAULT 0,
+            total_anomalies INTEGER DEFAULT 0
+        );
+        CREATE TABLE app_log (
+            day_log_id INTEGER NOT NULL, app_name TEXT NOT NULL, executable_path TEXT NOT NULL,
+            total_duration REAL DEFAULT 0, total_focus_duration REAL DEFAULT 0, total_focus_count INTEGER DEFAULT 0,
+            PRIMARY KEY(day_log_id, app_name)
+        );
+        CREATE TABLE title_log (
+            day_log_id INTEGER NOT NULL, app_name TEXT NOT NULL, title_name TEXT NOT NULL,
+            total_duration REAL DEFAULT 0, total_focus_duration REAL DEFAULT 0, total_focus_count INTEGER DEFAULT 0,
+            PRIMARY KEY(day_log_id, app_name, title_name)
+        );
+        CREATE TABLE downtime_period (
+            day_log_id INTEGER NOT NULL, day_hour INTEGER NOT NULL, downtime_duration REAL DEFAULT 0,
+            PRIMARY KEY(day_log_id, day_hour)
+        );
+        CREATE TABLE app_focus_period (
+            day_log_id INTEGER NOT NULL, app_name TEXT NOT NULL, day_hour INTEGER NOT NULL,
+            focus_duration REAL DEFAULT 0, focus_count INTEGER DEFAULT 0,
+            PRIMARY KEY(day_log_id, app_name, day_hour)
+        );
+        CREATE TABLE title_focus_period (
+            day_log_id INTEGER NOT NULL, app_name TEXT NOT NULL, title_name TEXT NOT NULL, day_hour INTEGER NOT NULL,
+            focus_duration REAL DEFAULT 0, focus_count INTEGER DEFAULT 0,
+            PRIMARY KEY(day_log_id, app_name, title_name, day_hour)
+        );
+        INSERT INTO day_log VALUES (1, '2025-01-06T09:00:00', 0, 60, 0, 0);
+        INSERT INTO app_log VALUES (1, 'editor.exe', 'C:\\editor.exe', 60, 40, 2), (1, 'browser.exe', 'C:\\browser.exe', 30, 20, 1);
+        INSERT INTO title_log VALUES (1, 'editor.exe', 'notes.txt', 60, 40, 2), (1, 'browser.exe', 'notes.txt', 30, 20, 1);
+        INSERT INTO app_focus_period VALUES (1, 'editor.exe', 9, 40, 2);
+        INSERT INTO title_focus_period VALUES (1, 'browser.exe', 'notes.txt', 9, 20, 1);
+    """
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        conn = sqlite3.connect(os.path.join(usagedata_dir, "usagedata.db"))
+        conn.executescript(legacy_schema)
+        conn.close()
+
+        usagedata_db = UsagedataDB(usagedata_dir)
+        sqlite_wrapper = usagedata_db._service._db
+        assert sqlite_wrapper.fetchone("PRAGMA user_version")[0] == UsagedataService._schema_version
+
+        # Shared title is stored once, getters still speak names
+        assert sqlite_wrapper.fetchone("SELECT COUNT(*) FROM title")[0] == 1
+        apps_titles = usagedata_db.get_applog_titlelog(1)
+        assert set(apps_titles) == {"editor.exe", "browser.exe"}
+        assert apps_titles["editor.exe"]["titles"]["notes.txt"]["total_duration"] == 60
+        assert usagedata_db.get_appfocusperiod(1, "editor.exe") == {9: {"focus_duration": 40, "focus_count": 2}}
+        assert usagedata_db.get_titlefocusperiod(1, "browser.exe", "notes.txt") == {9: {"focus_duration": 20, "focus_count": 1}}
+        assert usagedata_db.get_appfocusperiod(1, "unknown.exe") == {}
+        usagedata_db.close()
+
+def test_rollups_track_finished_days(monkeypatch):
+    # Three finished days, editor.exe is used on every one of them, browser.exe only on the first
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        service = UsagedataService(os.path.join(usagedata_dir, "usagedata.db"))
+        service.create_if_not_exists_schema()
+        for day in range(1, 4):
+            service.add_daylog(f"2025-01-0{day}T09:00:00", 0)
+            apps_titles = {"editor.exe": {"executable_path": "C:\\editor.exe", "total_duration": 100 * day, "total_focus_duration": 50, "total_focus_count": day, "titles": {"notes.txt": {"total_duration": 100 * day}}}}
+            if day == 1:
+                apps_titles["browser.exe"] = {"executable_path": "C:\\browser.exe", "total_duration": 1000}
+            service.upsert_applog_titlelog(day, apps_titles)
+            service.upsert_appfocusperiod(day, "editor.exe", {9: {"focus_duration": 50, "focus_count": day}})
+            service.upsert_downtimeperiod(day, {3: 60})
+        service.close()
+
+        # Opening folds them in, today's new day log stays out
+        usagedata_db = UsagedataDB(usagedata_dir)
+        rollup = usagedata_db.get_rollup()
+        assert rollup["day_count"] == 3
+        assert rollup["apps"]["editor.exe"]["total_duration"] == 600
+        assert rollup["apps"]["editor.exe"]["day_count"] == 3
+        assert rollup["apps"]["editor.exe"]["titles"]["notes.txt"]["total_duration"] == 600
+        assert rollup["apps"]["editor.exe"]["hourly_focus_data"] == {9: {"focus_duration": 150, "focus_count": 6}}
+        assert rollup["hourly"] == {3: {"focus_duration": 0, "switch_count": 0, "downtime_duration": 180}, 9: {"focus_duration": 150, "switch_count": 6, "downtime_duration": 0}}
+        assert usagedata_db.get_mostused_app(("editor.exe", "browser.exe", "unknown.exe")) == "browser.exe"
+        assert usagedata_db._service.get_weighted_totaldurations(("editor.exe", "browser.exe", "unknown.exe"), 0.6) == {"editor.exe": pytest.approx(360), "browser.exe": pytest.approx(600)}
+        assert usagedata_db.get_mostused_app(()) is None
+
+        # Folding again is a no-op
+        usagedata_db._service.finalize_rollups()
+        assert usagedata_db.get_rollup()["apps"]["editor.exe"]["total_duration"] == 600
+
+        # Removed days are taken out, apps left without a day are dropped, their totals live on in the daily summaries
+        monkeypatch.setattr(settings, "max_logs", 2)
+        monkeypatch.setattr(settings, "daily_summary_days", 100000)
+        usagedata_db._ensure_max_logs()
+        rollup = usagedata_db.get_rollup()
+        assert rollup["day_count"] == 1
+        assert set(rollup["apps"]) == {"editor.exe"}
+        assert rollup["apps"]["editor.exe"]["total_duration"] == pytest.approx(300)
+        assert rollup["hourly"][3]["downtime_duration"] == pytest.approx(60)
+        assert usagedata_db.get_history()["2025-01-01"]["apps"]["browser.exe"]["total_duration"] == 1000
+        assert usagedata_db.get_mostused_app(("editor.exe", "browser.exe")) == "editor.exe"
+        usagedata_db.close()
+
+def test_history_tiers(monkeypatch):
+    monkeypatch.setattr(settings, "max_logs", 2)
+    monkeypatch.setattr(settings, "daily_summary_days", 30)
+    monkeypatch.setattr(settings, "monthly_summary_months", 12)
+
+    today = date.today()
+    days_ago = (400, 100, 40, 5, 1)
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        service = UsagedataService(os.path.join(usagedata_dir, "usagedata.db"))
+        service.create_if_not_exists_schema()
+        for day_log_id, ago in enumerate(days_ago, start=1):
+            service.add_daylog(f"{(today - timedelta(days=ago)).isoformat()}T09:00:00", 0)
+            app_name = "old.exe" if ago == 400 else "editor.exe"
+            service.upsert_applog_titlelog(day_log_id, {app_name: {"executable_path": "C:\\app.exe", "total_duration": ago, "total_focus_count": 1}})
+        service.close()
+
+        # Opening adds today's day log and keeps two in full detail
+        usagedata_db = UsagedataDB(usagedata_dir)
+        assert len(usagedata_db.get_daylog_ids()) == 2
+
+        # Days within daily_summary_days stay resolvable by day
+        history = usagedata_db.get_history()
+        assert list(history) == [(today - timedelta(days=ago)).isoformat() for ago in (5, 1)] + [today.isoformat()]
+        assert history[(today - timedelta(days=5)).isoformat()]["apps"]["editor.exe"]["total_duration"] == 5
+        assert history[(today - timedelta(days=5)).isoformat()]["total_switch_count"] == 1
+
+        # Older days are merged into months, months past monthly_summary_months are dropped along with names only they used
+        history = usagedata_db.get_history(settings.HistoryResolution.MONTH)
+        expected: dict[str, float] = dict()
+        for ago in (100, 40, 5, 1):
+            month = (today - timedelta(days=ago)).isoformat()[:7]
+            expected[month] = expected.get(month, 0) + ago
+        assert {month: period["apps"]["editor.exe"]["total_duration"] for month, period in history.items() if "editor.exe" in period["apps"]} == expected
+        assert sum(period["day_count"] for period in history.values()) == 5
+        assert all("old.exe" not in period["apps"] for period in history.values())
+        assert usagedata_db._service._db.fetchone("SELECT COUNT(*) FROM app WHERE name = 'old.exe'")[0] == 0
+
+        # Every removed day log is archived in full detail, even the ones past monthly_summary_months
+        archived_days = []
+        for month in usagedata_db.archive.months():
+            with usagedata_db.archive.open_month(month) as archive_month:
+                archived_days.extend(archive_month.column("days", "day"))
+        assert archived_days == [int((today - timedelta(days=ago)).strftime("%Y%m%d")) for ago in (400, 100, 40, 5)]
+        usagedata_db.close()
+
+def test_log_integrity_is_checked_once_per_day():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        service = usagedata_db._service
+
+        with patch.object(service, "get_latest_daylog", wraps=service.get_latest_daylog) as get_latest_daylog, patch.object(service, "get_daylog_rowcount", wraps=service.get_daylog_rowcount) as get_daylog_rowcount:
+            for _ in range(20):
+                day_log_id = usagedata_db.get_daylog_ids()[-1]
+                usagedata_db.get_daylog(day_log_id)
+                usagedata_db.get_applog_titlelog(day_log_id)
+            assert get_latest_daylog.call_count == 0
+            assert get_daylog_rowcount.call_count == 0
+
+            # Past midnight the next read checks again and creates the new day log
+            tomorrow = datetime.today() + timedelta(days=1)
+            class _TomorrowDatetime(datetime):
+                @classmethod
+                def today(cls) -> datetime:
+                    return tomorrow
+
+            with patch.object(usagedata_db_module, "datetime", _TomorrowDatetime):
+                assert len(usagedata_db.get_daylog_ids()) == 2
+                usagedata_db.get_daylog_ids()
+            assert get_latest_daylog.call_count == 1
+
+        usagedata_db.close()
+
+@pytest.mark.parametrize("clock", [datetime(2025, 1, 6, 23, 50)], indirect=True)
+def test_journal_derives_same_aggregates(monkeypatch, clock: SyntheticClock):
+    monkeypatch.setattr(settings, "journal_derive_ticks", 7)
+    monkeypatch.setattr(settings, "focus_bucket_minutes", 10)
+
+    start: datetime = clock.now
+
+    def replay(tick_storage: settings.TickStorage) -> tuple[dict[int, dict], dict, int]:
+        monkeypatch.setattr(settings, "tick_storage", tick_storage)
+        clock.now, clock.monotonic = start, 0
+
+        with tempfile.TemporaryDirectory() as usagedata_dir:
+            usagedata_db = UsagedataDB(usagedata_dir)
+
+            # Ticks run past midnight, then a gap is logged as downtime
+            for i in range(60):
+                clock.advance(timedelta(seconds=20))
+                if i == 40:
+                    clock.advance(timedelta(hours=2))
+                usagedata_db.update_apps(*_tick(i))
+
+            # Process is gone without closing, ticks journaled since the last batch are derived by the next one
+            usagedata_db._service.close()
+            usagedata_db = UsagedataDB(usagedata_dir)
+            usagedata_db.materialize()
+
+            day_log_ids = usagedata_db.get_daylog_ids()
+            days = {day_log_id: usagedata_db.get_day(day_log_id) for day_log_id in day_log_ids}
+            for day_log_id, day in days.items():
+                for app_name, app_data in day["apps"].items():
+                    buckets = usagedata_db.get_appfocusbuckets(day_log_id, app_name)
+                    app_data["buckets"] = buckets and (buckets[0], buckets[1].tolist(), buckets[2].tolist())
+            rollup = usagedata_db.get_rollup()
+            ticks = sum(len(list(usagedata_db.get_ticks(day_log_id))) for day_log_id in day_log_ids)
+            usagedata_db.close()
+
+        return days, rollup, ticks
+
+    aggregate_days, aggregate_rollup, aggregate_ticks = replay(settings.TickStorage.AGGREGATES)
+    journal_days, journal_rollup, journal_ticks = replay(settings.TickStorage.JOURNAL)
+
+    assert len(aggregate_days) == 2
+    assert any(day["downtime_period"] for day in aggregate_days.values())
+    assert journal_days == aggregate_days
+    assert journal_rollup == aggregate_rollup
+    assert (aggregate_ticks, journal_ticks) == (0, 60)
+
+def test_pruning_keeps_journaled_names():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        service = usagedata_db._service
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+
+        # Names only seen in a derived tick are not in any log, the journal still needs them to replay the day
+        tick = ({"journal_only.exe": {"journal only title"}, "untitled.exe": set()}, {"journal_only.exe": "C:\\journal_only.exe", "untitled.exe": "C:\\untitled.exe"}, "active_only.exe", "active only title")
+        service.append_tick(day_log_id, 1.0, 1.0, *tick)
+        tick_id = next(service.iterate_ticks(day_log_id))[0]
+        service.set_journal_watermark(day_log_id, tick_id)
+
+        service.prune_names()
+        assert [ticked[4:] for ticked in service.iterate_ticks(day_log_id)] == [("active_only.exe", "active only title", {"journal_only.exe": {"journal only title"}, "untitled.exe": set()})]
+
+        # Removing the day releases them
+        service.remove_oldest_daylog()
+        service.prune_names()
+        assert service._db.fetchone("SELECT COUNT(*) FROM app WHERE name IN ('journal_only.exe', 'untitled.exe', 'active_only.exe')")[0] == 0
+        assert service._db.fetchone("SELECT COUNT(*) FROM title WHERE name IN ('journal only title', 'active only title')")[0] == 0
+
+        usagedata_db.close()
+
+@pytest.mark.parametrize("clock", [datetime(2025, 1, 6, 9, 40)], indirect=True)
+def test_focus_buckets_sum_to_hours(monkeypatch, clock: SyntheticClock):
+    monkeypatch.setattr(settings, "focus_bucket_minutes", 15)
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        for i in range(120):
+            clock.advance(timedelta(seconds=30))
+            usagedata_db.update_apps(*_tick(i // 4))
+
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+        day = usagedata_db.get_day(day_log_id)
+        for app_name, app_data in day["apps"].items():
+            bucket_minutes, focus_durations, focus_counts = usagedata_db.get_appfocusbuckets(day_log_id, app_name)
+            assert (bucket_minutes, len(focus_durations)) == (15, 96)
+            assert {hour: sum(focus_durations[hour * 4:hour * 4 + 4]) for hour in app_data["hourly_focus_data"]} == pytest.approx({hour: data["focus_duration"] for hour, data in app_data["hourly_focus_data"].items()})
+            assert {hour: sum(focus_counts[hour * 4:hour * 4 + 4]) for hour in app_data["hourly_focus_data"]} == {hour: data["focus_count"] for hour, data in app_data["hourly_focus_data"].items()}
+            assert sum(focus_durations[36:44]) > 0 and sum(focus_durations[:36]) == sum(focus_durations[44:]) == 0
+
+            for title_name, title_data in app_data["titles"].items():
+                buckets = usagedata_db.get_titlefocusbuckets(day_log_id, app_name, title_name)
+                assert sum(buckets[2]) == title_data["total_focus_count"]
+
+        assert usagedata_db.get_appfocusbuckets(day_log_id, "unknown.exe") is None
+        before = {app_name: sum(usagedata_db.get_appfocusbuckets(day_log_id, app_name)[1]) for app_name in day["apps"]}
+        usagedata_db.close()
+
+        # A coarser resolution takes over the day's buckets on the next load, each bucket goes to the one it starts in.
+        # Rows keep their resolution until they are written again, so only the active app is converted.
+        monkeypatch.setattr(settings, "focus_bucket_minutes", 60)
+        usagedata_db = UsagedataDB(usagedata_dir)
+        usagedata_db.update_apps({}, {}, None, None)
+        usagedata_db.update_apps(*_tick(1))
+        for app_name, total in before.items():
+            bucket_minutes, focus_durations, _ = usagedata_db.get_appfocusbuckets(day_log_id, app_name)
+            assert (bucket_minutes, len(focus_durations)) == ((60, 24) if app_name == "app_1.exe" else (15, 96))
+            assert sum(focus_durations) == pytest.approx(total)
+        usagedata_db.close()
+
+def test_focus_buckets_downsample_to_hours():
+    numpy = pytest.importorskip("numpy")
+
+    focus_durations = array("f", range(288))
+    focus_counts = array("i", [1] * 288)
+    hourly_durations, hourly_counts = UsagedataService.downsample_to_hours(5, memoryview(focus_durations), memoryview(focus_counts))
+
+    assert hourly_durations.tolist() == [sum(range(hour * 12, hour * 12 + 12)) for hour in range(24)]
+    assert numpy.array_equal(hourly_counts, numpy.full(24, 12))
+
+@pytest.mark.parametrize("clock", [datetime(2025, 1, 6, 9, 59)], indirect=True)
+def test_intervals_are_split_at_hour_boundaries(clock: SyntheticClock):
+    app_title_map = {"editor.exe": {"notes.txt"}}
+    app_executable_path = {"editor.exe": "C:\\editor.exe"}
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+
+        # Focus from 9:59:30 to 10:00:50 is split between the two hours. The first tick only sees the app open, so nothing counts as a switch.
+        for seconds in (30, 30, 20, 30):
+            clock.advance(timedelta(seconds=seconds))
+            usagedata_db.update_apps(app_title_map, app_executable_path, "editor.exe", "notes.txt")
+
+        day_log_id = usagedata_db.get_daylog_ids()[-1]
+        assert usagedata_db.get_appfocusperiod(day_log_id, "editor.exe") == {
+            9: {"focus_duration": 30, "focus_count": 0},
+            10: {"focus_duration": 50, "focus_count": 0}
+        }
+
+        # A gap past the threshold is downtime in every hour it covers
+        clock.advance(timedelta(hours=2))
+        usagedata_db.update_apps(app_title_map, app_executable_path, "editor.exe", "notes.txt")
+        assert usagedata_db.get_day(day_log_id)["downtime_period"] == {10: 3600 - 50, 11: 3600, 12: 50}
+        usagedata_db.close()
+
+@pytest.mark.parametrize("clock", [datetime(2025, 1, 6, 22)], indirect=True)
+@pytest.mark.parametrize("tick_storage", [settings.TickStorage.AGGREGATES, settings.TickStorage.JOURNAL])
+def test_downtime_is_backfilled_across_midnight(monkeypatch, clock: SyntheticClock, tick_storage: settings.TickStorage):
+    monkeypatch.setattr(settings, "tick_storage", tick_storage)
+
+    app_title_map = {"editor.exe": {"notes.txt"}}
+    app_executable_path = {"editor.exe": "C:\\editor.exe"}
+
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        usagedata_db = UsagedataDB(usagedata_dir)
+        for _ in range(2):
+            clock.advance(timedelta(seconds=20))
+            usagedata_db.update_apps(app_title_map, app_executable_path, "editor.exe", "notes.txt")
+
+        # Asleep from 22:00:40 through a whole day to 01:30 two days later
+        clock.advance(datetime(2025, 1, 8, 1, 30) - clock.now)
+        usagedata_db.update_apps(app_title_map, app_executable_path, "editor.exe", "notes.txt")
+        usagedata_db.materialize()
+
+        days = {datetime.fromisoformat(day["time_anchor"]).date(): day for day in usagedata_db.get_days(tuple(usagedata_db.get_daylog_ids())).values()}
+        assert set(days) == {date(2025, 1, 6), date(2025, 1, 8)}
+
+        assert days[date(2025, 1, 6)]["downtime_period"] == {22: 3600 - 40, 23: 3600}
+        assert days[date(2025, 1, 6)]["total_downtime_duration"] == 2 * 3600 - 40
+        assert days[date(2025, 1, 8)]["downtime_period"] == {0: 3600, 1: 1800}
+        assert days[date(2025, 1, 8)]["total_downtime_duration"] == 3600 + 1800
+
+        # The day before midnight is rolled up with its downtime
+        assert sum(usagedata_db.get_rollup()["hourly"][hour]["downtime_duration"] for hour in (22, 23)) == 2 * 3600 - 40
+        usagedata_db.close()
+
+def test_snapshot_reads_are_consistent():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        observe_db = UsagedataDB(usagedata_dir)
+        for i in range(3):
+            observe_db.update_apps(*_tick(i))
+
+        reflect_db = UsagedataDB(usagedata_dir, read_only=True)
+        day_log_id = reflect_db.get_daylog_ids()[-1]
+
+        # Ticks written by observe during the block are only seen after it
+        with reflect_db.snapshot():
+            daylog = reflect_db.get_daylog(day_log_id)
+            apps_titles = reflect_db.get_applog_titlelog(day_log_id)
+
+            observe_db.update_apps(*_tick(3))
+
+            assert reflect_db.get_daylog(day_log_id) == daylog
+            assert reflect_db.get_day(day_log_id)["apps"].keys() == apps_titles.keys()
+            assert all(reflect_db.get_day(day_log_id)["apps"][app_name]["total_duration"] == app_data["total_duration"] for app_name, app_data in apps_titles.items())
+
+        assert reflect_db.get_daylog(day_log_id)["monotonic_last_updated"] > daylog["monotonic_last_updated"]
+
+        reflect_db.close()
+        observe_db.close()
+
+def test_read_only_client_never_writes():
+    with tempfile.TemporaryDirectory() as usagedata_dir:
+        # observe creates the database, read-only clients can not
+        with pytest.raises(RuntimeError):
+            UsagedataDB(usagedata_dir, read_only=True)
+
+        observe_db = UsagedataDB(usagedata_dir)
+        for i in range(3):
+            observe_db.update_apps(*_tick(i))
+
+        reflect_db = UsagedataDB(usagedata_dir, read_only=True)
+        day_log_ids = reflect_db.get_daylog_ids()
+        assert reflect_db.get_days(tuple(day_log_ids)) == observe_db.get_days(tuple(day_log_ids))
+
+        # The writer keeps its write lock while the reader writes nothing
+        with observe_db._service.transaction():
+            observe_db.update_apps(*_tick(3))
+            assert reflect_db.get_daylog_ids() == day_log_ids
+
+        with pytest.raises(RuntimeError):
+            reflect_db.update_apps(*_tick(4))
+
+        with pytest.raises(ValueError):
+            UsagedataDB(usagedata_dir, write_behind=True, read_only=True)
+
+        reflect_db.close()
+        observe_db.close()
+
+        # Outdated databases are left for observe to upgrade
+        with sqlite3.connect(observe_db.db_path) as conn:
+            conn.execute("PRAGMA user_version = 1")
+        conn.close()
+        with pytest.raises(RuntimeError):
+            UsagedataDB(usagedata_dir, read_only=True)
+
+def test_read_only_client_creates_no_directories():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # A missing usage data directory is left missing
+        missing_dir = os.path.join(temp_dir, "missing", "usagedata")
+        with pytest.raises(RuntimeError):
+            UsagedataDB(missing_dir, read_only=True)
+        assert os.listdir(temp_dir) == []
+
+        usagedata_dir = os.path.join(temp_dir, "usagedata")
+        observe_db = UsagedataDB(usagedata_dir)
+        observe_db.update_apps(*_tick(0))
+        observe_db.close()
+        os.rmdir(os.path.join(usagedata_dir, settings.archive_dir_name))
+
+        # The archive directory is not recreated, a read-only archive reads as empty and refuses writes
+        entries = set(os.listdir(usagedata_dir))
+        reflect_db = UsagedataDB(usagedata_dir, read_only=True)
+        assert reflect_db.archive.months() == []
+        with pytest.raises(RuntimeError):
+            reflect_db.archive.write_day({"time_anchor": "2025-01-06T09:00:00"})
+        reflect_db.close()
+
+        assert not os.path.exists(os.path.join(usagedata_dir, settings.archive_dir_name))
+        assert {entry for entry in os.listdir(usagedata_dir) if os.path.isdir(os.path.join(usagedata_dir, entry))} == {entry for entry in entries if os.path.isdir(os.path.join(usagedata_dir, entry))}
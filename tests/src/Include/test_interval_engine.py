@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from Include.interval_engine import split_interval
+
+def _blackout_loop(downtime_period: dict[int, float], last_update: datetime, now: datetime) -> None:
+    # Downtime branch of UsagedataDB.update_apps before the interval engine, kept as the reference for gaps within a day
+    downtime = (now - last_update).total_seconds()
+    current_hour = now.hour
+    last_update_hour = last_update.hour
+
+    blackout_hours = (current_hour - last_update_hour) % 24
+    while blackout_hours > 1:
+        downtime_period[(last_update_hour + blackout_hours - 1) % 24] = 3600
+        downtime -= 3600
+        blackout_hours -= 1
+    downtime = max(0, downtime)
+
+    if blackout_hours == 1:
+        last_update_hour_downtime = 3600 - (last_update.minute * 60 + last_update.second)
+        downtime_period[last_update_hour] = min(3600, downtime_period.get(last_update_hour, 0) + last_update_hour_downtime)
+        downtime -= last_update_hour_downtime
+    downtime = max(0, downtime)
+
+    downtime_period[current_hour] = min(3600, downtime_period.get(current_hour, 0) + downtime)
+
+def _split_into(downtime_period: dict[int, float], last_update: datetime, now: datetime) -> None:
+    for span in split_interval(last_update, now):
+        for hour, duration in span.items():
+            downtime_period[hour] = min(3600, downtime_period.get(hour, 0) + duration)
+
+@pytest.mark.parametrize("last_update, now", [
+    (datetime(2025, 1, 6, 9, 10), datetime(2025, 1, 6, 9, 50)),
+    (datetime(2025, 1, 6, 9, 10, 15), datetime(2025, 1, 6, 10, 5)),
+    (datetime(2025, 1, 6, 9, 59, 59), datetime(2025, 1, 6, 10, 0, 1)),
+    (datetime(2025, 1, 6, 1, 30), datetime(2025, 1, 6, 7, 45, 30)),
+    (datetime(2025, 1, 6, 0, 0), datetime(2025, 1, 6, 23, 59, 59)),
+    (datetime(2025, 1, 6, 14, 0), datetime(2025, 1, 6, 16, 0))
+])
+def test_matches_blackout_loop_within_a_day(last_update: datetime, now: datetime):
+    for existing in (dict(), {hour: 600.0 for hour in range(24)}):
+        expected, actual = dict(existing), dict(existing)
+        _blackout_loop(expected, last_update, now)
+        _split_into(actual, last_update, now)
+
+        # The loop always touches the current hour, even when nothing of it has passed
+        assert {hour: duration for hour, duration in actual.items() if duration} == {hour: duration for hour, duration in expected.items() if duration}
+
+def test_spans_cross_midnight():
+    spans = split_interval(datetime(2025, 1, 6, 22, 30), datetime(2025, 1, 9, 1, 15))
+
+    assert [span.day for span in spans] == [date(2025, 1, 6), date(2025, 1, 7), date(2025, 1, 8), date(2025, 1, 9)]
+    assert dict(spans[0].items()) == {22: 1800, 23: 3600}
+    assert dict(spans[1].items()) == {hour: 3600 for hour in range(24)}
+    assert dict(spans[3].items()) == {0: 3600, 1: 900}
+    assert sum(sum(span.durations) for span in spans) == (datetime(2025, 1, 9, 1, 15) - datetime(2025, 1, 6, 22, 30)).total_seconds()
+
+def test_minute_buckets():
+    spans = split_interval(datetime(2025, 1, 6, 9, 7, 30), datetime(2025, 1, 6, 9, 31), bucket_minutes=10)
+    assert len(spans) == 1
+    assert dict(spans[0].items()) == {54: 150, 55: 600, 56: 600, 57: 60}
+
+    spans = split_interval(datetime(2025, 1, 6, 23, 59, 30), datetime(2025, 1, 7, 0, 0, 45), bucket_minutes=1)
+    assert [(span.day, dict(span.items())) for span in spans] == [(date(2025, 1, 6), {1439: 30}), (date(2025, 1, 7), {0: 45})]
+
+def test_edges():
+    start = datetime(2025, 1, 6, 9)
+
+    # Empty and reversed intervals have no spans, an interval ending at midnight does not touch the next day
+    assert split_interval(start, start) == []
+    assert split_interval(start, start - timedelta(seconds=1)) == []
+    assert [span.day for span in split_interval(start, datetime(2025, 1, 7))] == [date(2025, 1, 6)]
+
+    # Sub-second intervals stay in one bucket
+    assert dict(split_interval(start, start + timedelta(microseconds=500))[0].items()) == {9: 0.0005}
+
+    with pytest.raises(ValueError):
+        split_interval(start, start + timedelta(hours=1), bucket_minutes=7)
+    with pytest.raises(ValueError):
+        split_interval(start, start + timedelta(hours=1), bucket_minutes=0)
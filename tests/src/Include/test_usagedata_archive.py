@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+import pytest
+
+from Include.usagedata_archive import UsagedataArchive
+
+def _day(date: str, editor_duration: float) -> dict:
+    return {
+        "time_anchor": f"{date}T09:00:00",
+        "total_downtime_duration": 60,
+        "total_anomalies": 1,
+        "downtime_period": {3: 60},
+        "apps": {
+            "editor.exe": {
+                "total_duration": editor_duration,
+                "total_focus_duration": 30,
+                "total_focus_count": 2,
+                "hourly_focus_data": {9: {"focus_duration": 30, "focus_count": 2}},
+                "titles": {
+                    "notes.txt": {
+                        "total_duration": editor_duration,
+                        "total_focus_duration": 30,
+                        "total_focus_count": 2,
+                        "hourly_focus_data": {9: {"focus_duration": 30, "focus_count": 2}}
+                    }
+                }
+            }
+        }
+    }
+
+def test_days_are_grouped_by_month():
+    with tempfile.TemporaryDirectory() as archive_dir:
+        archive = UsagedataArchive(archive_dir)
+        archive.write_day(_day("2025-01-30", 100))
+        archive.write_day(_day("2025-01-31", 200))
+        archive.write_day(_day("2025-02-01", 300))
+
+        assert archive.months() == ["2025-01", "2025-02"]
+
+        with archive.open_month("2025-01") as month:
+            assert month.names == ["editor.exe", "notes.txt"]
+            assert month.row_count("apps") == 2
+            assert list(month.column("apps", "day")) == [20250130, 20250131]
+            assert list(month.column("apps", "total_duration")) == [100, 200]
+            assert list(month.iterate("title_hours")) == [(20250130, 0, 1, 9, 30, 2), (20250131, 0, 1, 9, 30, 2)]
+            assert list(month.iterate("downtime_hours")) == [(20250130, 3, 60), (20250131, 3, 60)]
+
+            durations = month.column("apps", "total_duration")
+            assert durations.format == "d" and durations.readonly
+
+def test_writing_a_day_again_replaces_it():
+    with tempfile.TemporaryDirectory() as archive_dir:
+        archive = UsagedataArchive(archive_dir)
+        archive.write_day(_day("2025-01-30", 100))
+        archive.write_day(_day("2025-01-30", 150))
+
+        with archive.open_month("2025-01") as month:
+            assert list(month.iterate("days")) == [(20250130, 60, 1)]
+            assert list(month.column("apps", "total_duration")) == [150]
+
+def test_rejects_other_files():
+    with tempfile.TemporaryDirectory() as archive_dir:
+        with open(os.path.join(archive_dir, "2025-01.parc"), "wb") as file:
+            file.write(b"not an archive")
+
+        with pytest.raises(ValueError):
+            UsagedataArchive(archive_dir).open_month("2025-01")
+
+        with pytest.raises(ValueError):
+            UsagedataArchive(archive_dir).open_month("2025-02")
@@ -705,9 +705,10 @@ def test_get_existing_apps(mock_usagedb):
 
     assert 'chrome' in parser.get_existing_apps()
 
-@patch('Include.subsystem.usagedata_db.UsagedataDB.get_applog_titlelog')
-def test_get_monitored_apps_executablepaths(mock_log):
-    mock_log.return_value = {
+@patch('Include.wrapper.parser_wrapper.UsagedataDB')
+def test_get_monitored_apps_executablepaths(mock_usagedb):
+    mock_usagedb.return_value.get_daylog_ids.return_value = [1]
+    mock_usagedb.return_value.get_applog_titlelog.return_value = {
         "Chrome": {
             "executable_path": "C:\\Program Files\\Google\\Chrome\\chrome.exe"
         },
@@ -722,6 +723,18 @@ def test_get_monitored_apps_executablepaths(mock_log):
     assert "Chrome" in apps
     assert apps["Chrome"] == "C:\\Program Files\\Google\\Chrome\\chrome.exe"
 
+@patch('Include.wrapper.parser_wrapper.UsagedataDB.exists')
+def test_usagedata_not_created_yet(mock_exists):
+    mock_exists.return_value = False
+
+    parser = ParserWrapper(settings.Environment.DEV)
+    parser._class_app_map = {'browser': {'chrome'}}
+
+    # observe creates the database, until then there is nothing monitored
+    assert parser.get_monitored_apps_executablepaths() == {}
+    assert parser.get_mostused_app_for_class('browser') is None
+    parser.close()
+
 @patch('Include.subsystem.usagedata_db.UsagedataDB')
 def test_get_app_for_nickname(mock_usagedb):
     parser = ParserWrapper(settings.Environment.DEV)
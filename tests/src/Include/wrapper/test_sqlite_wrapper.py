@@ -1,3 +1,4 @@
+import sqlite3
 from unittest.mock import patch, MagicMock, mock_open
 import threading
 from pathlib import Path
@@ -186,5 +187,460 @@ def test_connection_timeout():
         mock_connect.assert_called_once_with(
             Path(':memory:'),
             timeout=30,
-            isolation_level=None
-        )
\ No newline at end of file
+            isolation_level=None,
+            cached_statements=128
+        )
+
+@patch('sqlite3.connect')
+def test_pooled_reuses_connection(mock_connect):
+    mock_conn = MagicMock()
+    mock_connect.return_value = mock_conn
+
+    db = SQLiteWrapper(':memory:', pooled=True)
+    db.execute("INSERT INTO test (id) VALUES (?)", (1,))
+    db.fetchone("SELECT * FROM test WHERE id = ?", (1,))
+
+    # One connection for initialisation and queries on the same thread
+    mock_connect.assert_called_once()
+    mock_conn.close.assert_not_called()
+
+    db.close()
+    mock_conn.close.assert_called_once()
+
+def test_pooled_connection_per_thread():
+    import tempfile
+    import os
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        db = SQLiteWrapper(temp_db.name, pooled=True)
+        with db.transaction() as tx:
+            tx.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+
+        connections = []
+        def worker(worker_id):
+            with db.transaction() as tx:
+                tx.execute("INSERT INTO test (id) VALUES (?)", (worker_id,))
+            with db._get_conn() as conn:
+                connections.append(conn)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(set(map(id, connections))) == 3
+        assert db.fetchone("SELECT COUNT(*) FROM test")[0] == 3
+
+        db.close()
+        assert len(db._pool) == 0
+    finally:
+        os.unlink(temp_db.name)
+
+@patch('sqlite3.connect')
+def test_pooled_health_check_reconnects(mock_connect):
+    stale_conn = MagicMock()
+    fresh_conn = MagicMock()
+    mock_connect.side_effect = [stale_conn, fresh_conn]
+
+    db = SQLiteWrapper(':memory:', pooled=True, health_check_interval=-1)
+
+    stale_conn.execute.side_effect = sqlite3.OperationalError("disk I/O error")
+    db.execute("INSERT INTO test (id) VALUES (?)", (1,))
+
+    stale_conn.close.assert_called_once()
+    fresh_conn.execute.assert_any_call("INSERT INTO test (id) VALUES (?)", (1,))
+
+def test_reads_do_not_wait_for_writer():
+    import tempfile
+    import os
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        db = SQLiteWrapper(temp_db.name, pooled=True)
+        with db.transaction() as tx:
+            tx.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+            tx.execute("INSERT INTO test (id) VALUES (?)", (1,))
+
+        results = []
+        def reader():
+            results.append(db.fetchone("SELECT id FROM test")['id'])
+
+        # Hold the write lock with an open transaction, readers should still be served from the last commit
+        with db.transaction() as tx:
+            tx.execute("INSERT INTO test (id) VALUES (?)", (2,))
+
+            threads = [threading.Thread(target=reader) for _ in range(3)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=5)
+
+            assert not any(t.is_alive() for t in threads)
+
+        assert results == [1, 1, 1]
+
+        db.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_write_behind_group_commit():
+    import tempfile
+    import os
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        db = SQLiteWrapper(temp_db.name, pooled=True, write_behind=True, flush_interval=3600)
+        db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+        db.flush()
+
+        db.execute("INSERT INTO test (id) VALUES (?)", (1,))
+        db.execute_many("INSERT INTO test (id) VALUES (?)", [(2,), (3,)])
+
+        # Reads through the wrapper see deferred writes, other connections only see them after a flush
+        assert db.fetchone("SELECT COUNT(*) FROM test")[0] == 3
+
+        outside = sqlite3.connect(temp_db.name)
+        assert outside.execute("SELECT COUNT(*) FROM test").fetchone()[0] == 0
+
+        db.flush()
+        assert outside.execute("SELECT COUNT(*) FROM test").fetchone()[0] == 3
+
+        # Failed transaction blocks only roll back their own writes
+        db.execute("INSERT INTO test (id) VALUES (?)", (4,))
+        try:
+            with db.transaction() as tx:
+                tx.execute("INSERT INTO test (id) VALUES (?)", (5,))
+                raise Exception("Test error")
+        except Exception:
+            pass
+
+        # Close flushes pending writes
+        db.close()
+        assert [row[0] for row in outside.execute("SELECT id FROM test ORDER BY id")] == [1, 2, 3, 4]
+        outside.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_write_behind_checkpoints_outside_write_lock():
+    import tempfile
+    import os
+    import time
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        db = SQLiteWrapper(temp_db.name, pooled=True, write_behind=True, flush_interval=0.05)
+        db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+        db.execute("INSERT INTO test (id) VALUES (?)", (1,))
+
+        # Commits never checkpoint on the writer connection
+        assert db.fetchone("PRAGMA wal_autocheckpoint")[0] == 0
+
+        # The background thread checkpoints after releasing the write lock
+        checkpoints: list[tuple[bool, tuple[int, int, int]]] = []
+        checkpoint_wal = db._checkpoint_wal
+        def record_checkpoint():
+            locked = db._write_lock.locked()
+            result = checkpoint_wal()
+            checkpoints.append((locked, result))
+            return result
+
+        with patch.object(db, "_checkpoint_wal", side_effect=record_checkpoint):
+            deadline = time.monotonic() + 5
+            while not checkpoints and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        assert checkpoints
+        locked, (busy, log, checkpointed) = checkpoints[0]
+        assert not locked and busy == 0 and log == checkpointed
+
+        outside = sqlite3.connect(temp_db.name)
+        assert outside.execute("SELECT COUNT(*) FROM test").fetchone()[0] == 1
+        outside.close()
+
+        db.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_write_behind_interrupts_only_reads():
+    import tempfile
+    import os
+    import time
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        db = SQLiteWrapper(temp_db.name, pooled=True, write_behind=True, flush_interval=3600)
+        db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+        db.flush()
+        db.execute("INSERT INTO test (id) VALUES (?)", (0,))
+
+        def run(query: str, errors: list[Exception]) -> None:
+            try:
+                db.execute(query) if query.startswith("INSERT") else db.fetchone(query)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        def interrupt_while_running(query: str) -> list[Exception]:
+            errors: list[Exception] = []
+            thread = threading.Thread(target=run, args=(query, errors), daemon=True)
+            thread.start()
+            deadline = time.monotonic() + 5
+            while thread.is_alive() and time.monotonic() < deadline:
+                db.interrupt(thread.ident)
+                time.sleep(0.01)
+            assert not thread.is_alive()
+            return errors
+
+        # With writes pending, reads run on the writer connection and are interrupted there
+        assert db._has_pending_writes()
+        assert interrupt_while_running("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n")
+
+        # Writes finish, interrupting one would roll back every deferred write
+        assert not interrupt_while_running("INSERT INTO test (id) WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000) SELECT i FROM n")
+
+        db.close()
+
+        outside = sqlite3.connect(temp_db.name)
+        assert outside.execute("SELECT COUNT(*) FROM test").fetchone()[0] == 200001
+        outside.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_calls_inside_transaction_join_it():
+    import tempfile
+    import os
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        for write_behind in (False, True):
+            db = SQLiteWrapper(temp_db.name, pooled=True, write_behind=write_behind, flush_interval=3600)
+            db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+            db.execute("DELETE FROM test")
+
+            # Calls made through the wrapper inside a block read its writes and roll back with it
+            try:
+                with db.transaction():
+                    db.execute("INSERT INTO test (id) VALUES (?)", (1,))
+                    assert db.fetchone("SELECT COUNT(*) FROM test")[0] == 1
+                    with db.transaction() as tx:
+                        tx.execute("INSERT INTO test (id) VALUES (?)", (2,))
+                    raise Exception("Test error")
+            except Exception:
+                pass
+            assert db.fetchone("SELECT COUNT(*) FROM test")[0] == 0
+
+            with db.transaction():
+                db.execute("INSERT INTO test (id) VALUES (?)", (3,))
+                db.flush()
+            db.close()
+
+            outside = sqlite3.connect(temp_db.name)
+            assert [row[0] for row in outside.execute("SELECT id FROM test")] == [3]
+            outside.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_snapshot_reads_one_state():
+    import tempfile
+    import os
+    import pytest
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        for pooled in (False, True):
+            db = SQLiteWrapper(temp_db.name, pooled=pooled)
+            db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+            db.execute("DELETE FROM test")
+            db.execute("INSERT INTO test (id) VALUES (?)", (1,))
+
+            writer = SQLiteWrapper(temp_db.name)
+            with db.snapshot():
+                assert db.fetchone("SELECT COUNT(*) FROM test")[0] == 1
+
+                # Writers commit while the snapshot is open, its reads keep seeing the state it began with
+                writer.execute("INSERT INTO test (id) VALUES (?)", (2,))
+                assert db.fetchone("SELECT COUNT(*) FROM test")[0] == 1
+                assert [row[0] for row in db.iterate("SELECT id FROM test")] == [1]
+
+                with pytest.raises(RuntimeError):
+                    db.execute("INSERT INTO test (id) VALUES (?)", (3,))
+
+            assert db.fetchone("SELECT COUNT(*) FROM test")[0] == 2
+            writer.close()
+            db.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_iterate_in_batches():
+    import tempfile
+    import os
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        db = SQLiteWrapper(temp_db.name, pooled=True, write_behind=True, flush_interval=3600)
+        db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+        db.execute_many("INSERT INTO test (id) VALUES (?)", [(i,) for i in range(10)])
+
+        # Deferred writes are flushed before streaming
+        batches = list(db.fetchmany("SELECT id FROM test ORDER BY id", batch_size=4))
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+
+        rows = db.iterate("SELECT id FROM test WHERE id >= ? ORDER BY id", (5,), batch_size=2)
+        assert [row['id'] for row in rows] == [5, 6, 7, 8, 9]
+
+        db.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_row_factories():
+    import tempfile
+    import os
+    from Include.wrapper.sqlite_wrapper import RowFactory
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        db = SQLiteWrapper(temp_db.name, pooled=True, row_factory=RowFactory.TUPLE)
+        db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY, name TEXT)")
+        db.execute_many("INSERT INTO test (id, name) VALUES (?, ?)", [(1, "a"), (2, "b")])
+
+        # Wrapper default
+        assert db.fetchall("SELECT id, name FROM test ORDER BY id") == [(1, "a"), (2, "b")]
+
+        # Per call overrides
+        assert db.fetchone("SELECT id, name FROM test WHERE id = ?", (1,), RowFactory.ROW)['name'] == "a"
+
+        records = db.fetchall("SELECT id, name FROM test ORDER BY id", row_factory=RowFactory.RECORD)
+        assert [record.name for record in records] == ["a", "b"]
+        assert records[0] == (1, "a")
+        assert type(records[0]) is type(db.fetchone("SELECT id, name FROM test", row_factory=RowFactory.RECORD))
+
+        rows = db.iterate("SELECT id FROM test ORDER BY id", batch_size=1, row_factory=RowFactory.RECORD)
+        assert [row.id for row in rows] == [1, 2]
+
+        assert db.fetch_columns("SELECT id, name FROM test ORDER BY id", batch_size=1) == {"id": [1, 2], "name": ["a", "b"]}
+        assert db.fetch_columns("SELECT id FROM test WHERE id > ?", (2,)) == {"id": []}
+
+        db.close()
+    finally:
+        os.unlink(temp_db.name)
+
+def test_query_profiler():
+    import tempfile
+    import os
+    import json
+    from Include.query_profiler import QueryProfiler
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+    temp_stats = tempfile.NamedTemporaryFile(suffix='.json')
+    temp_stats.close()
+
+    try:
+        profiler = QueryProfiler(slow_query_threshold=0, explain_query_plan=True)
+        db = SQLiteWrapper(temp_db.name, pooled=True, profiler=profiler)
+        db.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+        db.execute_many("INSERT INTO test (id) VALUES (?)", [(1,), (2,), (3,)])
+        db.fetchall("SELECT id FROM test WHERE id IN (?, ?)", (1, 2))
+        db.fetchall("SELECT id FROM test WHERE id IN (?, ?, ?)", (1, 2, 3))
+
+        stats = profiler.stats()
+
+        # Placeholder lists are normalized into one statement
+        select_stats = stats["SELECT id FROM test WHERE id IN (?, ...)"]
+        assert select_stats["calls"] == 2
+        assert select_stats["rows"] == 5
+        assert select_stats["p50"] <= select_stats["p99"] <= select_stats["max_time"]
+        assert select_stats["plan"]
+
+        assert stats["INSERT INTO test (id) VALUES (?)"]["rows"] == 3
+        assert len(profiler.slow_queries()) == 4
+
+        profiler.export(temp_stats.name, {"process": "test"})
+        with open(temp_stats.name) as file:
+            report = json.load(file)
+
+        assert report["process"] == "test"
+        assert "SELECT id FROM test WHERE id IN (?, ...)" in report["statements"]
+
+        db.close()
+    finally:
+        os.unlink(temp_db.name)
+        os.unlink(temp_stats.name)
+
+@patch('sqlite3.connect')
+def test_performance_pragmas(mock_connect):
+    import pytest
+
+    mock_conn = MagicMock()
+    mock_connect.return_value = mock_conn
+
+    SQLiteWrapper(':memory:', pragmas={"page_size": 8192, "cache_size": -4096, "temp_store": "MEMORY"})
+
+    mock_conn.execute.assert_any_call("PRAGMA page_size=8192;")
+    mock_conn.execute.assert_any_call("PRAGMA cache_size=-4096;")
+    mock_conn.execute.assert_any_call("PRAGMA temp_store=MEMORY;")
+
+    with pytest.raises(ValueError):
+        SQLiteWrapper(':memory:', pragmas={"journal_mode": "DELETE"})
+
+    with pytest.raises(ValueError):
+        SQLiteWrapper(':memory:', pragmas={"temp_store": "MEMORY; DROP TABLE test"})
+
+def test_read_only_connections():
+    import tempfile
+    import os
+    import pytest
+
+    temp_db = tempfile.NamedTemporaryFile()
+    temp_db.close()
+
+    try:
+        writer = SQLiteWrapper(temp_db.name)
+        writer.execute("CREATE TABLE IF NOT EXISTS test (id INTEGER PRIMARY KEY)")
+        writer.execute("INSERT INTO test (id) VALUES (?)", (1,))
+
+        for pooled in (False, True):
+            db = SQLiteWrapper(temp_db.name, pooled=pooled, read_only=True)
+            assert db.fetchone("SELECT COUNT(*) FROM test")[0] >= 1
+
+            with pytest.raises(RuntimeError):
+                db.execute("INSERT INTO test (id) VALUES (?)", (2,))
+            with pytest.raises(RuntimeError):
+                with db.transaction():
+                    pass
+            with pytest.raises(RuntimeError):
+                db.execute_maintenance("PRAGMA wal_checkpoint(PASSIVE);")
+
+            # Reads see commits made by the writer
+            count = db.fetchone("SELECT COUNT(*) FROM test")[0]
+            writer.execute("INSERT INTO test (id) VALUES (?)", (count + 1,))
+            with db.snapshot():
+                assert db.fetchone("SELECT COUNT(*) FROM test")[0] == count + 1
+
+            db.close()
+
+        with pytest.raises(ValueError):
+            SQLiteWrapper(temp_db.name, write_behind=True, read_only=True)
+
+        writer.close()
+    finally:
+        os.unlink(temp_db.name)